@@ -0,0 +1,110 @@
+"""
+Management commands
+
+Usage (from the backend directory):
+    python -m app.cli rebuild-ytd [--year 2025]
+    python -m app.cli payroll-worker
+    python -m app.cli email-worker
+    python -m app.cli check-plans [--rows 200000]
+    python -m app.cli migrate [--status] [--baseline N]
+"""
+import argparse
+import sys
+
+from app.db.database import SessionLocal
+
+
+def rebuild_ytd(args) -> int:
+    from app.services import ytd_ledger
+
+    db = SessionLocal()
+    try:
+        count = ytd_ledger.rebuild(db, tax_year=args.year)
+    finally:
+        db.close()
+    scope = f"tax year {args.year}" if args.year else "all tax years"
+    print(f"✓ Rebuilt YTD ledger for {scope}: {count} staff/year rows")
+    return 0
+
+
+def payroll_worker(args) -> int:
+    from app.services import payroll_jobs
+
+    payroll_jobs.run_worker(poll_seconds=args.poll or payroll_jobs.PAYROLL_WORKER_POLL_SECONDS)
+    return 0
+
+
+def email_worker(args) -> int:
+    from app.services import email_outbox
+
+    email_outbox.run_worker(poll_seconds=args.poll or email_outbox.EMAIL_OUTBOX_POLL_SECONDS)
+    return 0
+
+
+def check_plans(args) -> int:
+    from app.db.database import engine
+    from app.db.plan_check import check_plans as run_check
+
+    failures = run_check(engine, rows=args.rows)
+    if failures:
+        print(f"✗ {len(failures)} hot queries fall back to a sequential scan")
+        return 1
+    print("✓ All hot queries use indexes")
+    return 0
+
+
+def migrate(args) -> int:
+    from app.db import migrate as migrations
+    from app.db.database import engine
+
+    if args.status:
+        rows = migrations.status(engine)
+        for migration, state in rows:
+            mark = "✓" if state == "applied" else "✗" if state == "modified" else "·"
+            print(f"{mark} {migration.version:03d} {migration.name:<32} {state}")
+        return 1 if any(state != "applied" for _, state in rows) else 0
+    if args.baseline is not None:
+        marked = migrations.baseline(engine, args.baseline)
+        print(f"✓ Marked {len(marked)} migrations as applied (up to version {args.baseline})")
+        return 0
+    ran = migrations.migrate(engine)
+    version = migrations.current_version(engine)
+    if ran:
+        print(f"✓ Applied {len(ran)} migrations, schema is at version {version}")
+    else:
+        print(f"✓ Schema is up to date (version {version})")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Healthcare API management commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("rebuild-ytd", help="Recompute the payroll YTD ledger from payroll rows")
+    p.add_argument("--year", type=int, default=None, help="Only rebuild this tax year")
+    p.set_defaults(func=rebuild_ytd)
+
+    p = sub.add_parser("payroll-worker", help="Run queued bulk payroll jobs (PAYROLL_JOB_EXECUTOR=external)")
+    p.add_argument("--poll", type=float, default=None, help="Seconds between queue polls (default: PAYROLL_WORKER_POLL_SECONDS)")
+    p.set_defaults(func=payroll_worker)
+
+    p = sub.add_parser("email-worker", help="Deliver the email outbox (EMAIL_OUTBOX_SENDER=external)")
+    p.add_argument("--poll", type=float, default=None, help="Seconds between outbox polls (default: EMAIL_OUTBOX_POLL_SECONDS)")
+    p.set_defaults(func=email_worker)
+
+    p = sub.add_parser("check-plans", help="EXPLAIN the hot queries on a seeded dataset; fail on sequential scans")
+    p.add_argument("--rows", type=int, default=200000, help="Rows to seed per large table (rolled back)")
+    p.set_defaults(func=check_plans)
+
+    p = sub.add_parser("migrate", help="Apply pending schema migrations from backend/migrations")
+    p.add_argument("--status", action="store_true", help="List applied, pending and modified migrations")
+    p.add_argument("--baseline", type=int, default=None, metavar="N",
+                   help="Record migrations up to N as applied without running them")
+    p.set_defaults(func=migrate)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
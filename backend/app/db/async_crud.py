@@ -0,0 +1,54 @@
+"""
+Async read helpers mirroring crud.py for endpoints served from get_async_db
+"""
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import models
+from app.db.crud import list_statement
+from app.db.pagination import to_page
+
+
+async def _get(db: AsyncSession, model, obj_id: int):
+    return (await db.execute(select(model).where(model.id == obj_id))).scalars().first()
+
+
+async def _list(db: AsyncSession, model, skip: int = 0, limit: int = 100, after: str = None):
+    stmt = list_statement(model, skip, limit, after)
+    return to_page((await db.execute(stmt)).scalars().all(), (model.id,), limit)
+
+# =========================================================
+# STAFF
+# =========================================================
+async def get_staff(db: AsyncSession, staff_id: int):
+    return await _get(db, models.Staff, staff_id)
+
+async def list_staff(db: AsyncSession, skip: int = 0, limit: int = 100, after: str = None):
+    return await _list(db, models.Staff, skip, limit, after)
+
+# =========================================================
+# PATIENTS
+# =========================================================
+async def get_patient(db: AsyncSession, patient_id: int):
+    return await _get(db, models.Patient, patient_id)
+
+async def list_patients(db: AsyncSession, skip: int = 0, limit: int = 100, after: str = None):
+    return await _list(db, models.Patient, skip, limit, after)
+
+# =========================================================
+# SERVICE REQUESTS
+# =========================================================
+async def get_service_request(db: AsyncSession, request_id: int):
+    return await _get(db, models.ServiceRequest, request_id)
+
+async def list_service_requests(db: AsyncSession, skip: int = 0, limit: int = 100, after: str = None):
+    return await _list(db, models.ServiceRequest, skip, limit, after)
+
+# =========================================================
+# ASSIGNMENTS
+# =========================================================
+async def get_assignment(db: AsyncSession, assignment_id: int):
+    return await _get(db, models.Assignment, assignment_id)
+
+async def list_assignments(db: AsyncSession, skip: int = 0, limit: int = 100, after: str = None):
+    return await _list(db, models.Assignment, skip, limit, after)
@@ -1,10 +1,14 @@
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from contextvars import ContextVar
+from contextvars import ContextVar, Token
+from typing import Callable
 from datetime import datetime, timedelta
 from app.db import models
+from app.db.pagination import Page, keyset, to_page
 
-# Per-request context for auditing creator
-_created_by_ctx: ContextVar[str] = ContextVar("created_by", default="system")
+# Per-request context for auditing creator: a name, or a zero-argument resolver
+# that is only called (once) when a write actually asks for the creator
+_created_by_ctx: ContextVar = ContextVar("created_by", default="system")
 
 def set_created_by(value: str | None) -> None:
     try:
@@ -12,11 +16,46 @@ def set_created_by(value: str | None) -> None:
     except Exception:
         _created_by_ctx.set("system")
 
+def set_created_by_resolver(resolver: Callable[[], str | None]) -> Token:
+    """Defer working out the creator until get_created_by(); returns a token for reset_created_by"""
+    return _created_by_ctx.set(_LazyCreator(resolver))
+
+def reset_created_by(token: Token) -> None:
+    _created_by_ctx.reset(token)
+
 def get_created_by() -> str:
     try:
-        return _created_by_ctx.get()
+        value = _created_by_ctx.get()
     except LookupError:
         return "system"
+    if isinstance(value, _LazyCreator):
+        return value.resolve()
+    return value
+
+class _LazyCreator:
+    __slots__ = ("_resolver", "_value")
+
+    def __init__(self, resolver: Callable[[], str | None]):
+        self._resolver = resolver
+        self._value = None
+
+    def resolve(self) -> str:
+        if self._value is None:
+            try:
+                self._value = (self._resolver() or "system").strip() or "system"
+            except Exception:
+                self._value = "system"
+        return self._value
+
+# =========================================================
+# PAGINATION
+# =========================================================
+def list_statement(model, skip: int = 0, limit: int = 100, after: str = None):
+    """Primary-key keyset page of `model` as a select(); `after` is the previous page's cursor"""
+    return keyset(select(model), (model.id,), after=after, limit=limit, skip=skip)
+
+def _list_page(db: Session, model, skip: int = 0, limit: int = 100, after: str = None) -> Page:
+    return to_page(db.execute(list_statement(model, skip, limit, after)).scalars().all(), (model.id,), limit)
 
 # =========================================================
 # ROLE CRUD
@@ -31,8 +70,8 @@ def create_role(db: Session, name: str, description: str = None):
 def get_role(db: Session, role_id: int):
     return db.query(models.Role).filter(models.Role.id == role_id).first()
 
-def list_roles(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Role).offset(skip).limit(limit).all()
+def list_roles(db: Session, skip: int = 0, limit: int = 100, after: str = None):
+    return _list_page(db, models.Role, skip, limit, after)
 
 def update_role(db: Session, role_id: int, name: str = None, description: str = None):
     role = get_role(db, role_id)
@@ -67,8 +106,8 @@ def create_privilege(db: Session, code: str, description: str = None):
 def get_privilege(db: Session, privilege_id: int):
     return db.query(models.Privilege).filter(models.Privilege.id == privilege_id).first()
 
-def list_privileges(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Privilege).offset(skip).limit(limit).all()
+def list_privileges(db: Session, skip: int = 0, limit: int = 100, after: str = None):
+    return _list_page(db, models.Privilege, skip, limit, after)
 
 def update_privilege(db: Session, privilege_id: int, code: str = None, description: str = None):
     privilege = get_privilege(db, privilege_id)
@@ -93,12 +132,16 @@ def delete_privilege(db: Session, privilege_id: int):
 # =========================================================
 # USER CRUD
 # =========================================================
-def create_user(db: Session, full_name: str, email: str, password_hash: str, role_id: int, phone: str = None):
+def create_user(db: Session, full_name: str, email: str, password_hash: str, role_id: int, phone: str = None, commit: bool = True):
+    """commit=False only flushes (the id is assigned) so the caller can add more rows to the transaction"""
     created_by = get_created_by()
     if (not created_by or created_by == "system") and email:
         created_by = email
     user = models.User(full_name=full_name, email=email, password_hash=password_hash, role_id=role_id, phone=phone, createdby=created_by)
     db.add(user)
+    if not commit:
+        db.flush()
+        return user
     db.commit()
     db.refresh(user)
     return user
@@ -106,8 +149,8 @@ def create_user(db: Session, full_name: str, email: str, password_hash: str, rol
 def get_user(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.id == user_id).first()
 
-def list_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.User).offset(skip).limit(limit).all()
+def list_users(db: Session, skip: int = 0, limit: int = 100, after: str = None):
+    return _list_page(db, models.User, skip, limit, after)
 
 def update_user(db: Session, user_id: int, **kwargs):
     user = get_user(db, user_id)
@@ -142,8 +185,8 @@ def create_staff(db: Session, user_id: int, license_number: str = None, skills:
 def get_staff(db: Session, staff_id: int):
     return db.query(models.Staff).filter(models.Staff.id == staff_id).first()
 
-def list_staff(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Staff).offset(skip).limit(limit).all()
+def list_staff(db: Session, skip: int = 0, limit: int = 100, after: str = None):
+    return _list_page(db, models.Staff, skip, limit, after)
 
 def update_staff(db: Session, staff_id: int, **kwargs):
     staff = get_staff(db, staff_id)
@@ -181,8 +224,8 @@ def create_patient(db: Session, full_name: str, address: str = None, latitude: f
 def get_patient(db: Session, patient_id: int):
     return db.query(models.Patient).filter(models.Patient.id == patient_id).first()
 
-def list_patients(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Patient).offset(skip).limit(limit).all()
+def list_patients(db: Session, skip: int = 0, limit: int = 100, after: str = None):
+    return _list_page(db, models.Patient, skip, limit, after)
 
 def update_patient(db: Session, patient_id: int, **kwargs):
     patient = get_patient(db, patient_id)
@@ -217,8 +260,8 @@ def create_service_request(db: Session, patient_id: int, description: str, requi
 def get_service_request(db: Session, request_id: int):
     return db.query(models.ServiceRequest).filter(models.ServiceRequest.id == request_id).first()
 
-def list_service_requests(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.ServiceRequest).offset(skip).limit(limit).all()
+def list_service_requests(db: Session, skip: int = 0, limit: int = 100, after: str = None):
+    return _list_page(db, models.ServiceRequest, skip, limit, after)
 
 def update_service_request(db: Session, request_id: int, **kwargs):
     request = get_service_request(db, request_id)
@@ -253,8 +296,8 @@ def create_assignment(db: Session, service_request_id: int, staff_id: int, confi
 def get_assignment(db: Session, assignment_id: int):
     return db.query(models.Assignment).filter(models.Assignment.id == assignment_id).first()
 
-def list_assignments(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Assignment).offset(skip).limit(limit).all()
+def list_assignments(db: Session, skip: int = 0, limit: int = 100, after: str = None):
+    return _list_page(db, models.Assignment, skip, limit, after)
 
 def update_assignment(db: Session, assignment_id: int, **kwargs):
     assignment = get_assignment(db, assignment_id)
@@ -300,6 +343,9 @@ def create_visit(db: Session, patient_id: int, staff_id: int, scheduled_time: st
 def get_visit(db: Session, visit_id: int):
     return db.query(models.Visit).filter(models.Visit.id == visit_id).first()
 
+def list_visits(db: Session, skip: int = 0, limit: int = 100, after: str = None):
+    return _list_page(db, models.Visit, skip, limit, after)
+
 def update_visit(db: Session, visit_id: int, completed: bool | None = None, notes: str | None = None):
     visit = get_visit(db, visit_id)
     if not visit:
@@ -0,0 +1,242 @@
+"""
+Versioned schema migrations
+
+Applies backend/migrations/NNN_name.sql in order and records each one in
+schema_version. Schema changes run only through the CLI:
+
+    cd backend && python -m app.cli migrate [--status] [--baseline N]
+
+On a fresh database the ORM metadata is created first (create_all only adds
+missing tables), then every pending file runs. Files run in one transaction
+each, except files containing the line `-- migrate: no-transaction` (e.g.
+CREATE INDEX CONCURRENTLY), which run statement by statement in autocommit.
+Application startup only reads max(version) and compares it to the newest file.
+"""
+import hashlib
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+# Docker: /app/app/db/migrate.py -> /app/migrations; checkout: backend/migrations
+MIGRATIONS_DIR = Path(os.getenv("MIGRATIONS_DIR") or Path(__file__).resolve().parents[2] / "migrations")
+SCHEMA_CHECK = os.getenv("SCHEMA_CHECK", "warn").lower()  # strict | warn | off (the Docker image sets strict)
+
+NO_TRANSACTION_MARKER = "-- migrate: no-transaction"
+MIGRATION_LOCK_ID = 727001  # pg_advisory_lock key, serializes concurrent `migrate` runs
+
+_FILE_RE = re.compile(r"^(\d+)_([\w\-]+)\.sql$")
+
+SCHEMA_VERSION_DDL = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    checksum VARCHAR(64) NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+class SchemaVersionError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    path: Path
+
+    @property
+    def sql(self) -> str:
+        return self.path.read_text(encoding="utf-8")
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.path.read_bytes()).hexdigest()
+
+    @property
+    def transactional(self) -> bool:
+        return NO_TRANSACTION_MARKER not in self.sql
+
+
+# =========================================================
+# DISCOVERY
+# =========================================================
+def discover(directory: Path = None) -> List[Migration]:
+    directory = Path(directory or MIGRATIONS_DIR)
+    if not directory.is_dir():
+        return []
+    found = {}
+    for path in directory.iterdir():
+        m = _FILE_RE.match(path.name)
+        if not m:
+            continue
+        version = int(m.group(1))
+        if version in found:
+            raise SchemaVersionError(f"Duplicate migration version {version}: {found[version].path.name}, {path.name}")
+        found[version] = Migration(version, m.group(2), path)
+    return [found[v] for v in sorted(found)]
+
+
+def latest_version(migrations: List[Migration] = None) -> Optional[int]:
+    migrations = discover() if migrations is None else migrations
+    return migrations[-1].version if migrations else None
+
+
+def split_statements(sql: str) -> List[str]:
+    """Split a no-transaction file on `;` (no DO blocks / functions allowed in those files)"""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [s.strip() for s in "\n".join(lines).split(";") if s.strip()]
+
+
+# =========================================================
+# VERSION TABLE
+# =========================================================
+def current_version(engine) -> Optional[int]:
+    """max(version) from schema_version, or None when the database is unversioned"""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT max(version) FROM schema_version")).scalar()
+    except DBAPIError:
+        return None
+
+
+def applied(engine) -> dict:
+    with engine.begin() as conn:
+        conn.execute(text(SCHEMA_VERSION_DDL))
+        rows = conn.execute(text("SELECT version, name, checksum, applied_at FROM schema_version")).all()
+    return {r.version: r for r in rows}
+
+
+def _record(cursor, migration: Migration) -> None:
+    cursor.execute(
+        "INSERT INTO schema_version (version, name, checksum) VALUES (%s, %s, %s)",
+        (migration.version, migration.name, migration.checksum),
+    )
+
+
+# =========================================================
+# APPLY
+# =========================================================
+def _apply_postgres(engine, pending: List[Migration]) -> None:
+    raw = engine.raw_connection()
+    conn = raw.driver_connection
+    try:
+        conn.autocommit = True
+        cursor = conn.cursor()
+        cursor.execute("SET statement_timeout = 0")  # index builds outlive DB_STATEMENT_TIMEOUT_MS
+        cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        try:
+            # Another process may have migrated while we waited for the lock
+            cursor.execute("SELECT version FROM schema_version")
+            done = {row[0] for row in cursor.fetchall()}
+            for migration in pending:
+                if migration.version in done:
+                    continue
+                print(f"→ {migration.path.name}")
+                if migration.transactional:
+                    conn.autocommit = False
+                    try:
+                        cursor.execute(migration.sql)
+                        _record(cursor, migration)
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+                    finally:
+                        conn.autocommit = True
+                else:
+                    for statement in split_statements(migration.sql):
+                        cursor.execute(statement)
+                    _record(cursor, migration)
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+            cursor.close()
+    finally:
+        raw.close()
+
+
+def migrate(engine, directory: Path = None) -> List[Migration]:
+    """Create missing tables, then apply pending migration files. Returns what ran."""
+    from .database import Base
+    from . import models  # noqa: F401  (registers the tables on Base.metadata)
+
+    migrations = discover(directory)
+    done = applied(engine)
+    Base.metadata.create_all(bind=engine)
+    pending = [m for m in migrations if m.version not in done]
+    if not pending:
+        return []
+
+    if engine.dialect.name == "postgresql":
+        _apply_postgres(engine, pending)
+    else:
+        # The SQL files are Postgres specific; create_all already built the current schema
+        with engine.begin() as conn:
+            for migration in pending:
+                conn.execute(
+                    text("INSERT INTO schema_version (version, name, checksum) VALUES (:v, :n, :c)"),
+                    {"v": migration.version, "n": migration.name, "c": migration.checksum},
+                )
+    return pending
+
+
+def baseline(engine, version: int, directory: Path = None) -> List[Migration]:
+    """Mark migrations up to `version` as applied without running them"""
+    done = applied(engine)
+    marked = [m for m in discover(directory) if m.version <= version and m.version not in done]
+    with engine.begin() as conn:
+        for migration in marked:
+            conn.execute(
+                text("INSERT INTO schema_version (version, name, checksum) VALUES (:v, :n, :c)"),
+                {"v": migration.version, "n": migration.name, "c": migration.checksum},
+            )
+    return marked
+
+
+def status(engine, directory: Path = None) -> List[tuple]:
+    """(migration, state) for every file: applied, pending or modified"""
+    done = applied(engine)
+    rows = []
+    for migration in discover(directory):
+        row = done.get(migration.version)
+        if row is None:
+            rows.append((migration, "pending"))
+        elif row.checksum != migration.checksum:
+            rows.append((migration, "modified"))
+        else:
+            rows.append((migration, "applied"))
+    return rows
+
+
+# =========================================================
+# STARTUP CHECK (one query, no DDL)
+# =========================================================
+def check_schema_version(engine, mode: str = SCHEMA_CHECK) -> Optional[int]:
+    """Compare the database version with the newest migration file.
+
+    mode=strict refuses to boot when the database is behind, warn only prints.
+    """
+    if mode == "off":
+        return None
+    expected = latest_version()
+    if expected is None:
+        print(f"⚠️ Schema check skipped: no migrations found in {MIGRATIONS_DIR}")
+        return None
+    current = current_version(engine)
+    if current is not None and current >= expected:
+        if current > expected:
+            print(f"⚠️ Database schema version {current} is newer than this build ({expected})")
+        return current
+
+    found = "unversioned" if current is None else f"at version {current}"
+    message = f"Database schema is {found}, this build needs version {expected}. Run: python -m app.cli migrate"
+    if mode == "strict":
+        raise SchemaVersionError(message)
+    print(f"⚠️ {message}")
+    return current
@@ -1,6 +1,6 @@
 from sqlalchemy import (
     Column, Integer, String, Float, ForeignKey, DateTime, Boolean, Text, Enum,
-    Table, JSON, func
+    Table, JSON, UniqueConstraint, Index, LargeBinary, func, text
 )
 from sqlalchemy.orm import relationship
 from app.db.database import Base
@@ -26,6 +26,19 @@ class PayrollStatus(str, enum.Enum):
     PENDING = "pending"
     APPROVED = "approved"
     PAID = "paid"
+    VOID = "void"
+
+class PayrollJobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class EmailStatus(str, enum.Enum):
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
 
 # =========================================================
 # ASSOCIATION TABLES
@@ -95,6 +108,7 @@ class Role(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String(100), unique=True, nullable=False)
     description = Column(String(255))
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Bumped on every role/privilege change
     privileges = relationship("Privilege", secondary=role_privilege_table, back_populates="roles")
     users = relationship("User", back_populates="role")
     createdby = Column(String(255), default="system")
@@ -102,12 +116,16 @@ class Role(Base):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Payroll runs select the active users of one company
+        Index("ix_users_company_id_active", "company_id", postgresql_where=text("is_active")),
+    )
 
     id = Column(Integer, primary_key=True)
     full_name = Column(String(255), nullable=False)
     email = Column(String(255), unique=True, index=True)
     password_hash = Column(String(255), nullable=False)
-    phone = Column(String(50))
+    phone = Column(String(50), index=True)  # Login by phone
     role_id = Column(Integer, ForeignKey("roles.id"))
     company_id = Column(Integer, ForeignKey("companies.id"), nullable=True)  # Multi-tenancy
     country_id = Column(Integer, ForeignKey("countries.id"), nullable=True)  # For tax
@@ -122,6 +140,9 @@ class User(Base):
 
     staff_profile = relationship("Staff", back_populates="user", uselist=False)
 
+# Login matches lower(email)
+Index("ix_users_lower_email", func.lower(User.email))
+
 # =========================================================
 # STAFF AND PATIENT PROFILES
 # =========================================================
@@ -129,12 +150,13 @@ class Staff(Base):
     __tablename__ = "staff"
 
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     license_number = Column(String(100))
     certification_expiry = Column(DateTime)
     skills = Column(JSON)  # e.g., ["nursing", "CPR", "medication"]
     latitude = Column(Float)
     longitude = Column(Float)
+    location_updated_at = Column(DateTime, index=True)  # last latitude/longitude change (UTC)
     available = Column(Boolean, default=True)
 
     user = relationship("User", back_populates="staff_profile")
@@ -154,8 +176,9 @@ class Patient(Base):
     address = Column(String(255))
     latitude = Column(Float)
     longitude = Column(Float)
+    location_updated_at = Column(DateTime, index=True)  # last latitude/longitude change (UTC)
     phone = Column(String(50))
-    email = Column(String(255))
+    email = Column(String(255), index=True)
     created_at = Column(DateTime, server_default=func.now())
     requests = relationship("ServiceRequest", back_populates="patient")
     createdby = Column(String(255), default="system")
@@ -182,11 +205,14 @@ class ServiceRequest(Base):
 
 class Assignment(Base):
     __tablename__ = "assignments"
+    __table_args__ = (
+        Index("ix_assignments_staff_id_assigned_at", "staff_id", "assigned_at"),
+    )
 
     id = Column(Integer, primary_key=True)
     service_request_id = Column(Integer, ForeignKey("service_requests.id"))
     staff_id = Column(Integer, ForeignKey("staff.id"))
-    assigned_at = Column(DateTime, server_default=func.now())
+    assigned_at = Column(DateTime, server_default=func.now(), index=True)
     confirmed = Column(Boolean, default=False)
 
     service_request = relationship("ServiceRequest", back_populates="assignment")
@@ -215,16 +241,40 @@ class Shift(Base):
     createdby = Column(String(255), default="system")
     datecreated = Column(DateTime, server_default=func.now())
 
+class LocationHistoryChunk(Base):
+    """
+    A run of GPS fixes recorded during a shift. `data` holds zlib-compressed,
+    little-endian int32 triples (ms since started_at, latitude, longitude in
+    microdegrees), each delta-encoded against the previous fix.
+    """
+    __tablename__ = "location_history_chunks"
+    __table_args__ = (
+        Index("ix_location_history_chunks_shift_id_started_at", "shift_id", "started_at"),
+        Index("ix_location_history_chunks_staff_id_started_at", "staff_id", "started_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    staff_id = Column(Integer, ForeignKey("staff.id"), nullable=False)
+    shift_id = Column(Integer, ForeignKey("shifts.id"), nullable=False)
+    started_at = Column(DateTime, nullable=False)
+    ended_at = Column(DateTime, nullable=False)
+    fix_count = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    datecreated = Column(DateTime, server_default=func.now())
+
 class Timesheet(Base):
     __tablename__ = "timesheets"
+    __table_args__ = (
+        Index("ix_timesheets_staff_id_created_at", "staff_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True)
     staff_id = Column(Integer, ForeignKey("staff.id"))
-    shift_id = Column(Integer, ForeignKey("shifts.id"))
+    shift_id = Column(Integer, ForeignKey("shifts.id"), index=True)
     total_hours = Column(Float)
     submitted = Column(Boolean, default=False)
     verified = Column(Boolean, default=False)
-    created_at = Column(DateTime, server_default=func.now())
+    created_at = Column(DateTime, server_default=func.now(), index=True)
 
     staff = relationship("Staff", back_populates="timesheets")
     shift = relationship("Shift", back_populates="timesheet")
@@ -234,6 +284,10 @@ class Timesheet(Base):
 
 class Payroll(Base):
     __tablename__ = "payroll"
+    __table_args__ = (
+        Index("ix_payroll_staff_id_pay_period_start", "staff_id", "pay_period_start"),
+        Index("ix_payroll_company_id_generated_at", "company_id", text("generated_at DESC")),
+    )
 
     id = Column(Integer, primary_key=True)
     staff_id = Column(Integer, ForeignKey("staff.id"), nullable=False)  # Link directly to staff
@@ -277,6 +331,49 @@ class Payroll(Base):
     createdby = Column(String(255), default="system")
     datecreated = Column(DateTime, server_default=func.now())
 
+class PayrollYtd(Base):
+    """Running year-to-date totals per staff, maintained on every payroll write"""
+    __tablename__ = "payroll_ytd"
+    __table_args__ = (UniqueConstraint("staff_id", "tax_year", name="uq_payroll_ytd_staff_year"),)
+
+    id = Column(Integer, primary_key=True)
+    staff_id = Column(Integer, ForeignKey("staff.id", ondelete="CASCADE"), nullable=False)
+    tax_year = Column(Integer, nullable=False)
+    gross_pay = Column(Float, nullable=False, default=0.0)  # All non-void payrolls
+    approved_gross_pay = Column(Float, nullable=False, default=0.0)  # Approved or paid
+    social_security_tax = Column(Float, nullable=False, default=0.0)
+    medicare_tax = Column(Float, nullable=False, default=0.0)
+    payroll_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class PayrollJob(Base):
+    """Background bulk payroll run for a company and pay period"""
+    __tablename__ = "payroll_jobs"
+
+    id = Column(Integer, primary_key=True)
+    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
+    pay_period_start = Column(DateTime, nullable=False)
+    pay_period_end = Column(DateTime, nullable=False)
+    status = Column(Enum(PayrollJobStatus), default=PayrollJobStatus.QUEUED, nullable=False)
+
+    # Progress
+    total_staff = Column(Integer, default=0)
+    processed_staff = Column(Integer, default=0)
+    succeeded = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    errors = Column(JSON)  # [{"staff_id": 1, "error": "..."}]
+    payroll_ids = Column(JSON)  # Payroll rows created by this job
+    error = Column(Text)  # Fatal error that stopped the job
+
+    created_at = Column(DateTime, server_default=func.now())
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)  # Refreshed after every chunk while running
+
+    company = relationship("Company")
+    createdby = Column(String(255), default="system")
+    datecreated = Column(DateTime, server_default=func.now())
+
 class Invoice(Base):
     __tablename__ = "invoices"
 
@@ -302,7 +399,7 @@ class Compliance(Base):
     staff_id = Column(Integer, ForeignKey("staff.id"))
     document_type = Column(String(100))  # e.g., "license", "CPR_certificate"
     document_number = Column(String(100))
-    expiry_date = Column(DateTime)
+    expiry_date = Column(DateTime, index=True)
     valid = Column(Boolean, default=True)
     last_checked = Column(DateTime, onupdate=func.now())
 
@@ -319,7 +416,7 @@ class Visit(Base):
     id = Column(Integer, primary_key=True)
     patient_id = Column(Integer, ForeignKey("patients.id"))
     staff_id = Column(Integer, ForeignKey("staff.id"))
-    scheduled_time = Column(DateTime)
+    scheduled_time = Column(DateTime, index=True)
     completed = Column(Boolean, default=False)
     notes = Column(Text)
     created_at = Column(DateTime, server_default=func.now())
@@ -358,6 +455,28 @@ class EmailToken(Base):
     createdby = Column(String(255), default="system")
     datecreated = Column(DateTime, server_default=func.now())
 
+class EmailOutbox(Base):
+    """Outgoing email, written in the caller's transaction and delivered by services/email_outbox.py"""
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    to_email = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    html_body = Column(Text, nullable=False)
+    from_name = Column(String(255), default="Healthcare Platform")
+    status = Column(Enum(EmailStatus), default=EmailStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    locked_at = Column(DateTime, nullable=True)  # claimed by a sender; reclaimed when stale
+    last_error = Column(Text)
+    created_at = Column(DateTime, server_default=func.now())
+    sent_at = Column(DateTime, nullable=True)
+    createdby = Column(String(255), default="system")
+    datecreated = Column(DateTime, server_default=func.now())
+
 # =========================================================
 # TAX RATES (Canada & US)
 # =========================================================
@@ -375,7 +494,7 @@ class TaxRate(Base):
     federal_bracket_max = Column(Float, nullable=True)  # Income threshold max (null = no cap)
     
     # State/Provincial taxes
-    state_provincial_rate = Column(Float, default=0.0)
+    state_provincial_rate = Column(Float, default=0.0)  # % rate
     
     # Social Security / CPP
     social_security_rate = Column(Float, default=0.0)  # US: 6.2%, CA: 5.95%
@@ -401,7 +520,7 @@ class StaffSalaryConfig(Base):
 
     id = Column(Integer, primary_key=True)
     staff_id = Column(Integer, ForeignKey("staff.id"), nullable=False, unique=True)
-    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
+    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False, index=True)
     
     # Salary details
     hourly_rate = Column(Float, nullable=False)
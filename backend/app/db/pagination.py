@@ -0,0 +1,107 @@
+"""
+Keyset (cursor) pagination for list queries
+
+A page is `WHERE (keys) > (:last) ORDER BY keys LIMIT :limit + 1`: one index range
+scan however deep the page is, and rows cannot shift between pages the way
+OFFSET results do. Cursors are opaque url-safe base64 of the last row's keys.
+"""
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, List, Optional, Sequence
+
+from sqlalchemy import tuple_
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class Page(list):
+    """A list of rows plus the cursor of the next page (None on the last page)"""
+
+    def __init__(self, items=(), next_cursor: Optional[str] = None):
+        super().__init__(items)
+        self.next_cursor = next_cursor
+
+
+# =========================================================
+# CURSOR ENCODING
+# =========================================================
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps(list(values), default=_json_default, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor("Malformed pagination cursor") from exc
+    if not isinstance(values, list) or not values:
+        raise InvalidCursor("Malformed pagination cursor")
+    return values
+
+
+def _coerce(columns, values) -> List[Any]:
+    """Turn decoded JSON values back into the key columns' python types"""
+    if len(values) != len(columns):
+        raise InvalidCursor("Pagination cursor does not match this listing")
+    out = []
+    for column, value in zip(columns, values):
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            python_type = None
+        try:
+            if value is None:
+                out.append(None)
+            elif python_type is datetime:
+                out.append(datetime.fromisoformat(value))
+            elif python_type is date:
+                out.append(date.fromisoformat(value))
+            elif python_type in (int, float, str):
+                out.append(python_type(value))
+            else:
+                out.append(value)
+        except (TypeError, ValueError) as exc:
+            raise InvalidCursor("Malformed pagination cursor") from exc
+    return out
+
+
+# =========================================================
+# QUERY HELPERS (work on both Query and select())
+# =========================================================
+def keyset(query, keys: Sequence, after: Optional[str] = None, limit: int = 100,
+           descending: bool = False, skip: int = 0):
+    """Order by `keys` (unique together, e.g. (created_at, id)) and start after the cursor.
+
+    Fetches limit + 1 rows so `to_page` can tell whether another page exists.
+    `skip` is kept for old clients; combine it with `after` and it offsets from the cursor.
+    """
+    keys = list(keys)
+    if after:
+        values = _coerce(keys, decode_cursor(after))
+        left = keys[0] if len(keys) == 1 else tuple_(*keys)
+        right = values[0] if len(keys) == 1 else tuple_(*values)
+        query = query.filter(left < right if descending else left > right)
+    query = query.order_by(*[k.desc() if descending else k.asc() for k in keys])
+    if skip:
+        query = query.offset(skip)
+    return query.limit(limit + 1)
+
+
+def to_page(rows: Sequence, keys: Sequence, limit: int) -> Page:
+    rows = list(rows)
+    if len(rows) <= limit:
+        return Page(rows)
+    items = rows[:limit]
+    last = items[-1]
+    return Page(items, encode_cursor([getattr(last, k.key) for k in keys]))
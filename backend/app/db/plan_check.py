@@ -0,0 +1,243 @@
+"""
+Query plan checker for the hot query paths (Postgres only)
+
+Seeds a large synthetic dataset inside a transaction, ANALYZEs it, runs
+EXPLAIN on the queries the routers and the payroll engine issue (built by the
+routes' own statement helpers where they have one), and reports
+every plan that sequentially scans one of the large tables. The transaction is
+always rolled back, so it is safe to run against a staging copy.
+
+    cd backend && python -m app.cli check-plans [--rows 200000]
+"""
+import json
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import Connection
+
+from . import models
+
+# Tables big enough in production that a sequential scan is a bug
+LARGE_TABLES = {
+    "users", "staff", "patients", "timesheets", "shifts", "assignments",
+    "service_requests", "payroll", "visits", "compliance",
+}
+
+SEED_PREFIX = "plancheck"
+SEED_COMPANIES = 500
+SEED_START = datetime(2023, 1, 1)
+SEED_DAYS = 3 * 365
+
+
+# =========================================================
+# SEED DATA
+# =========================================================
+def _ids(conn: Connection, table: str, where: str) -> Tuple[int, int]:
+    row = conn.execute(text(f"SELECT min(id), max(id) FROM {table} WHERE {where}")).one()
+    return row[0], row[1]
+
+
+def seed(conn: Connection, rows: int) -> Dict[str, int]:
+    """Insert `rows` timesheets/shifts/assignments/payroll plus proportional parents"""
+    n_users = max(rows // 10, 1000)
+    params = {"p": SEED_PREFIX, "start": SEED_START, "days": SEED_DAYS}
+
+    conn.execute(text(
+        "INSERT INTO countries (code, name, currency, is_active) VALUES ('ZZP', 'Plan check', 'USD', true) "
+        "ON CONFLICT (code) DO NOTHING"
+    ))
+    country_id = conn.execute(text("SELECT id FROM countries WHERE code = 'ZZP'")).scalar()
+    conn.execute(text(
+        "INSERT INTO companies (name, email, password_hash, country_id, is_active) "
+        "SELECT :p || '-company-' || g, :p || '-company-' || g || '@example.invalid', 'x', :country, true "
+        "FROM generate_series(1, :n) g"
+    ), {**params, "country": country_id, "n": SEED_COMPANIES})
+    company_lo, _ = _ids(conn, "companies", f"name LIKE '{SEED_PREFIX}-company-%'")
+
+    conn.execute(text(
+        "INSERT INTO users (full_name, email, password_hash, phone, company_id, country_id, is_active) "
+        "SELECT :p || ' user ' || g, :p || '-' || g || '@example.invalid', 'x', '+1555' || lpad(g::text, 7, '0'), "
+        "       :company + (g % :companies), :country, (g % 10) <> 0 "
+        "FROM generate_series(1, :n) g"
+    ), {**params, "company": company_lo, "companies": SEED_COMPANIES, "country": country_id, "n": n_users})
+    user_lo, user_hi = _ids(conn, "users", f"email LIKE '{SEED_PREFIX}-%@example.invalid'")
+
+    conn.execute(text(
+        "INSERT INTO staff (user_id, license_number, available) "
+        "SELECT u, 'LIC-' || u, true FROM generate_series(:lo, :hi) u"
+    ), {"lo": user_lo, "hi": user_hi})
+    staff_lo, staff_hi = _ids(conn, "staff", f"user_id BETWEEN {user_lo} AND {user_hi}")
+    n_staff = staff_hi - staff_lo + 1
+
+    conn.execute(text(
+        "INSERT INTO patients (full_name, email, phone, created_at) "
+        "SELECT :p || ' patient ' || g, :p || '-patient-' || g || '@example.invalid', '+1666' || g, :start "
+        "FROM generate_series(1, :n) g"
+    ), {**params, "n": n_users})
+    patient_lo, _ = _ids(conn, "patients", f"email LIKE '{SEED_PREFIX}-patient-%'")
+
+    spread = "(:start + (random() * :days) * interval '1 day')"
+    conn.execute(text(
+        "INSERT INTO service_requests (patient_id, description, required_skill, created_at) "
+        f"SELECT :patient + (g % :np), 'plan check', 'nursing', {spread} FROM generate_series(1, :n) g"
+    ), {**params, "patient": patient_lo, "np": n_users, "n": rows})
+    sr_lo, _ = _ids(conn, "service_requests", "description = 'plan check'")
+
+    conn.execute(text(
+        "INSERT INTO assignments (service_request_id, staff_id, assigned_at, confirmed) "
+        f"SELECT :sr + g - 1, :staff + (g % :ns), {spread}, false FROM generate_series(1, :n) g"
+    ), {**params, "sr": sr_lo, "staff": staff_lo, "ns": n_staff, "n": rows})
+
+    conn.execute(text(
+        "INSERT INTO shifts (staff_id, purpose, start_time, end_time) "
+        f"SELECT :staff + (g % :ns), :p, s, s + interval '8 hours' "
+        f"FROM (SELECT g, {spread} AS s FROM generate_series(1, :n) g) x"
+    ), {**params, "staff": staff_lo, "ns": n_staff, "n": rows})
+    shift_lo, _ = _ids(conn, "shifts", f"purpose = '{SEED_PREFIX}'")
+
+    conn.execute(text(
+        "INSERT INTO timesheets (staff_id, shift_id, total_hours, submitted, verified, created_at) "
+        "SELECT s.staff_id, s.id, 8, true, (s.id % 3) <> 0, s.end_time "
+        "FROM shifts s WHERE s.id >= :shift AND s.purpose = :p"
+    ), {**params, "shift": shift_lo})
+
+    conn.execute(text(
+        "INSERT INTO payroll (staff_id, company_id, hours_worked, hourly_rate, gross_pay, net_pay, "
+        "                     pay_period_start, pay_period_end, generated_at) "
+        "SELECT :staff + (g % :ns), :company + (g % :companies), 80, 30, 2400, 1800, "
+        f"       d, d + interval '14 days', d + interval '15 days' "
+        f"FROM (SELECT g, {spread} AS d FROM generate_series(1, :n) g) x"
+    ), {**params, "staff": staff_lo, "ns": n_staff, "company": company_lo, "companies": SEED_COMPANIES, "n": rows})
+
+    conn.execute(text(
+        "INSERT INTO visits (patient_id, staff_id, scheduled_time, completed) "
+        f"SELECT :patient + (g % :np), :staff + (g % :ns), {spread}, false FROM generate_series(1, :n) g"
+    ), {**params, "patient": patient_lo, "np": n_users, "staff": staff_lo, "ns": n_staff, "n": rows // 2})
+
+    conn.execute(text(
+        "INSERT INTO compliance (staff_id, document_type, document_number, expiry_date, valid) "
+        f"SELECT :staff + (g % :ns), 'license', 'DOC-' || g, {spread}, true FROM generate_series(1, :n) g"
+    ), {**params, "staff": staff_lo, "ns": n_staff, "n": rows // 5})
+
+    for table in sorted(LARGE_TABLES):
+        conn.execute(text(f"ANALYZE {table}"))
+
+    return {
+        "company_id": company_lo + 1,
+        "user_id": (user_lo + user_hi) // 2,
+        "staff_id": (staff_lo + staff_hi) // 2,
+        "staff_lo": staff_lo,
+        "shift_id": shift_lo + rows // 2,
+        "n_users": n_users,
+    }
+
+
+# =========================================================
+# HOT QUERIES
+# =========================================================
+def hot_queries(ids: Dict[str, int]) -> List[Tuple[str, object]]:
+    """
+    Listings, calendars and map queries are built by the same helpers the routes
+    use, with a cursor where the route pages, so a change to a route's query is
+    checked too. Calendars and maps are checked as a tenant sees them: the
+    all-company admin views join most of a month and hash-join by design.
+    Lookups the routes issue inline are mirrored here.
+    """
+    # Imported here: the routes' builders pull in the services and routers
+    from ..routers.payroll_enhanced import PAYROLL_LIST_KEYS, payroll_listing
+    from ..routers.timesheets import timesheet_listing
+    from ..services import assignment_calendar, map_data
+    from .crud import list_statement
+    from .pagination import encode_cursor, keyset
+
+    user_n = ids["user_id"] - ids["user_id"] % 10 + 1  # a seeded user number that exists
+    month_start = SEED_START + timedelta(days=400)
+    month_end = month_start + timedelta(days=31)
+    staff_batch = list(range(ids["staff_lo"], ids["staff_lo"] + 500))
+    middle = encode_cursor([ids["staff_id"]])
+    payroll_cursor = encode_cursor([month_start, ids["shift_id"]])
+    m = models
+    return [
+        ("auth.login email", select(m.User).where(func.lower(m.User.email) == f"{SEED_PREFIX}-{user_n}@example.invalid")),
+        ("auth.login phone", select(m.User).where(m.User.phone == "+1555" + str(user_n).rjust(7, "0"))),
+        ("location staff by user", select(m.Staff).where(m.Staff.user_id == ids["user_id"])),
+        ("location patient by email", select(m.Patient).where(m.Patient.email == f"{SEED_PREFIX}-patient-7@example.invalid")),
+        *[
+            (f"{model.__tablename__} list page", list_statement(model, after=middle))
+            for model in (m.User, m.Staff, m.Patient, m.ServiceRequest, m.Assignment, m.Visit)
+        ],
+        ("timesheets list", timesheet_listing().limit(250)),
+        ("timesheets list by staff", timesheet_listing(ids["staff_id"]).limit(250)),
+        ("timesheet by shift", select(m.Timesheet).where(m.Timesheet.shift_id == ids["shift_id"])),
+        ("assignments by day", assignment_calendar.by_day_statement(month_start, month_end)),
+        ("assignments by day company", assignment_calendar.by_day_statement(month_start, month_end, ids["company_id"])),
+        ("assignments by day staff", assignment_calendar.by_day_statement(month_start, month_end, staff_id=ids["staff_id"])),
+        ("assignments monthly company", assignment_calendar.monthly_statement(month_start, month_end, ids["company_id"])),
+        ("map staff company", map_data.map_statement(map_data.STAFF, company_id=ids["company_id"])[0]),
+        ("map staff since", map_data.map_statement(map_data.STAFF, since=month_start)[0]),
+        ("map staff bbox clustered", map_data.map_statement(
+            map_data.STAFF, bbox=map_data.parse_bbox("-75,40,-73,41"), zoom=3, company_id=ids["company_id"])[0]),
+        ("map patients company", map_data.map_statement(map_data.PATIENTS, company_id=ids["company_id"])[0]),
+        ("visits today", select(m.Visit).where(m.Visit.scheduled_time >= month_start, m.Visit.scheduled_time < month_start + timedelta(days=1))),
+        ("compliance expiring", select(m.Compliance).where(
+            m.Compliance.expiry_date >= month_start, m.Compliance.expiry_date < month_start + timedelta(days=30))),
+        ("payroll list by company", keyset(
+            payroll_listing(ids["company_id"]), PAYROLL_LIST_KEYS, after=payroll_cursor, descending=True)),
+        ("payroll list by staff", keyset(
+            payroll_listing(ids["company_id"], ids["staff_id"]), PAYROLL_LIST_KEYS, after=payroll_cursor, descending=True)),
+        ("payroll by staff and period", select(m.Payroll).where(
+            m.Payroll.staff_id == ids["staff_id"], m.Payroll.pay_period_start >= month_start)),
+        ("payroll company active users", select(m.Staff.id).join(m.User, m.Staff.user_id == m.User.id)
+            .where(m.User.company_id == ids["company_id"], m.User.is_active == True)),
+        ("payroll period hours", select(
+            m.Timesheet.staff_id, func.sum(m.Timesheet.total_hours), func.count(m.Timesheet.id)
+        ).where(
+            m.Timesheet.staff_id.in_(staff_batch),
+            m.Timesheet.created_at >= month_start,
+            m.Timesheet.created_at <= month_start + timedelta(days=14),
+            m.Timesheet.verified == True,
+        ).group_by(m.Timesheet.staff_id)),
+    ]
+
+
+# =========================================================
+# EXPLAIN
+# =========================================================
+def _seq_scans(node: dict) -> List[str]:
+    found = []
+    if node.get("Node Type") == "Seq Scan" and node.get("Relation Name") in LARGE_TABLES:
+        found.append(node["Relation Name"])
+    for child in node.get("Plans", []):
+        found.extend(_seq_scans(child))
+    return found
+
+
+def explain(conn: Connection, stmt) -> dict:
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    raw = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + compiled.string, compiled.params).scalar()
+    plan = raw if isinstance(raw, list) else json.loads(raw)
+    return plan[0]["Plan"]
+
+
+def check_plans(engine, rows: int = 200000) -> List[Tuple[str, List[str]]]:
+    """Returns (query name, seq-scanned tables) for every failing query"""
+    if engine.dialect.name != "postgresql":
+        raise RuntimeError("check-plans needs PostgreSQL (EXPLAIN output is Postgres specific)")
+    failures = []
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            print(f"Seeding {rows} rows per large table (rolled back afterwards)...")
+            ids = seed(conn, rows)
+            for name, stmt in hot_queries(ids):
+                plan = explain(conn, stmt)
+                scans = _seq_scans(plan)
+                mark = "✗" if scans else "✓"
+                detail = f" seq scan on {', '.join(sorted(set(scans)))}" if scans else ""
+                print(f"{mark} {name:<32} {plan['Node Type']} (cost {plan['Total Cost']}){detail}")
+                if scans:
+                    failures.append((name, scans))
+        finally:
+            trans.rollback()
+    return failures
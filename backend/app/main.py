@@ -1,7 +1,9 @@
 from fastapi import FastAPI, Request, Depends, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from app.db.database import init_db
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse
+from app.db.database import engine, dispose_async_engine
+from app.db.migrate import check_schema_version
+from app.db.pagination import InvalidCursor
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from app.routers import (
@@ -27,12 +29,18 @@ from app.routers import (
     companies,
     countries,
     payroll_enhanced,
-    staff_salary_config
+    staff_salary_config,
+    internal,
+    live
 )
-from app.db.database import SessionLocal
-from app.db import models
-from app.db import crud as crud_module
-from app.routers.security import decode_access_token, get_current_active_user
+from app.routers.pagination import NEXT_CURSOR_HEADER
+from app.services.map_data import TRUNCATED_HEADER, WATERMARK_HEADER
+from app.routers.security import AuditContextMiddleware, get_current_active_user, roles_required
+from app.services import email_outbox, location_ingest, payroll_jobs
+from app.services.live_hub import live_hub
+from app.services.request_metrics import RequestMetricsMiddleware
+from app.utils.static_assets import StaticAssetIndex
+from starlette.concurrency import run_in_threadpool
 
 # =========================================================
 # Initialize FastAPI App
@@ -40,7 +48,9 @@ from app.routers.security import decode_access_token, get_current_active_user
 app = FastAPI(
     title="Healthcare Staffing & Management API",
     version="1.0.0",
-    description="API to manage staff assignments, timesheets, payroll, compliance, and patient visits."
+    description="API to manage staff assignments, timesheets, payroll, compliance, and patient visits.",
+    # orjson renders every response (datetimes/enums natively); see app/routers/responses.py
+    default_response_class=ORJSONResponse,
 )
 
 # CORS for frontend dev
@@ -54,12 +64,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, WATERMARK_HEADER, TRUNCATED_HEADER],
 )
 
+@app.exception_handler(InvalidCursor)
+async def invalid_cursor_handler(request: Request, exc: InvalidCursor):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
 # =========================================================
-# Initialize Database
+# Check Database Schema Version
 # =========================================================
-init_db()  # Creates all tables if they don't exist
+# DDL runs only through `python -m app.cli migrate`; SCHEMA_CHECK=strict refuses to boot
+check_schema_version(engine)
 
 # =========================================================
 # Include Routers
@@ -103,6 +119,12 @@ app.include_router(payroll_enhanced.router, prefix="/payroll-enhanced", tags=["P
 # Staff salary configuration
 app.include_router(staff_salary_config.router, prefix="/staff-salary-config", tags=["Staff Salary Config"], dependencies=secured)
 
+# Internal operations (pool statistics, ...) - admin roles only
+app.include_router(internal.router, prefix="/internal", tags=["Internal"], dependencies=[Depends(roles_required(internal.INTERNAL_ROLES))])
+
+# Live dashboard feed (WebSocket; authenticates the token itself)
+app.include_router(live.router, prefix="/ws", tags=["Live"])
+
 # =========================================================
 # Serve Documentation Website
 # =========================================================
@@ -120,50 +142,33 @@ for path in possible_paths:
         print(f"✓ Found docs-website at: {docs_dist_path}")
         break
 
+docs_assets = None
 if docs_dist_path:
     try:
-        from starlette.responses import Response
-        
+        docs_assets = StaticAssetIndex(docs_dist_path)
+
         # Custom handler for React Router SPA
         @app.get("/docs-website/{full_path:path}")
         async def serve_docs_spa(request: Request, full_path: str):
             """
             Serve React SPA with proper routing support.
-            - Serves actual files (JS, CSS, images, etc.) if they exist
+            - Serves actual files (JS, CSS, images, etc.) from the startup index
             - Serves index.html for all other paths (React Router routes)
             """
-            # Try to serve the actual file first
-            file_path = os.path.join(docs_dist_path, full_path)
-            
-            # If it's a file that exists, serve it
-            if os.path.isfile(file_path):
-                # Determine content type
-                import mimetypes
-                content_type, _ = mimetypes.guess_type(file_path)
-                with open(file_path, 'rb') as f:
-                    content = f.read()
-                return Response(content=content, media_type=content_type or 'application/octet-stream')
-            
-            # If not a file, serve index.html (for React Router)
-            index_path = os.path.join(docs_dist_path, "index.html")
-            if os.path.isfile(index_path):
-                with open(index_path, 'r', encoding='utf-8') as f:
-                    html_content = f.read()
-                return Response(content=html_content, media_type='text/html')
-            
-            raise HTTPException(status_code=404, detail="Documentation not found")
+            response = docs_assets.response(request, full_path)
+            if response is None:
+                raise HTTPException(status_code=404, detail="Documentation not found")
+            return response
         
         # Root docs-website path
         @app.get("/docs-website/")
         @app.get("/docs-website")
         async def serve_docs_root(request: Request):
             """Serve index.html for root /docs-website path"""
-            index_path = os.path.join(docs_dist_path, "index.html")
-            if os.path.isfile(index_path):
-                with open(index_path, 'r', encoding='utf-8') as f:
-                    html_content = f.read()
-                return Response(content=html_content, media_type='text/html')
-            raise HTTPException(status_code=404, detail="Documentation not found")
+            response = docs_assets.response(request, "index.html")
+            if response is None:
+                raise HTTPException(status_code=404, detail="Documentation not found")
+            return response
         
         print(f"✓ Found docs-website at: {docs_dist_path}")
         print(f"✓ Mounted documentation website at /docs-website/")
@@ -184,33 +189,14 @@ def root():
     return {"message": "Welcome to the Healthcare Staffing & Management API!"}
 
 # =========================================================
-# Middleware: set createdby from current authenticated user (if any)
+# Middleware: per-request audit context (createdby), resolved lazily
 # =========================================================
-@app.middleware("http")
-async def attach_created_by(request: Request, call_next):
-    created_by = "system"
-    try:
-        auth = request.headers.get("authorization") or request.headers.get("Authorization")
-        if auth and auth.lower().startswith("bearer "):
-            token = auth.split()[1]
-            payload = decode_access_token(token)
-            user_id = payload.get("sub")
-            if user_id:
-                db = SessionLocal()
-                try:
-                    u = db.get(models.User, int(user_id))
-                    if u:
-                        created_by = u.email or u.full_name or f"user:{u.id}"
-                finally:
-                    db.close()
-    except Exception:
-        created_by = "system"
-    try:
-        crud_module.set_created_by(created_by)
-    except Exception:
-        pass
-    response = await call_next(request)
-    return response
+app.add_middleware(AuditContextMiddleware)
+
+# =========================================================
+# Middleware: per-route latency / query metrics + Server-Timing (outermost)
+# =========================================================
+app.add_middleware(RequestMetricsMiddleware)
 
 # =========================================================
 # Optional: Startup & Shutdown Events
@@ -218,7 +204,18 @@ async def attach_created_by(request: Request, call_next):
 @app.on_event("startup")
 async def startup_event():
     print("Application startup: initializing resources...")
+    await live_hub.start()
+    location_ingest.start_flusher()
+    email_outbox.start_sender()
+    await run_in_threadpool(payroll_jobs.recover_jobs)
+    if docs_assets is not None:
+        await run_in_threadpool(docs_assets.load)
 
 @app.on_event("shutdown")
 async def shutdown_event():
     print("Application shutdown: cleaning up resources...")
+    payroll_jobs.shutdown_executor()
+    location_ingest.stop_flusher()
+    email_outbox.stop_sender()
+    await live_hub.stop()
+    await dispose_async_engine()
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Response
+from pydantic import BaseModel, TypeAdapter
+from typing_extensions import TypedDict
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import date, datetime
-from ..db import crud
-from ..db.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..db import crud, async_crud, models
+from ..db.database import get_db, get_async_db
+from .pagination import PageParams, page_params, with_next_cursor
+from .responses import Detail, typed_json
 
 router = APIRouter()
 
@@ -15,7 +19,23 @@ class AssignRequest(BaseModel):
     # Accept either a date or a full datetime; pydantic will parse an ISO string
     due_date: Optional[datetime] = None
 
-@router.post("/", response_model=dict)
+class AssignmentOut(TypedDict):
+    id: int
+    service_request_id: Optional[int]
+    staff_id: Optional[int]
+    confirmed: Optional[bool]
+
+ASSIGNMENT_LIST = TypeAdapter(List[AssignmentOut])
+
+def serialize_assignment(assignment: models.Assignment) -> AssignmentOut:
+    return {
+        "id": assignment.id,
+        "service_request_id": assignment.service_request_id,
+        "staff_id": assignment.staff_id,
+        "confirmed": assignment.confirmed,
+    }
+
+@router.post("/", response_model=AssignmentOut)
 def assign_staff(payload: AssignRequest, db: Session = Depends(get_db)):
     assignment = crud.assign_staff_to_patient_request(
         db,
@@ -24,33 +44,28 @@ def assign_staff(payload: AssignRequest, db: Session = Depends(get_db)):
         priority=payload.priority,
         due_date=payload.due_date,
     )
-    return {
-        "id": assignment.id,
-        "service_request_id": assignment.service_request_id,
-        "staff_id": assignment.staff_id,
-        "confirmed": assignment.confirmed,
-    }
+    return serialize_assignment(assignment)
 
-@router.get("/{assignment_id}", response_model=dict)
-def get_assignment(assignment_id: int, db: Session = Depends(get_db)):
-    assignment = crud.get_assignment(db, assignment_id)
+@router.get("/{assignment_id}", response_model=AssignmentOut)
+async def get_assignment(assignment_id: int, db: AsyncSession = Depends(get_async_db)):
+    assignment = await async_crud.get_assignment(db, assignment_id)
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
-    return {"id": assignment.id, "service_request_id": assignment.service_request_id, "staff_id": assignment.staff_id}
+    return serialize_assignment(assignment)
 
-@router.get("/", response_model=List[dict])
-def list_assignments(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    assignments = crud.list_assignments(db, skip=skip, limit=limit)
-    return [{"id": a.id, "service_request_id": a.service_request_id, "staff_id": a.staff_id} for a in assignments]
+@router.get("/", response_model=List[AssignmentOut])
+async def list_assignments(response: Response, page: PageParams = Depends(page_params), db: AsyncSession = Depends(get_async_db)):
+    assignments = with_next_cursor(response, await async_crud.list_assignments(db, skip=page.skip, limit=page.limit, after=page.after))
+    return typed_json(ASSIGNMENT_LIST, [serialize_assignment(a) for a in assignments], response)
 
-@router.put("/{assignment_id}", response_model=dict)
+@router.put("/{assignment_id}", response_model=AssignmentOut)
 def update_assignment(assignment_id: int, confirmed: bool = None, db: Session = Depends(get_db)):
     assignment = crud.update_assignment(db, assignment_id, confirmed=confirmed)
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
-    return {"id": assignment.id, "service_request_id": assignment.service_request_id, "staff_id": assignment.staff_id, "confirmed": assignment.confirmed}
+    return serialize_assignment(assignment)
 
-@router.delete("/{assignment_id}", response_model=dict)
+@router.delete("/{assignment_id}", response_model=Detail)
 def delete_assignment(assignment_id: int, db: Session = Depends(get_db)):
     assignment = crud.delete_assignment(db, assignment_id)
     if not assignment:
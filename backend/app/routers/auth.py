@@ -6,6 +6,7 @@ from sqlalchemy import func
 from typing import Optional, List
 
 from ..db import models
+from ..services.privileges import load_role
 from .security import verify_password, create_access_token, get_db, get_password_hash
 
 router = APIRouter()
@@ -44,19 +45,21 @@ def login(req: LoginRequest, db: Session = Depends(get_db)):
 
     role_name = None
     privilege_codes: List[str] = []
-    if user.role_id:
-        # Use Session.get for reliable primary key fetching
-        r = db.get(models.Role, user.role_id)
-        role_name = r.name if r else None
-        if r and getattr(r, 'privileges', None):
-            try:
-                privilege_codes = [p.code for p in r.privileges if p and p.code]
-            except Exception:
-                privilege_codes = []
+    role_version = None
+    # Read straight from the database so the token's rv is the current version
+    compiled = load_role(db, user.role_id) if user.role_id else None
+    if compiled:
+        role_name = compiled.name
+        privilege_codes = sorted(compiled.privileges)
+        role_version = compiled.version
 
     claims = {}
+    if user.email:
+        # Audit columns (createdby) are filled from this claim without a lookup
+        claims["email"] = user.email
     if role_name:
         claims["role"] = role_name
+        claims["rv"] = role_version
     if privilege_codes:
         claims["privileges"] = privilege_codes
 
@@ -172,7 +175,7 @@ def resend_verification(
     """
     Resend verification email to a user
     """
-    from ..utils.emailer import send_email
+    from ..utils.emailer import queue_email
     import secrets
     import os
     
@@ -203,9 +206,8 @@ def resend_verification(
         expires_at=expires
     )
     db.add(rec)
-    db.commit()
     
-    # Send verification email
+    # Queue verification email in the same transaction as the token
     frontend_base = os.getenv("FRONTEND_BASE_URL", "http://localhost:5173")
     verify_link = f"{frontend_base}/verify?token={token}"
     backend_verify = os.getenv("BACKEND_BASE_URL", "http://localhost:8000") + f"/auth/verify_email?token={token}"
@@ -224,8 +226,6 @@ def resend_verification(
         </div>
     """
     
-    try:
-        send_email("Verify your email", user.email, html)
-        return {"detail": "Verification email sent successfully", "email": user.email}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to send email: {str(e)}")
+    queue_email(db, "Verify your email", user.email, html)
+    db.commit()
+    return {"detail": "Verification email sent successfully", "email": user.email}
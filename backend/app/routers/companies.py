@@ -1,7 +1,7 @@
 """
 Company Management API Endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
 from typing import Optional, List
@@ -10,7 +10,10 @@ import secrets
 
 from ..db import models
 from ..db.database import get_db
+from ..db.pagination import keyset, to_page
 from .security import get_password_hash, verify_password, create_access_token, get_current_user
+from .pagination import PageParams, page_params, with_next_cursor
+from ..services.principals import Principal
 
 router = APIRouter()
 
@@ -112,7 +115,7 @@ def company_login(req: CompanyLoginRequest, db: Session = Depends(get_db)):
 
 @router.get("/api-key", response_model=CompanyApiKeyResponse, summary="Get or create company API key")
 def get_company_api_key(
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -159,7 +162,7 @@ def get_company_api_key(
 
 @router.post("/api-key/regenerate", response_model=CompanyApiKeyResponse, summary="Regenerate company API key")
 def regenerate_company_api_key(
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -247,9 +250,9 @@ def create_company(company: CompanyCreate, db: Session = Depends(get_db)):
 
 @router.get("/", response_model=List[CompanyResponse])
 def list_companies(
-    skip: int = 0,
-    limit: int = 100,
-    current_user: models.User = Depends(get_current_user),
+    response: Response,
+    page: PageParams = Depends(page_params),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -257,13 +260,14 @@ def list_companies(
     """
     # TODO: Add role-based access control
     # For now, return all companies
-    companies = db.query(models.Company).offset(skip).limit(limit).all()
-    return companies
+    keys = (models.Company.id,)
+    query = keyset(db.query(models.Company), keys, after=page.after, limit=page.limit, skip=page.skip)
+    return with_next_cursor(response, to_page(query.all(), keys, page.limit))
 
 @router.get("/{company_id}", response_model=CompanyResponse)
 def get_company(
     company_id: int,
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -283,7 +287,7 @@ def get_company(
 def update_company(
     company_id: int,
     company_update: CompanyUpdate,
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -317,7 +321,7 @@ def update_company(
 @router.delete("/{company_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_company(
     company_id: int,
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -346,7 +350,7 @@ class DiscordWebhookUpdate(BaseModel):
 
 @router.get("/discord-webhook", summary="Get company Discord webhook URL")
 def get_discord_webhook(
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -374,7 +378,7 @@ def get_discord_webhook(
 @router.put("/discord-webhook", summary="Update company Discord webhook URL")
 def update_discord_webhook(
     webhook_data: DiscordWebhookUpdate,
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -12,7 +12,8 @@ from datetime import datetime
 from ..db import models
 from ..db.database import get_db
 from .security import get_current_user, get_password_hash
-from ..utils.emailer import send_email
+from ..utils.emailer import queue_email
+from ..services.principals import Principal
 import os
 
 router = APIRouter()
@@ -100,10 +101,9 @@ def register_docs_user(user_data: DocsUserRegister, db: Session = Depends(get_db
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    db.flush()
     
-    # Send welcome email
+    # Queue welcome email (committed with the user, delivered by the outbox sender)
     try:
         base_url = os.getenv("FRONTEND_BASE_URL", "https://api.hremsoftconsulting.com")
         login_url = f"{base_url}/docs-website/login"
@@ -175,7 +175,8 @@ def register_docs_user(user_data: DocsUserRegister, db: Session = Depends(get_db
         </html>
         """
         
-        send_email(
+        queue_email(
+            db,
             subject="Welcome to Healthcare API Documentation! 🎉",
             to_email=new_user.email,
             html_body=html_body,
@@ -183,7 +184,10 @@ def register_docs_user(user_data: DocsUserRegister, db: Session = Depends(get_db
         )
     except Exception as e:
         # Don't fail registration if email fails
-        print(f"[Email Warning] Failed to send welcome email: {e}")
+        print(f"[Email Warning] Failed to queue welcome email: {e}")
+    
+    db.commit()
+    db.refresh(new_user)
     
     return {
         "id": new_user.id,
@@ -194,7 +198,7 @@ def register_docs_user(user_data: DocsUserRegister, db: Session = Depends(get_db
 
 @router.get("/api-key", response_model=ApiKeyResponse, summary="Get or create API key for current user", dependencies=[Depends(get_current_user)])
 def get_api_key(
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -236,7 +240,7 @@ def get_api_key(
 
 @router.post("/api-key/regenerate", response_model=ApiKeyResponse, summary="Regenerate API key", dependencies=[Depends(get_current_user)])
 def regenerate_api_key(
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -268,7 +272,7 @@ def regenerate_api_key(
 
 @router.delete("/api-key", summary="Revoke API key", dependencies=[Depends(get_current_user)])
 def revoke_api_key(
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
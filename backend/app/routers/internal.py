@@ -0,0 +1,71 @@
+"""
+Internal Operations API (admin only)
+"""
+import os
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..db.database import SessionLocal, pool_status
+from ..services.email_outbox import outbox_counts, sender_stats
+from ..services.live_hub import live_hub
+from ..services.location_ingest import location_buffer
+from ..services.request_metrics import N_PLUS_ONE_THRESHOLD, PROMETHEUS_CONTENT_TYPE, registry
+from ..services.staff_index import staff_index
+
+# Role names allowed to call /internal/* (comma separated)
+INTERNAL_ROLES = [r.strip() for r in os.getenv("INTERNAL_ROLES", "Admin,admin").split(",") if r.strip()]
+
+router = APIRouter()
+
+
+@router.get("/db/pool", summary="Live database connection pool statistics")
+def db_pool():
+    """
+    Pool size, checked-out and overflow connections, plus counters and a
+    cumulative histogram of how long checkouts waited for a connection.
+    """
+    return pool_status()
+
+
+@router.get("/location/buffer", summary="GPS ingestion buffer statistics")
+def location_buffer_stats():
+    """Pending fixes, tracked users and accepted / dropped / written counters"""
+    return location_buffer.stats()
+
+
+@router.get("/map/staff-index", summary="Nearest-staff spatial index statistics")
+def staff_index_stats():
+    """Indexed staff, occupied grid cells and time since the last full rebuild"""
+    return staff_index.stats()
+
+
+@router.get("/live", summary="Live feed subscribers and event counters")
+async def live_stats():
+    """Backplane, subscribers per channel, published and dropped events"""
+    return live_hub.stats()
+
+
+@router.get("/email/outbox", summary="Email outbox queue and sender statistics")
+def email_outbox_stats():
+    """Outbox rows per status plus this worker's sender counters"""
+    db = SessionLocal()
+    try:
+        return {"queue": outbox_counts(db), "sender": sender_stats()}
+    finally:
+        db.close()
+
+
+@router.get("/metrics", response_class=PlainTextResponse, summary="Per-route request metrics (Prometheus format)")
+def metrics():
+    """
+    Request count, latency histogram, DB time, queries, rows, pool wait and N+1
+    flags per route template, for this worker process
+    """
+    return PlainTextResponse(registry.prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@router.get("/requests", summary="Per-route request metrics and N+1 statements")
+def request_stats():
+    """Averages per route template, busiest first, with the statements flagged as N+1"""
+    return {"n_plus_one_threshold": N_PLUS_ONE_THRESHOLD, "routes": registry.snapshot()}
@@ -0,0 +1,62 @@
+"""
+Live dashboard feed over WebSocket
+
+    ws(s)://<host>/ws/live?token=<JWT>[&topics=location,shift]
+
+Browsers cannot set an Authorization header on a WebSocket, so the access token
+travels in the query string (an `Authorization: Bearer` header works too). The
+socket joins the caller's tenant channel; see app/services/live_hub.py for the
+event shapes. Anything the client sends is ignored (use it as a keep-alive).
+"""
+import asyncio
+import json
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from starlette.concurrency import run_in_threadpool
+
+from ..services.live_hub import TOPICS, channel_for, live_hub
+from .security import authenticate
+
+router = APIRouter()
+
+
+async def _pump(websocket: WebSocket, sub) -> None:
+    while True:
+        await websocket.send_text(await sub.queue.get())
+
+
+@router.websocket("/live")
+async def live_feed(
+    websocket: WebSocket,
+    token: Optional[str] = Query(None),
+    topics: Optional[str] = Query(None, description="Comma separated subset of: location, shift"),
+):
+    auth = websocket.headers.get("authorization") or ""
+    if not token and auth.lower().startswith("bearer "):
+        token = auth.split()[1]
+    principal = None
+    if token:
+        try:
+            principal = await run_in_threadpool(authenticate, token)
+        except HTTPException:
+            principal = None
+    if principal is None or not principal.is_active:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    wanted = [t.strip() for t in topics.split(",")] if topics else TOPICS
+    sub = live_hub.subscribe(channel_for(principal.company_id), wanted)
+    sender = None
+    try:
+        await websocket.send_text(json.dumps({"type": "hello", "channel": sub.channel, "topics": sorted(sub.topics)}))
+        sender = asyncio.create_task(_pump(websocket, sub))
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if sender is not None:
+            sender.cancel()
+        live_hub.unsubscribe(sub)
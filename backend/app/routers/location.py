@@ -1,12 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 from ..db import models
-from ..db.database import get_db
+from ..db.database import get_async_db, get_read_db
+from ..services import location_history, location_ingest
 from .security import get_current_active_user
+from ..services.principals import Principal
 
 router = APIRouter()
 
@@ -23,66 +27,95 @@ class LocationResponse(BaseModel):
     longitude: float
     updated_profile: Optional[str] = None  # 'staff' or 'patient'
 
+class LocationBatch(BaseModel):
+    fixes: List[LocationUpdate] = Field(..., min_length=1, max_length=500, description="Fixes recorded since the last upload")
+
+class LocationBatchResponse(BaseModel):
+    accepted: int
+    dropped: Dict[str, int]
+
+class TrailPoint(BaseModel):
+    timestamp: datetime
+    latitude: float
+    longitude: float
+
+class ShiftTrailResponse(BaseModel):
+    shift_id: int
+    staff_id: Optional[int]
+    total_fixes: int
+    returned: int
+    points: List[TrailPoint]
+
+def _fix(current_user, location: LocationUpdate) -> location_ingest.Fix:
+    return location_ingest.Fix(
+        user_id=current_user.id,
+        email=current_user.email,
+        latitude=location.latitude,
+        longitude=location.longitude,
+        accuracy=location.accuracy,
+        timestamp=location_ingest.to_utc(location.timestamp),
+        company_id=current_user.company_id,
+    )
+
 @router.post("/update", response_model=LocationResponse, summary="Update current user's GPS location")
 def update_my_location(
     location: LocationUpdate,
-    current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
 ):
     """
-    Update the current authenticated user's GPS coordinates.
-    Automatically updates staff or patient profile based on user role.
+    Queue the current user's GPS coordinates.
+    The staff or patient profile is updated by the next background flush; stale,
+    inaccurate and unchanged fixes are dropped.
     """
-    updated_profile = None
-    
-    # Try to update staff profile first
-    staff = db.query(models.Staff).filter(models.Staff.user_id == current_user.id).first()
-    if staff:
-        staff.latitude = location.latitude
-        staff.longitude = location.longitude
-        updated_profile = 'staff'
-        db.commit()
-    
-    # If no staff profile, try to update patient profile
-    if not updated_profile:
-        patient = db.query(models.Patient).filter(
-            models.Patient.email == current_user.email
-        ).first()
-        
-        if patient:
-            patient.latitude = location.latitude
-            patient.longitude = location.longitude
-            updated_profile = 'patient'
-            db.commit()
-    
-    # If neither profile exists, return success but note no profile was updated
-    if not updated_profile:
-        return LocationResponse(
-            success=True,
-            message="Location received but no staff/patient profile found to update",
-            latitude=location.latitude,
-            longitude=location.longitude,
-            updated_profile=None
-        )
-    
+    accepted, dropped = location_ingest.ingest([_fix(current_user, location)])
+    updated_profile = location_ingest.profile_of(current_user.id)
+    if not accepted:
+        message = f"Location ignored ({next(iter(dropped))})"
+    else:
+        message = f"Location queued for {updated_profile or 'profile'} update"
     return LocationResponse(
         success=True,
-        message=f"Location updated successfully for {updated_profile} profile",
+        message=message,
         latitude=location.latitude,
         longitude=location.longitude,
         updated_profile=updated_profile
     )
 
+@router.post("/batch", response_model=LocationBatchResponse, summary="Upload several GPS fixes at once")
+def update_my_location_batch(
+    batch: LocationBatch,
+    current_user: Principal = Depends(get_current_active_user),
+):
+    """
+    Queue fixes a device collected between uploads; only the newest accepted one
+    is written.
+    """
+    accepted, dropped = location_ingest.ingest([_fix(current_user, f) for f in batch.fixes])
+    return LocationBatchResponse(accepted=accepted, dropped=dropped)
+
 @router.get("/current", summary="Get current user's location")
-def get_my_location(
-    current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+async def get_my_location(
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Get the current authenticated user's stored GPS coordinates.
+    Get the current authenticated user's GPS coordinates (buffered fix first,
+    then the stored profile).
     """
+    latest = location_ingest.location_buffer.latest(current_user.id)
+    source = location_ingest.profile_of(current_user.id)
+    if latest is not None and source:
+        return {
+            "latitude": latest.latitude,
+            "longitude": latest.longitude,
+            "source": source,
+            "user_id": current_user.id
+        }
+
     # Check staff profile first
-    staff = db.query(models.Staff).filter(models.Staff.user_id == current_user.id).first()
+    staff = (await db.execute(
+        select(models.Staff).where(models.Staff.user_id == current_user.id)
+    )).scalars().first()
     if staff and staff.latitude is not None and staff.longitude is not None:
         return {
             "latitude": staff.latitude,
@@ -92,9 +125,9 @@ def get_my_location(
         }
     
     # Check patient profile
-    patient = db.query(models.Patient).filter(
-        models.Patient.email == current_user.email
-    ).first()
+    patient = (await db.execute(
+        select(models.Patient).where(models.Patient.email == current_user.email)
+    )).scalars().first()
     
     if patient and patient.latitude is not None and patient.longitude is not None:
         return {
@@ -109,3 +142,42 @@ def get_my_location(
         detail="No location data found for current user"
     )
 
+
+@router.get("/shifts/{shift_id}/trail", response_model=ShiftTrailResponse, summary="Breadcrumb trail recorded during a shift")
+def get_shift_trail(
+    shift_id: int,
+    start: Optional[datetime] = Query(None, description="Only fixes at or after this time (UTC)"),
+    end: Optional[datetime] = Query(None, description="Only fixes at or before this time (UTC)"),
+    tolerance_m: float = Query(0, ge=0, le=1000, description="Douglas-Peucker tolerance in metres; 0 returns every fix"),
+    current_user: Principal = Depends(get_current_active_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    The GPS fixes recorded while the shift was running, oldest first, optionally
+    limited to a time range and simplified.
+    """
+    row = db.execute(
+        select(models.Shift.staff_id, models.User.company_id)
+        .outerjoin(models.Staff, models.Staff.id == models.Shift.staff_id)
+        .outerjoin(models.User, models.User.id == models.Staff.user_id)
+        .where(models.Shift.id == shift_id)
+    ).first()
+    if row is None or (current_user.company_id is not None and row.company_id != current_user.company_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Shift not found")
+    total, trail = location_history.shift_trail(
+        db,
+        shift_id,
+        start=location_ingest.to_utc(start) if start else None,
+        end=location_ingest.to_utc(end) if end else None,
+        tolerance_m=tolerance_m,
+    )
+    return {
+        "shift_id": shift_id,
+        "staff_id": row.staff_id,
+        "total_fixes": total,
+        "returned": len(trail),
+        "points": [
+            {"timestamp": location_history.to_timestamp(ms), "latitude": lat, "longitude": lng}
+            for ms, lat, lng in trail.tolist()
+        ],
+    }
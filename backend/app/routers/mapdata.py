@@ -1,82 +1,139 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from typing import List
-from ..db import models
-from ..db.database import get_db
+from datetime import datetime
+from fastapi import APIRouter, Depends, Query, Response
+from pydantic import TypeAdapter
+from typing_extensions import TypedDict
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from ..db.database import get_async_read_db
+from ..services import map_data
+from ..services.location_ingest import to_utc
+from ..services.staff_index import staff_index
+from .responses import typed_json
+from .security import get_current_active_user
+from ..services.principals import Principal
 
 router = APIRouter()
 
 
-@router.get("/union_staff", response_model=List[dict], summary="Join users with staff by user_id")
-def union_staff(db: Session = Depends(get_db)):
-    rows = (
-        db.query(
-            models.User.id.label("user_id"),
-            models.User.full_name.label("name"),
-            models.User.email.label("email"),
-            models.Staff.id.label("staff_id"),
-            models.Staff.latitude.label("latitude"),
-            models.Staff.longitude.label("longitude"),
-        )
-        .join(models.Staff, models.Staff.user_id == models.User.id)
-        .all()
+def _map_filters(
+    bbox: Optional[str] = Query(None, description="Viewport as west,south,east,north"),
+    zoom: Optional[int] = Query(None, ge=0, le=22, description="Map zoom; lower zooms return clusters"),
+    company_id: Optional[int] = Query(None),
+    since: Optional[datetime] = Query(None, description="X-Map-Watermark of the previous poll; only changed rows"),
+    current_user: Principal = Depends(get_current_active_user),
+) -> dict:
+    return {
+        "bbox": map_data.parse_bbox(bbox),
+        "zoom": zoom,
+        # Company users only ever see their own company
+        "company_id": current_user.company_id if current_user.company_id is not None else company_id,
+        "since": to_utc(since) if since else None,
+    }
+
+
+class StaffMapItem(TypedDict, total=False):
+    """A staff marker, or at low zooms a cluster: count + centroid (staff_id set when count == 1)"""
+    user_id: int
+    name: Optional[str]
+    email: Optional[str]
+    staff_id: Optional[int]
+    latitude: Optional[float]
+    longitude: Optional[float]
+    count: int
+
+
+class PatientMapItem(TypedDict, total=False):
+    """A patient marker, or at low zooms a cluster: count + centroid (patient_id set when count == 1)"""
+    user_id: int
+    name: Optional[str]
+    email: Optional[str]
+    patient_id: Optional[int]
+    address: Optional[str]
+    latitude: Optional[float]
+    longitude: Optional[float]
+    count: int
+
+
+STAFF_MAP_ITEMS = TypeAdapter(List[StaffMapItem])
+PATIENT_MAP_ITEMS = TypeAdapter(List[PatientMapItem])
+
+
+async def _map_response(response: Response, db: AsyncSession, source, filters: dict, adapter: TypeAdapter) -> Response:
+    items, watermark, truncated = await map_data.map_items(db, source, **filters)
+    response.headers[map_data.WATERMARK_HEADER] = watermark
+    if truncated:
+        response.headers[map_data.TRUNCATED_HEADER] = "true"
+    return typed_json(adapter, items, response)
+
+
+@router.get("/union_staff", response_model=List[StaffMapItem], summary="Join users with staff by user_id")
+async def union_staff(
+    response: Response,
+    filters: dict = Depends(_map_filters),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Staff positions for the map. Low zooms return cluster centroids with counts;
+    see app/services/map_data.py for bbox / since semantics.
+    """
+    return await _map_response(response, db, map_data.STAFF, filters, STAFF_MAP_ITEMS)
+
+
+@router.get("/union_patients", response_model=List[PatientMapItem], summary="Join users with patients by email")
+async def union_patients(
+    response: Response,
+    filters: dict = Depends(_map_filters),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Patient positions for the map, with the same filters and clustering as
+    /union_staff.
+    """
+    return await _map_response(response, db, map_data.PATIENTS, filters, PATIENT_MAP_ITEMS)
+
+
+class NearestStaff(TypedDict):
+    staff_id: int
+    user_id: Optional[int]
+    name: Optional[str]
+    latitude: float
+    longitude: float
+    distance_km: float
+    available: bool
+    skills: List[str]
+
+
+NEAREST_STAFF_LIST = TypeAdapter(List[NearestStaff])
+
+
+@router.get("/nearest_staff", response_model=List[NearestStaff], summary="Nearest staff to a point, closest first")
+def nearest_staff(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    k: int = Query(10, ge=1, le=100, description="Maximum number of staff to return"),
+    skill: Optional[str] = Query(None, description="Only staff listing this skill (case-insensitive)"),
+    radius_km: Optional[float] = Query(None, gt=0, le=20000),
+    available_only: bool = Query(True),
+    current_user: Principal = Depends(get_current_active_user),
+):
+    """
+    Served from the in-memory staff index; staff of other companies are excluded
+    for company users.
+    """
+    hits = staff_index.nearest(
+        lat, lng, k=k, radius_km=radius_km, skill=skill,
+        company_id=current_user.company_id, available_only=available_only,
     )
-    return [
-        {
-            "user_id": r.user_id,
-            "name": r.name,
-            "email": r.email,
-            "staff_id": r.staff_id,
-            "latitude": r.latitude,
-            "longitude": r.longitude,
-        }
-        for r in rows
-    ]
-
-
-@router.get("/union_patients", response_model=List[dict], summary="Join users with patients (by user_id if available, otherwise by email)")
-def union_patients(db: Session = Depends(get_db)):
-    # Prefer join on patient.user_id if the column exists; otherwise fallback to email equality
-    # We detect availability by trying attribute access on model; SQLAlchemy will error if not present
-    has_user_id = hasattr(models.Patient, "user_id")
-    if has_user_id:
-        q = (
-            db.query(
-                models.User.id.label("user_id"),
-                models.User.full_name.label("name"),
-                models.User.email.label("email"),
-                models.Patient.id.label("patient_id"),
-                models.Patient.address.label("address"),
-                models.Patient.latitude.label("latitude"),
-                models.Patient.longitude.label("longitude"),
-            )
-            .join(models.Patient, models.Patient.user_id == models.User.id)
-        )
-    else:
-        q = (
-            db.query(
-                models.User.id.label("user_id"),
-                models.User.full_name.label("name"),
-                models.User.email.label("email"),
-                models.Patient.id.label("patient_id"),
-                models.Patient.address.label("address"),
-                models.Patient.latitude.label("latitude"),
-                models.Patient.longitude.label("longitude"),
-            )
-            .join(models.Patient, models.Patient.email == models.User.email)
-        )
-    rows = q.all()
-    return [
+    return typed_json(NEAREST_STAFF_LIST, [
         {
-            "user_id": r.user_id,
-            "name": r.name,
-            "email": r.email,
-            "patient_id": r.patient_id,
-            "address": r.address,
-            "latitude": r.latitude,
-            "longitude": r.longitude,
+            "staff_id": p.staff_id,
+            "user_id": p.user_id,
+            "name": p.name,
+            "latitude": p.latitude,
+            "longitude": p.longitude,
+            "distance_km": round(distance, 3),
+            "available": p.available,
+            "skills": sorted(p.skills),
         }
-        for r in rows
-    ]
-
-
+        for distance, p in hits
+    ])
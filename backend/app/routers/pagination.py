@@ -0,0 +1,39 @@
+"""
+Cursor pagination parameters shared by the list routes
+
+    GET /staff?limit=100                 -> first page, X-Next-Cursor: <cursor>
+    GET /staff?limit=100&after=<cursor>  -> next page; no header on the last page
+
+Bodies stay plain JSON arrays; the next cursor travels in the X-Next-Cursor header.
+"""
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import Query, Response
+
+from ..db.pagination import Page
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+
+
+@dataclass(frozen=True)
+class PageParams:
+    after: Optional[str]
+    limit: int
+    skip: int
+
+
+def page_params(
+    after: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header"),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    skip: int = Query(0, ge=0, description="Deprecated offset paging; use `after`"),
+) -> PageParams:
+    return PageParams(after=after, limit=limit, skip=skip)
+
+
+def with_next_cursor(response: Response, page: Page) -> Page:
+    if page.next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+    return page
@@ -1,22 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
-from typing import List
-from ..db import models, crud
-from ..db.database import get_db
+from typing import List, Optional
+from pydantic import TypeAdapter
+from typing_extensions import TypedDict
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..db import models, crud, async_crud
+from ..db.database import get_db, get_async_db
 from .security import get_current_active_user
+from .pagination import PageParams, page_params, with_next_cursor
+from .responses import Detail, typed_json
+from ..services.exports import aiter_rows, export_format, stream_export
+from ..services.principals import Principal
 
 router = APIRouter()
 
-@router.post("/", response_model=dict, summary="Create patient (public for registration)")
-def create_patient(full_name: str, address: str = None, latitude: float = None, longitude: float = None, phone: str = None, email: str = None, db: Session = Depends(get_db)):
-    patient = crud.create_patient(db, full_name, address, latitude, longitude, phone, email)
-    return {"id": patient.id, "full_name": patient.full_name}
+class PatientOut(TypedDict):
+    id: int
+    full_name: Optional[str]
+    address: Optional[str]
+    latitude: Optional[float]
+    longitude: Optional[float]
+    email: Optional[str]
+    phone: Optional[str]
 
-@router.get("/{patient_id}", response_model=dict, summary="Get patient (requires JWT)")
-def get_patient(patient_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
-    patient = crud.get_patient(db, patient_id)
-    if not patient:
-        raise HTTPException(status_code=404, detail="Patient not found")
+PATIENT_LIST = TypeAdapter(List[PatientOut])
+
+def serialize_patient(patient: models.Patient) -> PatientOut:
     return {
         "id": patient.id,
         "full_name": patient.full_name,
@@ -27,28 +37,34 @@ def get_patient(patient_id: int, db: Session = Depends(get_db), current_user: mo
         "phone": patient.phone,
     }
 
-@router.get("/", response_model=List[dict], summary="List patients (requires JWT)")
-def list_patients(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
-    patients = crud.list_patients(db, skip=skip, limit=limit)
-    return [{
-        "id": p.id,
-        "full_name": p.full_name,
-        "address": p.address,
-        "latitude": p.latitude,
-        "longitude": p.longitude,
-        "email": p.email,
-        "phone": p.phone,
-    } for p in patients]
-
-@router.put("/{patient_id}", response_model=dict, summary="Update patient (requires JWT)")
-def update_patient(patient_id: int, full_name: str = None, address: str = None, latitude: float = None, longitude: float = None, phone: str = None, email: str = None, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+@router.post("/", response_model=PatientOut, summary="Create patient (public for registration)")
+def create_patient(full_name: str, address: str = None, latitude: float = None, longitude: float = None, phone: str = None, email: str = None, db: Session = Depends(get_db)):
+    patient = crud.create_patient(db, full_name, address, latitude, longitude, phone, email)
+    return serialize_patient(patient)
+
+@router.get("/{patient_id}", response_model=PatientOut, summary="Get patient (requires JWT)")
+async def get_patient(patient_id: int, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(get_current_active_user)):
+    patient = await async_crud.get_patient(db, patient_id)
+    if not patient:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    return serialize_patient(patient)
+
+@router.get("/", response_model=List[PatientOut], summary="List patients (requires JWT)")
+async def list_patients(response: Response, page: PageParams = Depends(page_params), export: Optional[str] = Depends(export_format), db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(get_current_active_user)):
+    if export:
+        return stream_export(export, aiter_rows(select(models.Patient).order_by(models.Patient.id), serialize_patient), "patients")
+    patients = with_next_cursor(response, await async_crud.list_patients(db, skip=page.skip, limit=page.limit, after=page.after))
+    return typed_json(PATIENT_LIST, [serialize_patient(p) for p in patients], response)
+
+@router.put("/{patient_id}", response_model=PatientOut, summary="Update patient (requires JWT)")
+def update_patient(patient_id: int, full_name: str = None, address: str = None, latitude: float = None, longitude: float = None, phone: str = None, email: str = None, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_active_user)):
     patient = crud.update_patient(db, patient_id, full_name=full_name, address=address, latitude=latitude, longitude=longitude, phone=phone, email=email)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
-    return {"id": patient.id, "full_name": patient.full_name}
+    return serialize_patient(patient)
 
-@router.delete("/{patient_id}", response_model=dict, summary="Delete patient (requires JWT)")
-def delete_patient(patient_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+@router.delete("/{patient_id}", response_model=Detail, summary="Delete patient (requires JWT)")
+def delete_patient(patient_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_active_user)):
     patient = crud.delete_patient(db, patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
@@ -1,16 +1,26 @@
 """
 Enhanced Payroll API with Tax Calculations
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from datetime import datetime
+import asyncio
+import json
 
 from ..db import models
-from ..db.database import get_db
+from ..db.database import get_db, get_read_db, SessionLocal
+from ..db.pagination import keyset, to_page
 from .security import get_current_user
+from .pagination import PageParams, page_params, with_next_cursor
+from ..services.exports import export_format, iter_rows, stream_export
 from ..services.payroll_service import PayrollProcessor
+from ..services import ytd_ledger, payroll_jobs
+from ..services.principals import Principal
 
 router = APIRouter()
 
@@ -50,10 +60,74 @@ class PayrollResponse(BaseModel):
     class Config:
         from_attributes = True
 
+def serialize_payroll(payroll: models.Payroll) -> dict:
+    return PayrollResponse.model_validate(payroll).model_dump(mode="json")
+
+class PayrollJobError(BaseModel):
+    staff_id: Optional[int]
+    error: str
+
+class PayrollJobResponse(BaseModel):
+    id: int
+    company_id: int
+    pay_period_start: datetime
+    pay_period_end: datetime
+    status: str
+    total_staff: int
+    processed_staff: int
+    succeeded: int
+    failed: int
+    progress: float
+    errors: List[PayrollJobError]
+    error: Optional[str]
+    created_at: Optional[datetime]
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    heartbeat_at: Optional[datetime]
+
+def serialize_job(job: models.PayrollJob) -> dict:
+    total = job.total_staff or 0
+    processed = job.processed_staff or 0
+    finished = job.status in (models.PayrollJobStatus.COMPLETED, models.PayrollJobStatus.FAILED)
+    return {
+        "id": job.id,
+        "company_id": job.company_id,
+        "pay_period_start": job.pay_period_start,
+        "pay_period_end": job.pay_period_end,
+        "status": job.status.value if job.status else None,
+        "total_staff": total,
+        "processed_staff": processed,
+        "succeeded": job.succeeded or 0,
+        "failed": job.failed or 0,
+        "progress": 1.0 if finished else (round(processed / total, 4) if total else 0.0),
+        "errors": job.errors or [],
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "heartbeat_at": job.heartbeat_at,
+    }
+
+def _get_job_for_user(db: Session, job_id: int, current_user: Principal) -> models.PayrollJob:
+    job = db.get(models.PayrollJob, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Payroll job not found"
+        )
+    
+    # Check company access
+    if current_user.company_id and job.company_id != current_user.company_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
+        )
+    return job
+
 @router.post("/process", response_model=PayrollResponse, summary="Process payroll for a staff member")
 def process_staff_payroll(
     request: PayrollProcessRequest,
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -81,66 +155,149 @@ def process_staff_payroll(
             detail=f"Error processing payroll: {str(e)}"
         )
 
-@router.post("/process/bulk", response_model=List[PayrollResponse], summary="Process payroll for all staff in a company")
+@router.post(
+    "/process/bulk",
+    response_model=PayrollJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Submit a payroll job for all staff in a company"
+)
 def process_bulk_payroll(
     request: BulkPayrollProcessRequest,
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    Process payroll for all active staff in a company for a given pay period
+    Queue payroll processing for all active staff in a company for a given pay period.
+    Returns immediately; poll GET /jobs/{id} for progress and GET /jobs/{id}/results
+    for the created payroll records.
     """
     # TODO: Add permission check - only company admin should be able to do this
-    
-    processor = PayrollProcessor(db)
+    if current_user.company_id and request.company_id != current_user.company_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
+        )
     
     try:
-        payrolls = processor.bulk_process_payroll(
+        job = payroll_jobs.submit_bulk_job(
+            db,
             company_id=request.company_id,
             pay_period_start=request.pay_period_start,
-            pay_period_end=request.pay_period_end
+            pay_period_end=request.pay_period_end,
+            created_by=current_user.email or f"user:{current_user.id}"
         )
-        return payrolls
+        return serialize_job(job)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error processing bulk payroll: {str(e)}"
+            detail=f"Error submitting bulk payroll: {str(e)}"
         )
 
+@router.get("/jobs/{job_id}", response_model=PayrollJobResponse, summary="Bulk payroll job progress")
+def get_payroll_job(
+    job_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Progress, per-staff errors and status of a bulk payroll job"""
+    return serialize_job(_get_job_for_user(db, job_id, current_user))
+
+@router.get("/jobs/{job_id}/stream", summary="Stream bulk payroll job progress (NDJSON)")
+async def stream_payroll_job(
+    job_id: int,
+    interval: float = 1.0,
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Stream one JSON progress snapshot per line until the job finishes.
+    Snapshots are only emitted when progress changes.
+    """
+    def _snapshot() -> dict:
+        db = SessionLocal()
+        try:
+            return serialize_job(_get_job_for_user(db, job_id, current_user))
+        finally:
+            db.close()
+
+    first = await run_in_threadpool(_snapshot)
+    interval = min(max(interval, 0.25), 10.0)
+
+    async def _events():
+        snapshot, last = first, None
+        while True:
+            if snapshot != last:
+                yield json.dumps(PayrollJobResponse(**snapshot).model_dump(mode="json")) + "\n"
+                last = snapshot
+            if snapshot["status"] in ("completed", "failed"):
+                return
+            await asyncio.sleep(interval)
+            snapshot = await run_in_threadpool(_snapshot)
+
+    return StreamingResponse(_events(), media_type="application/x-ndjson")
+
+@router.get("/jobs/{job_id}/results", response_model=List[PayrollResponse], summary="Payroll records created by a job")
+def get_payroll_job_results(
+    job_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Payroll records created by a finished bulk payroll job"""
+    job = _get_job_for_user(db, job_id, current_user)
+    if job.status in (models.PayrollJobStatus.QUEUED, models.PayrollJobStatus.RUNNING):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Payroll job is {job.status.value}"
+        )
+    payroll_ids = job.payroll_ids or []
+    if not payroll_ids:
+        return []
+    return db.query(models.Payroll).filter(
+        models.Payroll.id.in_(payroll_ids)
+    ).order_by(models.Payroll.id).all()
+
+# Newest first; id breaks ties between rows generated in the same instant
+PAYROLL_LIST_KEYS = (models.Payroll.generated_at, models.Payroll.id)
+
+
+def payroll_listing(company_id: Optional[int] = None, staff_id: Optional[int] = None, status: Optional[str] = None):
+    """The payroll list query before ordering and paging"""
+    stmt = select(models.Payroll)
+    if company_id:
+        stmt = stmt.where(models.Payroll.company_id == company_id)
+    if staff_id:
+        stmt = stmt.where(models.Payroll.staff_id == staff_id)
+    if status:
+        stmt = stmt.where(models.Payroll.status == status)
+    return stmt
+
+
 @router.get("/", response_model=List[PayrollResponse], summary="List payroll records")
 def list_payrolls(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    page: PageParams = Depends(page_params),
     staff_id: Optional[int] = None,
     status: Optional[str] = None,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    export: Optional[str] = Depends(export_format),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
 ):
     """
     List payroll records with optional filtering
     Automatically filters by company for non-admin users
     """
-    query = db.query(models.Payroll)
-    
     # Filter by company for multi-tenancy
-    if current_user.company_id:
-        query = query.filter(models.Payroll.company_id == current_user.company_id)
-    
-    if staff_id:
-        query = query.filter(models.Payroll.staff_id == staff_id)
-    
-    if status:
-        query = query.filter(models.Payroll.status == status)
-    
-    query = query.order_by(models.Payroll.generated_at.desc())
-    payrolls = query.offset(skip).limit(limit).all()
-    
-    return payrolls
+    query = payroll_listing(current_user.company_id, staff_id, status)
+    keys = PAYROLL_LIST_KEYS
+    if export:
+        stmt = query.order_by(*[k.desc() for k in keys])
+        return stream_export(export, iter_rows(stmt, serialize_payroll), "payroll")
+    query = keyset(query, keys, after=page.after, limit=page.limit, descending=True, skip=page.skip)
+    return with_next_cursor(response, to_page(db.execute(query).scalars().all(), keys, page.limit))
 
 @router.get("/{payroll_id}", response_model=PayrollResponse)
 def get_payroll(
     payroll_id: int,
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get payroll record by ID"""
@@ -163,11 +320,11 @@ def get_payroll(
 @router.put("/{payroll_id}/approve", response_model=PayrollResponse)
 def approve_payroll(
     payroll_id: int,
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Approve a payroll record"""
-    payroll = db.get(models.Payroll, payroll_id)
+    payroll = db.get(models.Payroll, payroll_id, with_for_update=True)
     if not payroll:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -181,7 +338,15 @@ def approve_payroll(
             detail="Access denied"
         )
     
+    if payroll.status == models.PayrollStatus.VOID:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Void payroll records cannot be approved"
+        )
+    
+    old_status = payroll.status
     payroll.status = models.PayrollStatus.APPROVED
+    ytd_ledger.record_status_change(db, payroll, old_status)
     db.commit()
     db.refresh(payroll)
     
@@ -190,11 +355,11 @@ def approve_payroll(
 @router.put("/{payroll_id}/mark-paid", response_model=PayrollResponse)
 def mark_payroll_paid(
     payroll_id: int,
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Mark a payroll record as paid"""
-    payroll = db.get(models.Payroll, payroll_id)
+    payroll = db.get(models.Payroll, payroll_id, with_for_update=True)
     if not payroll:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -208,8 +373,57 @@ def mark_payroll_paid(
             detail="Access denied"
         )
     
+    if payroll.status == models.PayrollStatus.VOID:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Void payroll records cannot be marked paid"
+        )
+    
+    old_status = payroll.status
     payroll.status = models.PayrollStatus.PAID
     payroll.paid_at = datetime.utcnow()
+    ytd_ledger.record_status_change(db, payroll, old_status)
+    db.commit()
+    db.refresh(payroll)
+    
+    return payroll
+
+@router.put("/{payroll_id}/void", response_model=PayrollResponse)
+def void_payroll(
+    payroll_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Void a payroll record and remove it from the YTD ledger"""
+    payroll = db.get(models.Payroll, payroll_id, with_for_update=True)
+    if not payroll:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Payroll record not found"
+        )
+    
+    # Check company access
+    if current_user.company_id and payroll.company_id != current_user.company_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
+        )
+    
+    if payroll.status == models.PayrollStatus.VOID:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Void payroll records cannot be voided again"
+        )
+    
+    if payroll.status == models.PayrollStatus.PAID:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Paid payroll records cannot be voided"
+        )
+    
+    old_status = payroll.status
+    payroll.status = models.PayrollStatus.VOID
+    ytd_ledger.record_status_change(db, payroll, old_status)
     db.commit()
     db.refresh(payroll)
     
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 from typing import List
-from ..db import models, crud
+from ..db import crud
 from ..db.database import get_db
 from .security import get_current_active_user
+from .pagination import PageParams, page_params, with_next_cursor
+from ..services.principals import Principal
 
 router = APIRouter()
 
@@ -20,19 +22,19 @@ def get_privilege(privilege_id: int, db: Session = Depends(get_db)):
     return {"id": privilege.id, "code": privilege.code, "description": privilege.description}
 
 @router.get("/", response_model=List[dict], summary="List privileges (public for registration)")
-def list_privileges(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    privileges = crud.list_privileges(db, skip=skip, limit=limit)
+def list_privileges(response: Response, page: PageParams = Depends(page_params), db: Session = Depends(get_db)):
+    privileges = with_next_cursor(response, crud.list_privileges(db, skip=page.skip, limit=page.limit, after=page.after))
     return [{"id": p.id, "code": p.code, "description": p.description} for p in privileges]
 
 @router.put("/{privilege_id}", response_model=dict, summary="Update privilege (requires JWT)")
-def update_privilege(privilege_id: int, code: str = None, description: str = None, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+def update_privilege(privilege_id: int, code: str = None, description: str = None, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_active_user)):
     privilege = crud.update_privilege(db, privilege_id, code=code, description=description)
     if not privilege:
         raise HTTPException(status_code=404, detail="Privilege not found")
     return {"id": privilege.id, "code": privilege.code, "description": privilege.description}
 
 @router.delete("/{privilege_id}", response_model=dict, summary="Delete privilege (requires JWT)")
-def delete_privilege(privilege_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+def delete_privilege(privilege_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_active_user)):
     privilege = crud.delete_privilege(db, privilege_id)
     if not privilege:
         raise HTTPException(status_code=404, detail="Privilege not found")
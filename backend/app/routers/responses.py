@@ -0,0 +1,38 @@
+"""
+Typed JSON responses
+
+The app's default response class is ORJSONResponse, so anything a route returns
+is rendered by orjson (datetimes and enums natively, no isoformat() needed).
+
+Routers describe their rows as TypedDicts (StaffOut, TimesheetOut, ...), used as
+response_model for the OpenAPI schema and for validating single-row responses.
+List routes skip per-row validation: their rows come from the router's own
+serializer, so a TypeAdapter built once at import encodes them to JSON bytes
+in one pass through pydantic-core:
+
+    STAFF_LIST = TypeAdapter(List[StaffOut])
+    ...
+    return typed_json(STAFF_LIST, [serialize_staff(s) for s in rows], response)
+
+Only the TypedDict's keys are written. Headers set on the injected `response`
+(e.g. X-Next-Cursor) are carried over.
+"""
+from typing import Any, Optional
+
+from fastapi import Response
+from pydantic import TypeAdapter
+from typing_extensions import TypedDict
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+class Detail(TypedDict):
+    """Plain acknowledgement, e.g. of a delete"""
+    detail: str
+
+
+def typed_json(adapter: TypeAdapter, rows: Any, response: Optional[Response] = None, status_code: int = 200) -> Response:
+    out = Response(content=adapter.dump_json(rows), status_code=status_code, media_type=JSON_MEDIA_TYPE)
+    if response is not None:
+        out.headers.raw.extend(response.headers.raw)
+    return out
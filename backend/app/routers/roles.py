@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 from typing import List
 from ..db import models, crud
 from ..db.database import get_db
 from .security import get_current_active_user
+from .pagination import PageParams, page_params, with_next_cursor
+from ..services.principals import Principal
 
 router = APIRouter()
 
@@ -50,8 +52,8 @@ def get_role(role_id: int, db: Session = Depends(get_db)):
 # LIST ALL ROLES
 # --------------------------
 @router.get("/", response_model=List[dict], summary="List roles (public for registration)")
-def list_roles(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    roles = crud.list_roles(db, skip=skip, limit=limit)
+def list_roles(response: Response, page: PageParams = Depends(page_params), db: Session = Depends(get_db)):
+    roles = with_next_cursor(response, crud.list_roles(db, skip=page.skip, limit=page.limit, after=page.after))
     return [
         {
             "id": r.id,
@@ -87,7 +89,7 @@ def update_role(role_id: int, name: str = None, description: str = None, privile
 # DELETE ROLE
 # --------------------------
 @router.delete("/{role_id}", response_model=dict, summary="Delete role (requires JWT)")
-def delete_role(role_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+def delete_role(role_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_active_user)):
     role = crud.delete_role(db, role_id)
     if not role:
         raise HTTPException(status_code=404, detail="Role not found")
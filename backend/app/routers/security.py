@@ -2,14 +2,16 @@ import os
 from datetime import datetime, timedelta
 from typing import Optional, List
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
 
-from ..db import models
+from ..db import crud
 from ..db.database import SessionLocal
+from ..services.principals import Principal, get_principal
+from ..services.privileges import CompiledRole, compile_codes, role_registry
 
 SECRET_KEY = os.getenv('SECRET_KEY', 'change-me-in-prod')
 ALGORITHM = os.getenv('JWT_ALGORITHM', 'HS256')
@@ -61,12 +63,14 @@ def decode_access_token(token: str) -> dict:
         )
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> models.User:
+def authenticate(token: str) -> Principal:
     """
-    Validates JWT token and returns the current authenticated user.
+    Resolves a JWT to its (cached) principal.
     Raises 401 if token is invalid or user not found.
     """
-    payload = decode_access_token(token)
+    return principal_from_claims(decode_access_token(token))
+
+def principal_from_claims(payload: dict) -> Principal:
     user_id = payload.get('sub')
     if user_id is None:
         raise HTTPException(
@@ -74,16 +78,38 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             detail='Invalid token payload',
             headers={'WWW-Authenticate': 'Bearer'}
         )
-    user = db.get(models.User, int(user_id))
-    if not user:
+    principal = get_principal(int(user_id))
+    if not principal:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, 
             detail='User not found',
             headers={'WWW-Authenticate': 'Bearer'}
         )
-    return user
+    return principal
+
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme)) -> Principal:
+    """
+    Resolves the bearer token to a principal and caches it (with the token and
+    its claims) on request.state, so the router-level dependency and the route's
+    own Depends(get_current_user) decode and look up the user once per request.
+    Async so that authenticated async endpoints never need a threadpool slot.
+    """
+    principal = getattr(request.state, 'principal', None)
+    if principal is not None and getattr(request.state, 'token', None) == token:
+        return principal
+    payload = decode_access_token(token)
+    principal = await run_in_threadpool(principal_from_claims, payload)
+    request.state.principal = principal
+    request.state.token = token
+    request.state.claims = payload
+    return principal
 
-def get_current_active_user(current_user: models.User = Depends(get_current_user)) -> models.User:
+def _compiled_role(request: Request, current_user: Principal) -> Optional[CompiledRole]:
+    """The user's compiled role; the token's rv claim forces a reload if it is newer"""
+    claims = getattr(request.state, 'claims', None) or {}
+    return role_registry.get(current_user.role_id, claimed_version=claims.get('rv'))
+
+async def get_current_active_user(current_user: Principal = Depends(get_current_user)) -> Principal:
     if not current_user.is_active:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Inactive user')
     return current_user
@@ -93,12 +119,10 @@ def roles_required(allowed_roles: List[str]):
     Dependency that requires the current user to have one of the specified roles.
     Usage: Depends(roles_required(['admin', 'manager']))
     """
-    def _dependency(current_user: models.User = Depends(get_current_active_user), db: Session = Depends(get_db)):
-        role_name = None
-        if current_user.role_id:
-            r = db.get(models.Role, current_user.role_id)
-            role_name = r.name if r else None
-        if role_name not in allowed_roles:
+    allowed = frozenset(allowed_roles)
+    def _dependency(request: Request, current_user: Principal = Depends(get_current_active_user)):
+        role = _compiled_role(request, current_user)
+        if role is None or role.name not in allowed:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN, 
                 detail=f'Insufficient privileges. Required roles: {", ".join(allowed_roles)}'
@@ -111,21 +135,67 @@ def privileges_required(required_codes: List[str]):
     Dependency that requires the current user to have all specified privilege codes.
     Usage: Depends(privileges_required(['read_patients', 'write_patients']))
     """
-    required = [c.lower() for c in required_codes or []]
-    def _dependency(current_user: models.User = Depends(get_current_active_user), db: Session = Depends(get_db)):
-        codes: List[str] = []
-        if current_user.role_id:
-            r = db.get(models.Role, current_user.role_id)
-            if r and getattr(r, 'privileges', None):
-                try:
-                    codes = [p.code.lower() for p in r.privileges if p and p.code]
-                except Exception:
-                    codes = []
-        missing = [code for code in required if code not in codes]
-        if missing:
+    required = compile_codes(required_codes or [])
+    def _dependency(request: Request, current_user: Principal = Depends(get_current_active_user)):
+        role = _compiled_role(request, current_user)
+        granted = role.privileges if role else frozenset()
+        if not required <= granted:
+            missing = sorted(required - granted)
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN, 
                 detail=f'Insufficient privileges. Missing: {", ".join(missing)}'
             )
         return current_user
     return _dependency
+
+
+# =========================================================
+# Audit context (createdby) middleware
+# =========================================================
+def _bearer_token(scope) -> Optional[str]:
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token.strip():
+                return token.strip()
+            return None
+    return None
+
+def creator_from_scope(scope) -> Optional[str]:
+    """
+    The request's creator for audit columns, from verified token claims: the
+    claims get_current_user already decoded for this request, else the bearer token.
+    """
+    state = scope.get("state") or {}
+    claims = state.get("claims")
+    if claims is None:
+        token = _bearer_token(scope)
+        if token is None:
+            return None
+        claims = decode_access_token(token)
+    if claims.get("email"):
+        return claims["email"]
+    if claims.get("type") == "company" or claims.get("sub") is None:
+        return None
+    # Tokens issued before the email claim existed
+    principal = state.get("principal") or get_principal(int(claims["sub"]))
+    return principal.created_by if principal else None
+
+class AuditContextMiddleware:
+    """
+    Pure ASGI middleware giving each HTTP request its crud audit context.
+    Nothing is decoded or looked up here: crud.get_created_by() resolves the
+    creator on first use, so requests that never write pay nothing.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        reset = crud.set_created_by_resolver(lambda: creator_from_scope(scope))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            crud.reset_created_by(reset)
@@ -1,36 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from pydantic import TypeAdapter
+from typing_extensions import TypedDict
 from sqlalchemy.orm import Session
-from typing import List
-from ..db import crud
-from ..db.database import get_db
+from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..db import crud, async_crud, models
+from ..db.database import get_db, get_async_db
+from .pagination import PageParams, page_params, with_next_cursor
+from .responses import Detail, typed_json
 
 router = APIRouter()
 
-@router.post("/", response_model=dict)
+class ServiceRequestOut(TypedDict):
+    id: int
+    patient_id: Optional[int]
+    status: Optional[models.RequestStatus]
+
+SERVICE_REQUEST_LIST = TypeAdapter(List[ServiceRequestOut])
+
+def serialize_request(sr: models.ServiceRequest) -> ServiceRequestOut:
+    return {"id": sr.id, "patient_id": sr.patient_id, "status": sr.status}
+
+@router.post("/", response_model=ServiceRequestOut)
 def create_request(patient_id: int, description: str, required_skill: str, db: Session = Depends(get_db)):
     sr = crud.create_service_request(db, patient_id=patient_id, description=description, required_skill=required_skill)
-    return {"id": sr.id, "patient_id": sr.patient_id, "status": sr.status.value}
+    return serialize_request(sr)
 
-@router.get("/{request_id}", response_model=dict)
-def get_request(request_id: int, db: Session = Depends(get_db)):
-    sr = crud.get_service_request(db, request_id)
+@router.get("/{request_id}", response_model=ServiceRequestOut)
+async def get_request(request_id: int, db: AsyncSession = Depends(get_async_db)):
+    sr = await async_crud.get_service_request(db, request_id)
     if not sr:
         raise HTTPException(status_code=404, detail="Service request not found")
-    return {"id": sr.id, "patient_id": sr.patient_id, "status": sr.status.value}
+    return serialize_request(sr)
 
-@router.get("/", response_model=List[dict])
-def list_requests(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    requests = crud.list_service_requests(db, skip=skip, limit=limit)
-    return [{"id": r.id, "patient_id": r.patient_id, "status": r.status.value} for r in requests]
+@router.get("/", response_model=List[ServiceRequestOut])
+async def list_requests(response: Response, page: PageParams = Depends(page_params), db: AsyncSession = Depends(get_async_db)):
+    requests = with_next_cursor(response, await async_crud.list_service_requests(db, skip=page.skip, limit=page.limit, after=page.after))
+    return typed_json(SERVICE_REQUEST_LIST, [serialize_request(r) for r in requests], response)
 
-@router.put("/{request_id}", response_model=dict)
+@router.put("/{request_id}", response_model=ServiceRequestOut)
 def update_request(request_id: int, description: str = None, required_skill: str = None, status: str = None, db: Session = Depends(get_db)):
     sr = crud.update_service_request(db, request_id, description=description, required_skill=required_skill, status=status)
     if not sr:
         raise HTTPException(status_code=404, detail="Service request not found")
-    return {"id": sr.id, "patient_id": sr.patient_id, "status": sr.status.value}
+    return serialize_request(sr)
 
-@router.delete("/{request_id}", response_model=dict)
+@router.delete("/{request_id}", response_model=Detail)
 def delete_request(request_id: int, db: Session = Depends(get_db)):
     sr = crud.delete_service_request(db, request_id)
     if not sr:
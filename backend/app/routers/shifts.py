@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List
 from ..db import crud
 from ..db.database import get_db
+from ..services import location_ingest
 
 router = APIRouter()
 
@@ -13,6 +14,7 @@ def start_shift(staff_id: int, start_lat: float = None, start_lng: float = None,
 
 @router.put("/{shift_id}/end", response_model=dict)
 def end_shift(shift_id: int, end_lat: float = None, end_lng: float = None, db: Session = Depends(get_db)):
+    location_ingest.end_shift(shift_id)
     shift = crud.end_shift(db, shift_id, end_lat, end_lng)
     if not shift:
         raise HTTPException(status_code=404, detail="Shift not found")
@@ -1,22 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
-from typing import List
-from ..db import models, crud
-from ..db.database import get_db
+from typing import List, Optional
+from pydantic import TypeAdapter
+from typing_extensions import TypedDict
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..db import models, crud, async_crud
+from ..db.database import get_db, get_async_db
 from .security import get_current_active_user
+from .pagination import PageParams, page_params, with_next_cursor
+from .responses import Detail, typed_json
+from ..services.exports import aiter_rows, export_format, stream_export
+from ..services.principals import Principal
 
 router = APIRouter()
 
-@router.post("/", response_model=dict, summary="Create staff (public for registration)")
-def create_staff(user_id: int, license_number: str = None, skills: list = None, latitude: float = None, longitude: float = None, db: Session = Depends(get_db)):
-    staff = crud.create_staff(db, user_id=user_id, license_number=license_number, skills=skills, latitude=latitude, longitude=longitude)
-    return {"id": staff.id, "user_id": staff.user_id, "skills": staff.skills}
+class StaffOut(TypedDict):
+    id: int
+    user_id: Optional[int]
+    skills: Optional[list]
+    latitude: Optional[float]
+    longitude: Optional[float]
 
-@router.get("/{staff_id}", response_model=dict, summary="Get staff (requires JWT)")
-def get_staff(staff_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
-    staff = crud.get_staff(db, staff_id)
-    if not staff:
-        raise HTTPException(status_code=404, detail="Staff not found")
+STAFF_LIST = TypeAdapter(List[StaffOut])
+
+def serialize_staff(staff: models.Staff) -> StaffOut:
     return {
         "id": staff.id,
         "user_id": staff.user_id,
@@ -25,26 +33,34 @@ def get_staff(staff_id: int, db: Session = Depends(get_db), current_user: models
         "longitude": staff.longitude,
     }
 
-@router.get("/", response_model=List[dict], summary="List staff (requires JWT)")
-def list_staff(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
-    staff_list = crud.list_staff(db, skip=skip, limit=limit)
-    return [{
-        "id": s.id,
-        "user_id": s.user_id,
-        "skills": s.skills,
-        "latitude": s.latitude,
-        "longitude": s.longitude,
-    } for s in staff_list]
-
-@router.put("/{staff_id}", response_model=dict, summary="Update staff (requires JWT)")
-def update_staff(staff_id: int, license_number: str = None, skills: list = None, latitude: float = None, longitude: float = None, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+@router.post("/", response_model=StaffOut, summary="Create staff (public for registration)")
+def create_staff(user_id: int, license_number: str = None, skills: list = None, latitude: float = None, longitude: float = None, db: Session = Depends(get_db)):
+    staff = crud.create_staff(db, user_id=user_id, license_number=license_number, skills=skills, latitude=latitude, longitude=longitude)
+    return serialize_staff(staff)
+
+@router.get("/{staff_id}", response_model=StaffOut, summary="Get staff (requires JWT)")
+async def get_staff(staff_id: int, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(get_current_active_user)):
+    staff = await async_crud.get_staff(db, staff_id)
+    if not staff:
+        raise HTTPException(status_code=404, detail="Staff not found")
+    return serialize_staff(staff)
+
+@router.get("/", response_model=List[StaffOut], summary="List staff (requires JWT)")
+async def list_staff(response: Response, page: PageParams = Depends(page_params), export: Optional[str] = Depends(export_format), db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(get_current_active_user)):
+    if export:
+        return stream_export(export, aiter_rows(select(models.Staff).order_by(models.Staff.id), serialize_staff), "staff")
+    staff_list = with_next_cursor(response, await async_crud.list_staff(db, skip=page.skip, limit=page.limit, after=page.after))
+    return typed_json(STAFF_LIST, [serialize_staff(s) for s in staff_list], response)
+
+@router.put("/{staff_id}", response_model=StaffOut, summary="Update staff (requires JWT)")
+def update_staff(staff_id: int, license_number: str = None, skills: list = None, latitude: float = None, longitude: float = None, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_active_user)):
     staff = crud.update_staff(db, staff_id, license_number=license_number, skills=skills, latitude=latitude, longitude=longitude)
     if not staff:
         raise HTTPException(status_code=404, detail="Staff not found")
-    return {"id": staff.id, "user_id": staff.user_id, "skills": staff.skills}
+    return serialize_staff(staff)
 
-@router.delete("/{staff_id}", response_model=dict, summary="Delete staff (requires JWT)")
-def delete_staff(staff_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+@router.delete("/{staff_id}", response_model=Detail, summary="Delete staff (requires JWT)")
+def delete_staff(staff_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_active_user)):
     staff = crud.delete_staff(db, staff_id)
     if not staff:
         raise HTTPException(status_code=404, detail="Staff not found")
@@ -1,7 +1,7 @@
 """
 Staff Salary Configuration API
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
@@ -9,7 +9,10 @@ from datetime import datetime
 
 from ..db import models
 from ..db.database import get_db
+from ..db.pagination import keyset, to_page
 from .security import get_current_user
+from .pagination import PageParams, page_params, with_next_cursor
+from ..services.principals import Principal
 
 router = APIRouter()
 
@@ -60,7 +63,7 @@ class SalaryConfigResponse(BaseModel):
 @router.post("/", response_model=SalaryConfigResponse, status_code=status.HTTP_201_CREATED)
 def create_salary_config(
     config: SalaryConfigCreate,
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create salary configuration for a staff member"""
@@ -123,10 +126,10 @@ def create_salary_config(
 
 @router.get("/", response_model=List[SalaryConfigResponse])
 def list_salary_configs(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    page: PageParams = Depends(page_params),
     staff_id: Optional[int] = None,
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """List salary configurations"""
@@ -139,13 +142,14 @@ def list_salary_configs(
     if staff_id:
         query = query.filter(models.StaffSalaryConfig.staff_id == staff_id)
     
-    configs = query.offset(skip).limit(limit).all()
-    return configs
+    keys = (models.StaffSalaryConfig.id,)
+    query = keyset(query, keys, after=page.after, limit=page.limit, skip=page.skip)
+    return with_next_cursor(response, to_page(query.all(), keys, page.limit))
 
 @router.get("/{config_id}", response_model=SalaryConfigResponse)
 def get_salary_config(
     config_id: int,
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get salary configuration by ID"""
@@ -169,7 +173,7 @@ def get_salary_config(
 def update_salary_config(
     config_id: int,
     config_update: SalaryConfigUpdate,
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Update salary configuration"""
@@ -201,7 +205,7 @@ def update_salary_config(
 @router.delete("/{config_id}", status_code=status.HTTP_204_NO_CONTENT)
 def deactivate_salary_config(
     config_id: int,
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Deactivate salary configuration"""
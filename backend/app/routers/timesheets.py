@@ -1,10 +1,19 @@
+from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
-from typing import List
-from datetime import datetime
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, TypeAdapter
+from typing_extensions import TypedDict
 from ..db import crud, models
-from ..db.database import get_db
+from ..db.database import get_db, get_async_db
+from ..services import assignment_calendar
+from ..services.exports import aiter_rows, export_format, stream_export
+from .responses import typed_json
+from .security import get_current_active_user
+from ..services.principals import Principal
 
 router = APIRouter()
 
@@ -23,10 +32,44 @@ class TimesheetUpdate(BaseModel):
     shift_id: int | None = None
 
 
+class TimesheetOut(TypedDict):
+    id: int
+    staff_id: Optional[int]
+    staff_name: Optional[str]
+    staff_email: Optional[str]
+    staff_role: Optional[str]
+    total_hours: Optional[float]
+    submitted: Optional[bool]
+    verified: Optional[bool]
+    created_at: Optional[datetime]
+    shift_id: Optional[int]
+    shift_start: Optional[datetime]
+    shift_end: Optional[datetime]
+    shift_status: Optional[models.ShiftStatus]
+    start_lat: Optional[float]
+    start_lng: Optional[float]
+    end_lat: Optional[float]
+    end_lng: Optional[float]
+    timesheet_ref: str
+
+
+class TimesheetDeleted(TypedDict):
+    detail: str
+    timesheet: TimesheetOut
+
+
+TIMESHEET_LIST = TypeAdapter(List[TimesheetOut])
+
 DEFAULT_LIMIT = 250
 
+# Everything serialize_timesheet touches, loaded up front (required on AsyncSession)
+TIMESHEET_LOAD_OPTIONS = (
+    joinedload(models.Timesheet.staff).joinedload(models.Staff.user).joinedload(models.User.role),
+    joinedload(models.Timesheet.shift),
+)
 
-def serialize_timesheet(ts: models.Timesheet) -> dict:
+
+def serialize_timesheet(ts: models.Timesheet) -> TimesheetOut:
     if not ts:
         return {}
     staff = ts.staff
@@ -49,11 +92,11 @@ def serialize_timesheet(ts: models.Timesheet) -> dict:
         "total_hours": ts.total_hours,
         "submitted": ts.submitted,
         "verified": ts.verified,
-        "created_at": ts.created_at.isoformat() if ts.created_at else None,
+        "created_at": ts.created_at,
         "shift_id": ts.shift_id,
-        "shift_start": start_time.isoformat() if start_time else None,
-        "shift_end": end_time.isoformat() if end_time else None,
-        "shift_status": shift.status.value if shift and shift.status else None,
+        "shift_start": start_time,
+        "shift_end": end_time,
+        "shift_status": shift.status if shift else None,
         "start_lat": getattr(shift, "start_lat", None) if shift else None,
         "start_lng": getattr(shift, "start_lng", None) if shift else None,
         "end_lat": getattr(shift, "end_lat", None) if shift else None,
@@ -62,27 +105,85 @@ def serialize_timesheet(ts: models.Timesheet) -> dict:
     }
 
 
-@router.get("/", response_model=List[dict], summary="List timesheets with staff and shift details")
-def list_timesheets(
+# Listing fast path: exactly the columns serialize_timesheet outputs, as plain rows.
+# No identity map, no relationship walking; keep both in sync when adding fields.
+TIMESHEET_LISTING = (
+    select(
+        models.Timesheet.id,
+        models.Timesheet.staff_id,
+        models.User.full_name,
+        models.User.email,
+        models.Role.name,
+        models.Timesheet.total_hours,
+        models.Timesheet.submitted,
+        models.Timesheet.verified,
+        models.Timesheet.created_at,
+        models.Timesheet.shift_id,
+        models.Shift.start_time,
+        models.Shift.end_time,
+        models.Shift.status,
+        models.Shift.start_lat,
+        models.Shift.start_lng,
+        models.Shift.end_lat,
+        models.Shift.end_lng,
+    )
+    .select_from(models.Timesheet)
+    .outerjoin(models.Staff, models.Staff.id == models.Timesheet.staff_id)
+    .outerjoin(models.User, models.User.id == models.Staff.user_id)
+    .outerjoin(models.Role, models.Role.id == models.User.role_id)
+    .outerjoin(models.Shift, models.Shift.id == models.Timesheet.shift_id)
+)
+
+
+def timesheet_listing(staff_id: Optional[int] = None):
+    """TIMESHEET_LISTING as GET /timesheets/ orders and filters it, newest first"""
+    query = TIMESHEET_LISTING.order_by(models.Timesheet.created_at.desc())
+    if staff_id:
+        query = query.where(models.Timesheet.staff_id == staff_id)
+    return query
+
+
+def timesheet_row_to_dict(row) -> TimesheetOut:
+    """Same output as serialize_timesheet, from a TIMESHEET_LISTING row"""
+    (ts_id, staff_id, staff_name, staff_email, staff_role, total_hours, submitted, verified,
+     created_at, shift_id, start_time, end_time, shift_status, start_lat, start_lng, end_lat, end_lng) = row
+    return {
+        "id": ts_id,
+        "staff_id": staff_id,
+        "staff_name": staff_name or None,
+        "staff_email": staff_email,
+        "staff_role": staff_role,
+        "total_hours": total_hours,
+        "submitted": submitted,
+        "verified": verified,
+        "created_at": created_at,
+        "shift_id": shift_id,
+        "shift_start": start_time,
+        "shift_end": end_time,
+        "shift_status": shift_status,
+        "start_lat": start_lat,
+        "start_lng": start_lng,
+        "end_lat": end_lat,
+        "end_lng": end_lng,
+        "timesheet_ref": f"TS-{ts_id:05d}",
+    }
+
+
+@router.get("/", response_model=List[TimesheetOut], summary="List timesheets with staff and shift details")
+async def list_timesheets(
     staff_id: int | None = None,
     limit: int = DEFAULT_LIMIT,
-    db: Session = Depends(get_db),
+    export: Optional[str] = Depends(export_format),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    query = (
-        db.query(models.Timesheet)
-        .options(
-            joinedload(models.Timesheet.staff).joinedload(models.Staff.user).joinedload(models.User.role),
-            joinedload(models.Timesheet.shift),
-        )
-        .order_by(models.Timesheet.created_at.desc())
-    )
-    if staff_id:
-        query = query.filter(models.Timesheet.staff_id == staff_id)
-    timesheets = query.limit(limit).all()
-    return [serialize_timesheet(ts) for ts in timesheets]
+    query = timesheet_listing(staff_id)
+    if export:
+        return stream_export(export, aiter_rows(query, timesheet_row_to_dict, scalars=False), "timesheets")
+    rows = (await db.execute(query.limit(limit))).all()
+    return typed_json(TIMESHEET_LIST, [timesheet_row_to_dict(row) for row in rows])
 
 
-@router.post("/", response_model=dict)
+@router.post("/", response_model=TimesheetOut)
 def submit_timesheet(payload: TimesheetCreate, db: Session = Depends(get_db)):
     try:
         ts = crud.create_timesheet(db, payload.staff_id, payload.shift_id, payload.total_hours)
@@ -91,15 +192,17 @@ def submit_timesheet(payload: TimesheetCreate, db: Session = Depends(get_db)):
     return serialize_timesheet(ts)
 
 
-@router.get("/id/{timesheet_id}", response_model=dict)
-def get_timesheet(timesheet_id: int, db: Session = Depends(get_db)):
-    ts = crud.get_timesheet(db, timesheet_id)
+@router.get("/id/{timesheet_id}", response_model=TimesheetOut)
+async def get_timesheet(timesheet_id: int, db: AsyncSession = Depends(get_async_db)):
+    ts = (await db.execute(
+        select(models.Timesheet).options(*TIMESHEET_LOAD_OPTIONS).where(models.Timesheet.id == timesheet_id)
+    )).scalars().first()
     if not ts:
         raise HTTPException(status_code=404, detail="Timesheet not found")
     return serialize_timesheet(ts)
 
 
-@router.put("/{timesheet_id}", response_model=dict)
+@router.put("/{timesheet_id}", response_model=TimesheetOut)
 def update_timesheet(timesheet_id: int, payload: TimesheetUpdate, db: Session = Depends(get_db)):
     ts = crud.update_timesheet(db, timesheet_id, **payload.dict(exclude_none=True))
     if not ts:
@@ -107,7 +210,7 @@ def update_timesheet(timesheet_id: int, payload: TimesheetUpdate, db: Session =
     return serialize_timesheet(ts)
 
 
-@router.delete("/{timesheet_id}", response_model=dict)
+@router.delete("/{timesheet_id}", response_model=TimesheetDeleted)
 def remove_timesheet(timesheet_id: int, db: Session = Depends(get_db)):
     ts = crud.delete_timesheet(db, timesheet_id)
     if not ts:
@@ -116,92 +219,30 @@ def remove_timesheet(timesheet_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/assignments_by_day", response_model=dict, summary="List assignments grouped by day for a given month")
-def assignments_by_day(year: int, month: int, staff_id: int | None = None, db: Session = Depends(get_db)):
+async def assignments_by_day(
+    year: int,
+    month: int,
+    staff_id: int | None = None,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+):
     try:
-        start = datetime(year, month, 1)
-        next_month = month + 1
-        next_year = year + 1 if next_month == 13 else year
-        next_month = 1 if next_month == 13 else next_month
-        end = datetime(next_year, next_month, 1)
+        result = await assignment_calendar.assignments_by_day(db, year, month, company_id=current_user.company_id, staff_id=staff_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid year or month")
-
-    q = db.query(models.Assignment).filter(models.Assignment.assigned_at >= start, models.Assignment.assigned_at < end)
-    if staff_id:
-        q = q.filter(models.Assignment.staff_id == staff_id)
-    rows = q.all()
-
-    by_day: dict[str, list] = {}
-    for a in rows:
-        key = a.assigned_at.date().isoformat() if a.assigned_at else start.date().isoformat()
-        if key not in by_day:
-            by_day[key] = []
-        by_day[key].append({
-            "id": a.id,
-            "service_request_id": a.service_request_id,
-            "staff_id": a.staff_id,
-            "assigned_at": a.assigned_at.isoformat() if a.assigned_at else None,
-            "confirmed": a.confirmed,
-        })
-
-    days = [{"date": d, "count": len(items), "assignments": items} for d, items in sorted(by_day.items())]
-    return {"year": year, "month": month, "days": days}
+    # Already JSON-safe; skip re-encoding thousands of cached items per hit
+    return ORJSONResponse(result)
 
 
 @router.get("/monthly", response_model=dict, summary="All assignments in a month grouped by staff and day")
-def assignments_monthly(year: int, month: int, db: Session = Depends(get_db)):
+async def assignments_monthly(
+    year: int,
+    month: int,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+):
     try:
-        start = datetime(year, month, 1)
-        next_month = month + 1
-        next_year = year + 1 if next_month == 13 else year
-        next_month = 1 if next_month == 13 else next_month
-        end = datetime(next_year, next_month, 1)
+        result = await assignment_calendar.assignments_monthly(db, year, month, company_id=current_user.company_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid year or month")
-
-    rows = (
-        db.query(models.Assignment)
-        .options(
-            joinedload(models.Assignment.service_request).joinedload(models.ServiceRequest.patient),
-            joinedload(models.Assignment.staff).joinedload(models.Staff.user),
-        )
-        .filter(models.Assignment.assigned_at >= start, models.Assignment.assigned_at < end)
-        .all()
-    )
-
-    by_staff: dict[int, dict[str, list]] = {}
-    for a in rows:
-        staff_key = a.staff_id or 0
-        if staff_key not in by_staff:
-            by_staff[staff_key] = {}
-        day_key = a.assigned_at.date().isoformat() if a.assigned_at else start.date().isoformat()
-        if day_key not in by_staff[staff_key]:
-            by_staff[staff_key][day_key] = []
-        patient = getattr(a.service_request, 'patient', None)
-        user = getattr(a.staff, 'user', None)
-        by_staff[staff_key][day_key].append({
-            "id": a.id,
-            "service_request_id": a.service_request_id,
-            "staff_id": a.staff_id,
-            "staff_name": getattr(user, 'full_name', None),
-            "assigned_at": a.assigned_at.isoformat() if a.assigned_at else None,
-            "confirmed": a.confirmed,
-            "patient": {
-                "id": getattr(patient, 'id', None),
-                "name": getattr(patient, 'full_name', None),
-                "address": getattr(patient, 'address', None),
-                "latitude": getattr(patient, 'latitude', None),
-                "longitude": getattr(patient, 'longitude', None),
-            }
-        })
-
-    staff_blocks = []
-    for staff_key, days_map in by_staff.items():
-        staff_days = [{"date": d, "count": len(items), "assignments": items} for d, items in sorted(days_map.items())]
-        staff_blocks.append({
-            "staff_id": None if staff_key == 0 else staff_key,
-            "total_assignments": sum(len(items) for items in days_map.values()),
-            "days": staff_days,
-        })
-
-    return {"year": year, "month": month, "staff": staff_blocks}
+    return ORJSONResponse(result)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import os
@@ -6,8 +6,10 @@ import secrets
 from datetime import datetime, timedelta
 from ..db import models, crud
 from ..db.database import get_db
-from ..utils.emailer import send_email
+from ..utils.emailer import queue_email
 from .security import get_current_active_user
+from .pagination import PageParams, page_params, with_next_cursor
+from ..services.principals import Principal
 
 router = APIRouter()
 
@@ -22,65 +24,64 @@ def create_user(full_name: str, email: str, password_hash: str, role_id: Optiona
         role = db.query(models.Role).get(role_id)
         if role is None:
             raise HTTPException(status_code=400, detail="Invalid role_id: role not found")
-    user = crud.create_user(db, full_name=full_name, email=email, password_hash=password_hash, role_id=role_id, phone=phone)
+    user = crud.create_user(db, full_name=full_name, email=email, password_hash=password_hash, role_id=role_id, phone=phone, commit=False)
 
-    # Send verification + welcome email if email provided
+    # Queue verification + welcome email if email provided; the user row, token and
+    # outbox rows commit together and the outbox sender delivers them afterwards
     if email:
-        try:
-            token = secrets.token_urlsafe(32)
-            expires = datetime.utcnow() + timedelta(hours=48)
-            rec = models.EmailToken(user_id=user.id, email=email, token=token, purpose="verify", expires_at=expires)
-            db.add(rec)
-            db.commit()
+        token = secrets.token_urlsafe(32)
+        expires = datetime.utcnow() + timedelta(hours=48)
+        rec = models.EmailToken(user_id=user.id, email=email, token=token, purpose="verify", expires_at=expires)
+        db.add(rec)
 
-            frontend_base = os.getenv("FRONTEND_BASE_URL", "http://localhost:5173")
-            verify_link = f"{frontend_base}/verify?token={token}"
-            backend_verify = os.getenv("BACKEND_BASE_URL", "http://localhost:8000") + f"/auth/verify_email?token={token}"
+        frontend_base = os.getenv("FRONTEND_BASE_URL", "http://localhost:5173")
+        verify_link = f"{frontend_base}/verify?token={token}"
+        backend_verify = os.getenv("BACKEND_BASE_URL", "http://localhost:8000") + f"/auth/verify_email?token={token}"
 
-            html = f"""
-                <div style='font-family:system-ui,-apple-system,Segoe UI,Roboto,sans-serif'>
-                  <h2>Welcome to Healthcare Platform</h2>
-                  <p>Hi {full_name},</p>
-                  <p>Thanks for registering. Please verify your email address by clicking the button below:</p>
-                  <p><a href="{backend_verify}" style="display:inline-block;padding:10px 16px;background:#0ea5e9;color:#fff;border-radius:8px;text-decoration:none">Verify Email</a></p>
-                  <p>If the button doesn't work, copy this link:</p>
-                  <p><a href="{verify_link}">{verify_link}</a></p>
-                  <hr/>
-                  <p>Best regards,<br/>Healthcare Team</p>
-                </div>
-            """
-            send_email("Verify your email", email, html)
+        html = f"""
+            <div style='font-family:system-ui,-apple-system,Segoe UI,Roboto,sans-serif'>
+              <h2>Welcome to Healthcare Platform</h2>
+              <p>Hi {full_name},</p>
+              <p>Thanks for registering. Please verify your email address by clicking the button below:</p>
+              <p><a href="{backend_verify}" style="display:inline-block;padding:10px 16px;background:#0ea5e9;color:#fff;border-radius:8px;text-decoration:none">Verify Email</a></p>
+              <p>If the button doesn't work, copy this link:</p>
+              <p><a href="{verify_link}">{verify_link}</a></p>
+              <hr/>
+              <p>Best regards,<br/>Healthcare Team</p>
+            </div>
+        """
+        queue_email(db, "Verify your email", email, html)
 
-            # Welcome email (no token required)
-            welcome_html = f"""
-                <div style='font-family:system-ui,-apple-system,Segoe UI,Roboto,sans-serif'>
-                  <h2>Welcome, {full_name}!</h2>
-                  <p>Your account has been created successfully.</p>
-                  <p>You can login anytime at <a href="{frontend_base}/login">{frontend_base}/login</a>.</p>
-                  <p>— Healthcare Platform</p>
-                </div>
-            """
-            send_email("Welcome to Healthcare Platform", email, welcome_html)
-        except Exception:
-            # Do not fail user creation if email sending fails
-            pass
+        # Welcome email (no token required)
+        welcome_html = f"""
+            <div style='font-family:system-ui,-apple-system,Segoe UI,Roboto,sans-serif'>
+              <h2>Welcome, {full_name}!</h2>
+              <p>Your account has been created successfully.</p>
+              <p>You can login anytime at <a href="{frontend_base}/login">{frontend_base}/login</a>.</p>
+              <p>— Healthcare Platform</p>
+            </div>
+        """
+        queue_email(db, "Welcome to Healthcare Platform", email, welcome_html)
+
+    db.commit()
+    db.refresh(user)
 
     return {"id": user.id, "full_name": user.full_name, "email": user.email, "role_id": user.role_id}
 
 @router.get("/{user_id}", response_model=dict, summary="Get user (requires JWT)")
-def get_user(user_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+def get_user(user_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_active_user)):
     user = crud.get_user(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return {"id": user.id, "full_name": user.full_name, "email": user.email, "role_id": user.role_id}
 
 @router.get("/", response_model=List[dict], summary="List users (requires JWT)")
-def list_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
-    users = crud.list_users(db, skip=skip, limit=limit)
+def list_users(response: Response, page: PageParams = Depends(page_params), db: Session = Depends(get_db), current_user: Principal = Depends(get_current_active_user)):
+    users = with_next_cursor(response, crud.list_users(db, skip=page.skip, limit=page.limit, after=page.after))
     return [{"id": u.id, "full_name": u.full_name, "email": u.email, "role_id": u.role_id} for u in users]
 
 @router.put("/{user_id}", response_model=dict, summary="Update user (requires JWT)")
-def update_user(user_id: int, full_name: str = None, email: str = None, role_id: int = None, phone: str = None, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+def update_user(user_id: int, full_name: str = None, email: str = None, role_id: int = None, phone: str = None, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_active_user)):
     if email:
         other = db.query(models.User).filter(models.User.email == email, models.User.id != user_id).first()
         if other:
@@ -95,7 +96,7 @@ def update_user(user_id: int, full_name: str = None, email: str = None, role_id:
     return {"id": user.id, "full_name": user.full_name, "email": user.email, "role_id": user.role_id}
 
 @router.delete("/{user_id}", response_model=dict, summary="Delete user (requires JWT)")
-def delete_user(user_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+def delete_user(user_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_active_user)):
     user = crud.delete_user(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
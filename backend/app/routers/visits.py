@@ -1,35 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from pydantic import TypeAdapter
+from typing_extensions import TypedDict
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from ..db import crud, models
 from ..db.database import get_db
+from .pagination import PageParams, page_params, with_next_cursor
+from .responses import typed_json
 
 router = APIRouter()
 
-@router.post("/", response_model=dict)
+class VisitOut(TypedDict):
+    id: int
+    patient_id: Optional[int]
+    staff_id: Optional[int]
+    completed: Optional[bool]
+
+VISIT_LIST = TypeAdapter(List[VisitOut])
+
+def serialize_visit(visit: models.Visit) -> VisitOut:
+    return {"id": visit.id, "patient_id": visit.patient_id, "staff_id": visit.staff_id, "completed": getattr(visit, "completed", False)}
+
+@router.post("/", response_model=VisitOut)
 def create_visit(patient_id: int, staff_id: int, scheduled_time: str, notes: str = None, db: Session = Depends(get_db)):
     visit = crud.create_visit(db, patient_id=patient_id, staff_id=staff_id, scheduled_time=scheduled_time, notes=notes)
-    return {"id": visit.id, "patient_id": visit.patient_id, "staff_id": visit.staff_id, "completed": visit.completed}
+    return serialize_visit(visit)
 
-@router.get("/{visit_id}", response_model=dict)
+@router.get("/{visit_id}", response_model=VisitOut)
 def get_visit(visit_id: int, db: Session = Depends(get_db)):
     visit = crud.get_visit(db, visit_id)
     if not visit:
         raise HTTPException(status_code=404, detail="Visit not found")
-    return {"id": visit.id, "patient_id": visit.patient_id, "staff_id": visit.staff_id, "completed": visit.completed}
+    return serialize_visit(visit)
 
-@router.put("/{visit_id}", response_model=dict)
+@router.put("/{visit_id}", response_model=VisitOut)
 def complete_visit(visit_id: int, completed: bool = True, db: Session = Depends(get_db)):
     visit = crud.update_visit(db, visit_id, completed=completed)
     if not visit:
         raise HTTPException(status_code=404, detail="Visit not found")
-    return {"id": visit.id, "patient_id": visit.patient_id, "staff_id": visit.staff_id, "completed": visit.completed}
-
-@router.get("/", response_model=List[dict])
-def list_visits(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    # Use direct ORM query to avoid relying on missing CRUD helpers
-    visits = db.query(models.Visit).offset(skip).limit(limit).all()
-    return [
-        {"id": v.id, "patient_id": v.patient_id, "staff_id": v.staff_id, "completed": getattr(v, "completed", False)}
-        for v in visits
-    ]
+    return serialize_visit(visit)
+
+@router.get("/", response_model=List[VisitOut])
+def list_visits(response: Response, page: PageParams = Depends(page_params), db: Session = Depends(get_db)):
+    visits = with_next_cursor(response, crud.list_visits(db, skip=page.skip, limit=page.limit, after=page.after))
+    return typed_json(VISIT_LIST, [serialize_visit(v) for v in visits], response)
@@ -0,0 +1,221 @@
+"""
+Monthly assignment calendar
+
+Backs /timesheets/monthly and /timesheets/assignments_by_day. Each calendar is
+one column projection (no ORM objects are hydrated), grouped in the order SQL
+returns it. Results are kept per (company, year, month) in a TTL + LRU cache.
+
+Assignment inserts, updates and deletes drop the cached months they touch as
+soon as they are flushed and again after commit. CALENDAR_CACHE_TTL_SECONDS
+bounds how long other workers, or edits to patients and staff names, can serve
+a stale calendar.
+
+Calendars are read from the primary, never a replica: a miss right after an
+invalidation would otherwise refill the cache from a lagging replica and keep
+serving the old month for the whole TTL.
+"""
+import os
+from datetime import datetime
+from itertools import groupby
+from typing import Optional, Tuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..db import models
+from ..utils.cache import TTLCache
+
+CALENDAR_CACHE_SIZE = int(os.getenv("CALENDAR_CACHE_SIZE", "512"))
+CALENDAR_CACHE_TTL_SECONDS = float(os.getenv("CALENDAR_CACHE_TTL_SECONDS", "300"))
+
+calendar_cache = TTLCache(maxsize=CALENDAR_CACHE_SIZE, ttl_seconds=CALENDAR_CACHE_TTL_SECONDS)
+
+
+def month_bounds(year: int, month: int) -> Tuple[datetime, datetime]:
+    """[start, end) of the month; raises ValueError for an invalid year/month"""
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+
+def _day_blocks(rows, start: datetime, make_item) -> list:
+    """Consecutive rows (ordered by assigned_at) -> [{date, count, assignments}]"""
+    days = []
+    for day, items in groupby(rows, key=lambda r: (r.assigned_at or start).date()):
+        assignments = [make_item(r) for r in items]
+        days.append({"date": day.isoformat(), "count": len(assignments), "assignments": assignments})
+    return days
+
+
+# =========================================================
+# CALENDARS
+# =========================================================
+def by_day_statement(start: datetime, end: datetime, company_id: Optional[int] = None, staff_id: Optional[int] = None):
+    A = models.Assignment
+    stmt = (
+        select(A.id, A.service_request_id, A.staff_id, A.assigned_at, A.confirmed)
+        .where(A.assigned_at >= start, A.assigned_at < end)
+        .order_by(A.assigned_at, A.id)
+    )
+    if staff_id:
+        stmt = stmt.where(A.staff_id == staff_id)
+    if company_id:
+        stmt = (
+            stmt.join(models.Staff, models.Staff.id == A.staff_id)
+            .join(models.User, models.User.id == models.Staff.user_id)
+            .where(models.User.company_id == company_id)
+        )
+    return stmt
+
+
+def monthly_statement(start: datetime, end: datetime, company_id: Optional[int] = None):
+    A, P = models.Assignment, models.Patient
+    stmt = (
+        select(
+            A.id, A.service_request_id, A.staff_id, A.assigned_at, A.confirmed,
+            models.User.full_name.label("staff_name"),
+            P.id.label("patient_id"),
+            P.full_name.label("patient_name"),
+            P.address.label("patient_address"),
+            P.latitude.label("patient_latitude"),
+            P.longitude.label("patient_longitude"),
+        )
+        .outerjoin(models.Staff, models.Staff.id == A.staff_id)
+        .outerjoin(models.User, models.User.id == models.Staff.user_id)
+        .outerjoin(models.ServiceRequest, models.ServiceRequest.id == A.service_request_id)
+        .outerjoin(P, P.id == models.ServiceRequest.patient_id)
+        .where(A.assigned_at >= start, A.assigned_at < end)
+        .order_by(A.staff_id, A.assigned_at, A.id)
+    )
+    if company_id:
+        stmt = stmt.where(models.User.company_id == company_id)
+    return stmt
+
+
+async def assignments_by_day(db: AsyncSession, year: int, month: int,
+                             company_id: Optional[int] = None, staff_id: Optional[int] = None) -> dict:
+    key = ("by_day", company_id, year, month, staff_id)
+    cached = calendar_cache.get(key)
+    if cached is not None:
+        return cached
+
+    start, end = month_bounds(year, month)
+    rows = (await db.execute(by_day_statement(start, end, company_id, staff_id))).all()
+
+    days = _day_blocks(rows, start, lambda r: {
+        "id": r.id,
+        "service_request_id": r.service_request_id,
+        "staff_id": r.staff_id,
+        "assigned_at": r.assigned_at.isoformat() if r.assigned_at else None,
+        "confirmed": r.confirmed,
+    })
+    result = {"year": year, "month": month, "days": days}
+    calendar_cache.set(key, result)
+    return result
+
+
+async def assignments_monthly(db: AsyncSession, year: int, month: int, company_id: Optional[int] = None) -> dict:
+    key = ("monthly", company_id, year, month)
+    cached = calendar_cache.get(key)
+    if cached is not None:
+        return cached
+
+    start, end = month_bounds(year, month)
+    rows = (await db.execute(monthly_statement(start, end, company_id))).all()
+
+    def make_item(r):
+        return {
+            "id": r.id,
+            "service_request_id": r.service_request_id,
+            "staff_id": r.staff_id,
+            "staff_name": r.staff_name,
+            "assigned_at": r.assigned_at.isoformat() if r.assigned_at else None,
+            "confirmed": r.confirmed,
+            "patient": {
+                "id": r.patient_id,
+                "name": r.patient_name,
+                "address": r.patient_address,
+                "latitude": r.patient_latitude,
+                "longitude": r.patient_longitude,
+            },
+        }
+
+    staff_blocks = []
+    for staff_id, staff_rows in groupby(rows, key=lambda r: r.staff_id):
+        days = _day_blocks(staff_rows, start, make_item)
+        staff_blocks.append({
+            "staff_id": staff_id,
+            "total_assignments": sum(d["count"] for d in days),
+            "days": days,
+        })
+    result = {"year": year, "month": month, "staff": staff_blocks}
+    calendar_cache.set(key, result)
+    return result
+
+
+def invalidate(months: Optional[set] = None) -> None:
+    """Drop the cached calendars of the given (year, month) pairs, or all of them"""
+    if months is None:
+        calendar_cache.clear()
+    else:
+        calendar_cache.pop_matching(lambda key: (key[2], key[3]) in months)
+
+
+# =========================================================
+# INVALIDATION
+# =========================================================
+_PENDING_KEY = "calendar_invalidations"
+
+
+def _months(assignment: models.Assignment) -> set:
+    """Months holding the assignment now and before this flush"""
+    history = inspect(assignment).attrs.assigned_at.history
+    values = list(history.added or ()) + list(history.deleted or ()) + list(history.unchanged or ())
+    return {(v.year, v.month) for v in values if v is not None}
+
+
+def _collect(session: Session) -> Optional[set]:
+    touched, everything = set(), False
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.Assignment):
+            months = _months(obj)
+            if months:
+                touched |= months
+            else:
+                everything = True  # assigned_at unknown (expired / unloaded)
+    return None if everything else touched
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_after_flush(session, flush_context):
+    touched = _collect(session)
+    if touched is None or touched:
+        invalidate(touched)
+        pending = session.info.setdefault(_PENDING_KEY, set())
+        pending.update(touched if touched is not None else {None})
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    # Again after commit, in case a concurrent request re-cached the old month
+    # between our flush and our commit
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        invalidate(None if None in pending else pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_bulk_statements(orm_execute_state):
+    # query(Assignment).update(...) / delete(...) bypass the unit of work
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is models.Assignment:
+        invalidate()
+        orm_execute_state.session.info.setdefault(_PENDING_KEY, set()).add(None)
@@ -0,0 +1,332 @@
+"""
+Email outbox delivery
+
+Request handlers never talk to the mail server: utils.emailer.queue_email adds an
+email_outbox row to the caller's transaction, so an email exists exactly when the
+change that triggered it commits. A sender then delivers due rows:
+
+  claim    - up to EMAIL_OUTBOX_BATCH_SIZE pending rows whose next_attempt_at has
+             passed (plus rows stuck in "sending" for EMAIL_SENDING_TIMEOUT_SECONDS,
+             i.e. a sender died mid-batch) are marked "sending" with
+             SELECT ... FOR UPDATE SKIP LOCKED, so several senders never share a row
+  send     - over one SMTP connection kept open between batches (reconnected when
+             the server drops it, closed after EMAIL_SMTP_IDLE_SECONDS idle), at
+             most EMAIL_RATE_PER_SECOND messages per second
+  record   - sent rows are marked "sent"; failures are retried after
+             EMAIL_RETRY_BASE_SECONDS * 2^(attempts-1) (capped at EMAIL_RETRY_MAX_SECONDS)
+             and marked "failed" after EMAIL_MAX_ATTEMPTS or on a permanent (5xx) rejection
+
+Delivery is at-least-once: a sender that dies after sending but before recording
+may have its batch sent again once the claim goes stale.
+
+EMAIL_OUTBOX_SENDER selects where the sender runs:
+  thread   - a background thread in each API worker (default); it is woken as soon
+             as a transaction that queued email commits
+  external - nothing runs in the API; start `python -m app.cli email-worker`
+
+Without SMTP_HOST emails are printed to the console and marked sent, as before.
+For local testing point SMTP_HOST / SMTP_PORT at a debugging server (SMTP_TLS=false,
+no SMTP_USER / SMTP_PASSWORD).
+"""
+import os
+import smtplib
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import and_, event, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from ..db import models
+from ..db.database import SessionLocal
+from ..utils import emailer
+
+EMAIL_OUTBOX_SENDER = os.getenv("EMAIL_OUTBOX_SENDER", "thread").lower()
+EMAIL_OUTBOX_POLL_SECONDS = float(os.getenv("EMAIL_OUTBOX_POLL_SECONDS", "5"))
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "50"))
+EMAIL_RATE_PER_SECOND = float(os.getenv("EMAIL_RATE_PER_SECOND", "5"))  # 0 = unlimited
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "8"))
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "30"))
+EMAIL_RETRY_MAX_SECONDS = float(os.getenv("EMAIL_RETRY_MAX_SECONDS", "3600"))
+EMAIL_SENDING_TIMEOUT_SECONDS = float(os.getenv("EMAIL_SENDING_TIMEOUT_SECONDS", "300"))
+EMAIL_SMTP_IDLE_SECONDS = float(os.getenv("EMAIL_SMTP_IDLE_SECONDS", "60"))
+EMAIL_SMTP_TIMEOUT_SECONDS = float(os.getenv("EMAIL_SMTP_TIMEOUT_SECONDS", "30"))
+
+Status = models.EmailStatus
+
+
+@dataclass(frozen=True)
+class _Claimed:
+    id: int
+    to_email: str
+    subject: str
+    html_body: str
+    from_name: Optional[str]
+    attempts: int
+
+
+def retry_delay(attempts: int) -> float:
+    return min(EMAIL_RETRY_MAX_SECONDS, EMAIL_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0))
+
+
+def _is_permanent(exc: Exception) -> bool:
+    """5xx rejections of the message or recipient will not succeed on retry"""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, smtplib.SMTPAuthenticationError):
+        return False  # configuration problem; keep the mail until it is fixed
+    return isinstance(exc, smtplib.SMTPResponseException) and exc.smtp_code >= 500
+
+
+class _RateLimiter:
+    """Token bucket allowing bursts of one second's worth of messages"""
+
+    def __init__(self, rate: float, stop: threading.Event):
+        self.rate = rate
+        self.capacity = max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._stop = stop
+
+    def acquire(self) -> bool:
+        """Wait for a token; False when the sender is stopping"""
+        if self.rate <= 0:
+            return not self._stop.is_set()
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            if self._stop.wait((1 - self.tokens) / self.rate):
+                return False
+
+
+# =========================================================
+# SENDER
+# =========================================================
+class OutboxSender:
+    def __init__(self, stop: Optional[threading.Event] = None):
+        self._stop = stop or threading.Event()
+        self._limiter = _RateLimiter(EMAIL_RATE_PER_SECOND, self._stop)
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.connects = 0
+
+    # ---------- SMTP connection ----------
+    def _connection(self) -> smtplib.SMTP:
+        if self._smtp is not None and time.monotonic() - self._last_used > EMAIL_SMTP_IDLE_SECONDS:
+            self.close()
+        if self._smtp is None:
+            self._smtp = emailer.open_smtp(timeout=EMAIL_SMTP_TIMEOUT_SECONDS)
+            self.connects += 1
+        return self._smtp
+
+    def close(self) -> None:
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                self._smtp.close()
+            self._smtp = None
+
+    def _send(self, mail: _Claimed) -> None:
+        if not emailer.smtp_configured():
+            emailer.print_email(mail.subject, mail.to_email, mail.html_body)
+            return
+        msg = emailer.build_message(mail.subject, mail.to_email, mail.html_body, mail.from_name or emailer.DEFAULT_FROM_NAME)
+        for attempt in (1, 2):
+            server = self._connection()
+            try:
+                server.sendmail(emailer.mail_from(), [mail.to_email], msg.as_string())
+                self._last_used = time.monotonic()
+                return
+            except (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError):
+                # the pooled connection went away; reconnect once before counting a failure
+                self._smtp = None
+                if attempt == 2:
+                    raise
+
+    # ---------- outbox rows ----------
+    def _claim(self) -> List[_Claimed]:
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=EMAIL_SENDING_TIMEOUT_SECONDS)
+        outbox = models.EmailOutbox
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(outbox)
+                .where(or_(
+                    and_(outbox.status == Status.PENDING, outbox.next_attempt_at <= now),
+                    and_(outbox.status == Status.SENDING, outbox.locked_at < stale),
+                ))
+                .order_by(outbox.next_attempt_at, outbox.id)
+                .limit(EMAIL_OUTBOX_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+            claimed = []
+            for row in rows:
+                row.status = Status.SENDING
+                row.locked_at = now
+                row.attempts = (row.attempts or 0) + 1
+                claimed.append(_Claimed(row.id, row.to_email, row.subject, row.html_body, row.from_name, row.attempts))
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    def _record(self, results: List[dict]) -> None:
+        if not results:
+            return
+        db = SessionLocal()
+        try:
+            db.execute(update(models.EmailOutbox), results)
+            db.commit()
+        finally:
+            db.close()
+
+    def deliver_due(self) -> int:
+        """Claim and send one batch; returns how many rows were claimed"""
+        batch = self._claim()
+        results = []
+        for i, mail in enumerate(batch):
+            if not self._limiter.acquire():
+                # stopping: hand the rest back untouched (the claim cost them no attempt)
+                results.extend(
+                    {"id": m.id, "status": Status.PENDING, "locked_at": None, "attempts": m.attempts - 1}
+                    for m in batch[i:]
+                )
+                break
+            now = datetime.utcnow()
+            try:
+                self._send(mail)
+            except Exception as exc:
+                error = f"{type(exc).__name__}: {exc}"[:2000]
+                if _is_permanent(exc) or mail.attempts >= EMAIL_MAX_ATTEMPTS:
+                    self.failed += 1
+                    print(f"Email {mail.id} to {mail.to_email} failed permanently: {error}")
+                    results.append({"id": mail.id, "status": Status.FAILED, "locked_at": None, "last_error": error})
+                else:
+                    self.retried += 1
+                    results.append({
+                        "id": mail.id, "status": Status.PENDING, "locked_at": None, "last_error": error,
+                        "next_attempt_at": now + timedelta(seconds=retry_delay(mail.attempts)),
+                    })
+                continue
+            self.sent += 1
+            results.append({"id": mail.id, "status": Status.SENT, "locked_at": None, "sent_at": now, "last_error": None})
+        self._record(results)
+        return len(batch)
+
+    def run(self, poll_seconds: float = EMAIL_OUTBOX_POLL_SECONDS, wake: Optional[threading.Event] = None) -> None:
+        """Deliver until stopped; full batches are followed immediately by the next one"""
+        while not self._stop.is_set():
+            try:
+                claimed = self.deliver_due()
+            except Exception as exc:
+                print(f"Email outbox: delivery pass failed: {exc}")
+                self.close()
+                claimed = 0
+            if claimed >= EMAIL_OUTBOX_BATCH_SIZE:
+                continue
+            if wake is not None:
+                wake.wait(poll_seconds)
+                wake.clear()
+            else:
+                self._stop.wait(poll_seconds)
+            if self._smtp is not None and time.monotonic() - self._last_used > EMAIL_SMTP_IDLE_SECONDS:
+                self.close()
+        self.close()
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "smtp_connects": self.connects,
+            "smtp_connected": self._smtp is not None,
+        }
+
+
+def outbox_counts(db: Session) -> dict:
+    rows = db.execute(
+        select(models.EmailOutbox.status, func.count()).group_by(models.EmailOutbox.status)
+    ).all()
+    counts = {status.value: 0 for status in Status}
+    for status, count in rows:
+        counts[getattr(status, "value", status)] = count
+    return counts
+
+
+# =========================================================
+# BACKGROUND SENDER
+# =========================================================
+_stop = threading.Event()
+_wake = threading.Event()
+_thread: Optional[threading.Thread] = None
+_sender: Optional[OutboxSender] = None
+
+
+def start_sender() -> None:
+    global _thread, _sender
+    if EMAIL_OUTBOX_SENDER != "thread":
+        return
+    if _thread is None or not _thread.is_alive():
+        _stop.clear()
+        _sender = OutboxSender(_stop)
+        _thread = threading.Thread(
+            target=_sender.run, kwargs={"wake": _wake}, name="email-outbox", daemon=True
+        )
+        _thread.start()
+
+
+def stop_sender() -> None:
+    """Stop after the message in flight; unsent rows stay queued for the next start"""
+    global _thread
+    _stop.set()
+    _wake.set()
+    if _thread is not None:
+        _thread.join(timeout=EMAIL_SMTP_TIMEOUT_SECONDS + 5)
+        _thread = None
+
+
+def sender_stats() -> dict:
+    stats = {"mode": EMAIL_OUTBOX_SENDER, "running": _thread is not None and _thread.is_alive()}
+    if _sender is not None:
+        stats.update(_sender.stats())
+    return stats
+
+
+def run_worker(poll_seconds: float = EMAIL_OUTBOX_POLL_SECONDS) -> None:
+    """Standalone sender loop (EMAIL_OUTBOX_SENDER=external)"""
+    print(f"Email worker started (poll every {poll_seconds}s, {EMAIL_RATE_PER_SECOND or 'unlimited'} msg/s)")
+    OutboxSender().run(poll_seconds=poll_seconds)
+
+
+# =========================================================
+# WAKE THE SENDER WHEN EMAIL IS QUEUED
+# =========================================================
+_QUEUED_KEY = "email_outbox_queued"
+
+
+@event.listens_for(Session, "after_flush")
+def _note_queued(session, flush_context):
+    if any(isinstance(obj, models.EmailOutbox) for obj in session.new):
+        session.info[_QUEUED_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_sender(session):
+    if session.info.pop(_QUEUED_KEY, False):
+        _wake.set()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_queued(session):
+    session.info.pop(_QUEUED_KEY, None)
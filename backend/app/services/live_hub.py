@@ -0,0 +1,238 @@
+"""
+Live event fan-out for /ws/live
+
+Events are published to tenant channels: "company:<id>" for the company they
+belong to, and always "all" (watched by users without a company, i.e. platform
+admins). Each WebSocket subscribes to exactly one channel and may narrow the
+event types it wants:
+
+    {"type": "location", "kind": "staff", "id": 12, "user_id": 40, "latitude": .., "longitude": .., "at": ..}
+    {"type": "shift", "event": "started" | "ended", "shift_id": 7, "staff_id": 12, "at": ..}
+
+Location events are published by the location flush (one per coalesced fix);
+shift events when a shift row is inserted or its status changes and the
+transaction commits.
+
+LIVE_BACKPLANE=memory (default) fans out inside this process only. With
+LIVE_BACKPLANE=redis events go through Redis pub/sub (REDIS_URL) so dashboards
+connected to any worker see changes made on every worker. Publishing works from
+any thread; delivery always happens on the event loop.
+"""
+import asyncio
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from ..db import models
+
+LIVE_BACKPLANE = os.getenv("LIVE_BACKPLANE", "memory").lower()
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "256"))
+
+TOPICS = frozenset({"location", "shift"})
+ALL_CHANNEL = "all"
+_REDIS_PREFIX = "live:"
+
+
+def company_channel(company_id: int) -> str:
+    return f"company:{company_id}"
+
+
+def channel_for(company_id: Optional[int]) -> str:
+    """The channel a user of this company subscribes to"""
+    return ALL_CHANNEL if company_id is None else company_channel(company_id)
+
+
+class Subscription:
+    """One socket's queue; when a slow client falls behind the oldest events are dropped"""
+
+    def __init__(self, channel: str, topics: FrozenSet[str]):
+        self.channel = channel
+        self.topics = topics
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+        self.dropped = 0
+
+    def offer(self, data: str) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(data)
+
+
+class LiveHub:
+    def __init__(self):
+        self._subs: Dict[str, Set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._redis = None
+        self._redis_lock = threading.Lock()
+        self._listener: Optional[asyncio.Task] = None
+        self.published = 0
+
+    @property
+    def active(self) -> bool:
+        """False when nobody could receive an event, so publishers can skip the work"""
+        # empty channels are removed on unsubscribe, so this never iterates (safe off-loop)
+        return LIVE_BACKPLANE == "redis" or bool(self._subs)
+
+    # ---------- lifecycle ----------
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        if LIVE_BACKPLANE == "redis" and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._redis is not None:
+            self._redis.close()
+            self._redis = None
+        self._loop = None
+
+    # ---------- subscribers ----------
+    def subscribe(self, channel: str, topics: Iterable[str] = TOPICS) -> Subscription:
+        sub = Subscription(channel, frozenset(topics) & TOPICS or TOPICS)
+        self._subs.setdefault(channel, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        subs = self._subs.get(sub.channel)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del self._subs[sub.channel]
+
+    def _deliver(self, channels: Iterable[str], topic: str, data: str) -> None:
+        for channel in channels:
+            for sub in list(self._subs.get(channel, ())):
+                if topic in sub.topics:
+                    sub.offer(data)
+
+    # ---------- publishing ----------
+    def publish(self, company_id: Optional[int], message: dict) -> None:
+        """Thread-safe; message must carry a "type" from TOPICS"""
+        data = json.dumps(message, default=str, separators=(",", ":"))
+        channels = [ALL_CHANNEL] if company_id is None else [ALL_CHANNEL, company_channel(company_id)]
+        self.published += 1
+        if LIVE_BACKPLANE == "redis":
+            try:
+                client = self._redis_client()
+                for channel in channels:
+                    client.publish(_REDIS_PREFIX + channel, data)
+                return
+            except Exception as exc:
+                print(f"Live hub: Redis publish failed, delivering locally only: {exc}")
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._deliver, channels, message["type"], data)
+
+    def _redis_client(self):
+        with self._redis_lock:
+            if self._redis is None:
+                import redis
+                self._redis = redis.Redis.from_url(REDIS_URL)
+            return self._redis
+
+    async def _listen(self) -> None:
+        import redis.asyncio as aioredis
+        while True:
+            client = aioredis.from_url(REDIS_URL)
+            try:
+                pubsub = client.pubsub()
+                await pubsub.psubscribe(_REDIS_PREFIX + "*")
+                async for msg in pubsub.listen():
+                    if msg.get("type") != "pmessage":
+                        continue
+                    channel = msg["channel"].decode()[len(_REDIS_PREFIX):]
+                    data = msg["data"].decode()
+                    self._deliver([channel], json.loads(data).get("type"), data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                print(f"Live hub: Redis subscription lost, retrying: {exc}")
+                await asyncio.sleep(1)
+            finally:
+                await client.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "backplane": LIVE_BACKPLANE,
+            "channels": {channel: len(subs) for channel, subs in self._subs.items()},
+            "published": self.published,
+            "dropped": sum(sub.dropped for subs in self._subs.values() for sub in subs),
+        }
+
+
+live_hub = LiveHub()
+
+
+def publish_locations(events: List[tuple]) -> None:
+    """events: (company id, kind, profile id, user id, latitude, longitude)"""
+    if not events or not live_hub.active:
+        return
+    at = datetime.utcnow().isoformat()
+    for company_id, kind, profile_id, user_id, lat, lng in events:
+        live_hub.publish(company_id, {
+            "type": "location", "kind": kind, "id": profile_id, "user_id": user_id,
+            "latitude": lat, "longitude": lng, "at": at,
+        })
+
+
+# =========================================================
+# SHIFT EVENTS
+# =========================================================
+_PENDING_KEY = "live_shift_events"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_shift_events(session, flush_context):
+    if not live_hub.active:
+        return
+    changed = []
+    for obj in session.new:
+        if isinstance(obj, models.Shift):
+            changed.append(obj)
+    for obj in session.dirty:
+        if isinstance(obj, models.Shift) and inspect(obj).attrs.status.history.has_changes():
+            changed.append(obj)
+    if not changed:
+        return
+    staff_ids = {s.staff_id for s in changed if s.staff_id is not None}
+    companies = {}
+    if staff_ids:
+        companies = dict(session.connection().execute(
+            select(models.Staff.id, models.User.company_id)
+            .join(models.User, models.User.id == models.Staff.user_id)
+            .where(models.Staff.id.in_(staff_ids))
+        ).all())
+    pending = session.info.setdefault(_PENDING_KEY, [])
+    for shift in changed:
+        status = getattr(shift.status, "value", shift.status)
+        pending.append((companies.get(shift.staff_id), {
+            "type": "shift",
+            "event": "started" if status == models.ShiftStatus.STARTED.value else status,
+            "shift_id": shift.id,
+            "staff_id": shift.staff_id,
+            "at": datetime.utcnow().isoformat(),
+        }))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_shift_events(session):
+    for company_id, message in session.info.pop(_PENDING_KEY, ()):
+        live_hub.publish(company_id, message)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_shift_events(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,258 @@
+"""
+Shift breadcrumb history
+
+Every fix accepted by location_ingest while a staff member has a started shift is
+kept for that shift in location_history_chunks rows. Each location flush writes
+the open chunk of every shift that received fixes: the first write inserts the
+row, later ones rewrite it, so nothing accepted lives only in memory. A chunk is
+sealed (closed, later fixes start a new row) once it holds
+LOCATION_HISTORY_CHUNK_FIXES fixes or is LOCATION_HISTORY_CHUNK_SECONDS old, when
+its shift ends, and on shutdown. A chunk stores its
+fixes as little-endian int32 triples - milliseconds since the chunk start,
+latitude and longitude in microdegrees (~0.1 m) - each delta-encoded against the
+previous fix and zlib-compressed, so a fix costs a few bytes instead of a row.
+
+shift_trail() decodes a shift's chunks with numpy - sealed or not, whichever
+worker wrote them - and optionally thins the line with Douglas-Peucker.
+"""
+import math
+import os
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from ..db import models
+
+LOCATION_HISTORY_CHUNK_FIXES = int(os.getenv("LOCATION_HISTORY_CHUNK_FIXES", "720"))
+LOCATION_HISTORY_CHUNK_SECONDS = float(os.getenv("LOCATION_HISTORY_CHUNK_SECONDS", "600"))
+
+_DTYPE = np.dtype("<i4")
+_EPOCH = datetime(1970, 1, 1)
+_EARTH_RADIUS_M = 6371008.8
+
+Point = Tuple[datetime, float, float]  # (naive UTC timestamp, latitude, longitude)
+
+
+# =========================================================
+# CODEC
+# =========================================================
+def encode(started_at: datetime, points: List[Point]) -> bytes:
+    triples = np.array(
+        [(round((ts - started_at).total_seconds() * 1000), round(lat * 1e6), round(lng * 1e6))
+         for ts, lat, lng in points],
+        dtype=np.int64,
+    ).reshape(-1, 3)
+    deltas = np.diff(triples, axis=0, prepend=np.zeros((1, 3), dtype=np.int64))
+    return zlib.compress(deltas.astype(_DTYPE).tobytes())
+
+
+def decode(started_at: datetime, data: bytes) -> np.ndarray:
+    """(n, 3) float array: epoch milliseconds, latitude, longitude"""
+    triples = np.frombuffer(zlib.decompress(data), dtype=_DTYPE).reshape(-1, 3).cumsum(axis=0, dtype=np.int64)
+    out = triples.astype(np.float64)
+    out[:, 0] += (started_at - _EPOCH) / timedelta(milliseconds=1)
+    out[:, 1:] /= 1e6
+    return out
+
+
+# =========================================================
+# DOUGLAS-PEUCKER
+# =========================================================
+def simplify(lat: np.ndarray, lng: np.ndarray, tolerance_m: float) -> np.ndarray:
+    """Boolean mask of the points kept so no dropped point is further than tolerance_m from the line"""
+    n = len(lat)
+    keep = np.ones(n, dtype=bool)
+    if n < 3 or tolerance_m <= 0:
+        return keep
+    # Equirectangular projection to metres; plenty accurate over a shift's extent
+    y = np.radians(lat) * _EARTH_RADIUS_M
+    x = np.radians(lng) * _EARTH_RADIUS_M * math.cos(math.radians(float(lat.mean())))
+    keep[:] = False
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        dx, dy = x[b] - x[a], y[b] - y[a]
+        px, py = x[a + 1:b] - x[a], y[a + 1:b] - y[a]
+        seg = dx * dx + dy * dy
+        t = np.clip((px * dx + py * dy) / seg, 0.0, 1.0) if seg > 0 else 0.0
+        dist = np.hypot(px - t * dx, py - t * dy)
+        i = int(dist.argmax())
+        if dist[i] > tolerance_m:
+            m = a + 1 + i
+            keep[m] = True
+            stack.append((a, m))
+            stack.append((m, b))
+    return keep
+
+
+# =========================================================
+# WRITER (open chunks per shift)
+# =========================================================
+@dataclass
+class OpenChunk:
+    staff_id: int
+    opened: float  # monotonic
+    points: List[Point] = field(default_factory=list)
+    row_id: Optional[int] = None  # location_history_chunks row, once written
+    written: int = 0  # points already in that row
+
+
+@dataclass
+class ChunkWrite:
+    shift_id: int
+    chunk: OpenChunk
+    count: int  # points written
+    sealed: bool
+    row_id: Optional[int] = None
+
+
+class HistoryWriter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open: Dict[int, OpenChunk] = {}
+
+    def record(self, staff_id: int, shift_id: int, points: Iterable[Point]) -> None:
+        with self._lock:
+            chunk = self._open.get(shift_id)
+            if chunk is None:
+                chunk = self._open[shift_id] = OpenChunk(staff_id, time.monotonic())
+            chunk.points.extend(points)
+
+    def take_writes(self, force: bool = False, seal_shifts: Iterable[int] = ()) -> List[ChunkWrite]:
+        """Chunks with unwritten fixes or due for sealing; sealed ones leave the writer"""
+        now = time.monotonic()
+        seal_shifts = set(seal_shifts)
+        writes = []
+        with self._lock:
+            for shift_id, chunk in list(self._open.items()):
+                sealed = (
+                    force or shift_id in seal_shifts
+                    or len(chunk.points) >= LOCATION_HISTORY_CHUNK_FIXES
+                    or now - chunk.opened >= LOCATION_HISTORY_CHUNK_SECONDS
+                )
+                if sealed:
+                    del self._open[shift_id]
+                if len(chunk.points) > chunk.written:
+                    writes.append(ChunkWrite(shift_id, chunk, len(chunk.points), sealed, chunk.row_id))
+        return writes
+
+    def committed(self, writes: List[ChunkWrite]) -> None:
+        with self._lock:
+            for w in writes:
+                w.chunk.row_id, w.chunk.written = w.row_id, w.count
+
+    def restore(self, writes: List[ChunkWrite]) -> None:
+        """Re-open sealed chunks whose write failed, ahead of anything recorded since"""
+        with self._lock:
+            for w in writes:
+                if not w.sealed:
+                    continue
+                current = self._open.get(w.shift_id)
+                if current is not None:
+                    w.chunk.points.extend(current.points)
+                self._open[w.shift_id] = w.chunk
+
+    def __len__(self) -> int:
+        return len(self._open)
+
+
+history_writer = HistoryWriter()
+
+
+def open_shifts(db: Session, staff_ids: List[int]) -> Dict[int, Tuple[int, Optional[datetime]]]:
+    """staff id -> (id, start_time) of its latest started shift"""
+    if not staff_ids:
+        return {}
+    rows = db.execute(
+        select(models.Shift.staff_id, models.Shift.id, models.Shift.start_time)
+        .where(models.Shift.staff_id.in_(staff_ids), models.Shift.status == models.ShiftStatus.STARTED)
+        .order_by(models.Shift.id)
+    ).all()
+    return {staff_id: (shift_id, start) for staff_id, shift_id, start in rows}
+
+
+def record_fixes(db: Session, by_staff: Dict[int, List[Point]]) -> None:
+    """Attach each staff member's new points to their started shift (others are discarded)"""
+    for staff_id, (shift_id, start) in open_shifts(db, list(by_staff)).items():
+        points = [p for p in by_staff[staff_id] if start is None or p[0] >= start]
+        if points:
+            history_writer.record(staff_id, shift_id, points)
+
+
+def write_chunks(db: Session, writes: List[ChunkWrite]) -> None:
+    """
+    Insert or rewrite the chunks from history_writer.take_writes() in db's
+    transaction. Pass them to history_writer.committed() after the commit, or to
+    restore() after a rollback.
+    """
+    inserts, updates = [], []
+    for w in writes:
+        points = sorted(w.chunk.points[:w.count], key=lambda p: p[0])
+        row = {
+            "started_at": points[0][0],
+            "ended_at": points[-1][0],
+            "fix_count": len(points),
+            "data": encode(points[0][0], points),
+        }
+        if w.row_id is None:
+            inserts.append((w, {"staff_id": w.chunk.staff_id, "shift_id": w.shift_id, **row}))
+        else:
+            updates.append({"id": w.row_id, **row})
+    if inserts:
+        ids = db.execute(
+            insert(models.LocationHistoryChunk).returning(models.LocationHistoryChunk.id, sort_by_parameter_order=True),
+            [row for _, row in inserts],
+        ).scalars().all()
+        for (w, _), row_id in zip(inserts, ids):
+            w.row_id = row_id
+    if updates:
+        db.execute(update(models.LocationHistoryChunk), updates)
+
+
+# =========================================================
+# READ
+# =========================================================
+def shift_trail(
+    db: Session,
+    shift_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    tolerance_m: float = 0,
+) -> Tuple[int, np.ndarray]:
+    """(fixes in range, (n, 3) array of epoch ms / lat / lng after simplification)"""
+    stmt = (
+        select(models.LocationHistoryChunk.started_at, models.LocationHistoryChunk.data)
+        .where(models.LocationHistoryChunk.shift_id == shift_id)
+        .order_by(models.LocationHistoryChunk.started_at)
+    )
+    if start is not None:
+        stmt = stmt.where(models.LocationHistoryChunk.ended_at >= start)
+    if end is not None:
+        stmt = stmt.where(models.LocationHistoryChunk.started_at <= end)
+    parts = [decode(started_at, data) for started_at, data in db.execute(stmt).all()]
+    if not parts:
+        return 0, np.empty((0, 3))
+    trail = np.concatenate(parts)
+    trail = trail[np.argsort(trail[:, 0], kind="stable")]
+    if start is not None:
+        trail = trail[trail[:, 0] >= (start - _EPOCH) / timedelta(milliseconds=1)]
+    if end is not None:
+        trail = trail[trail[:, 0] <= (end - _EPOCH) / timedelta(milliseconds=1)]
+    total = len(trail)
+    if tolerance_m > 0:
+        trail = trail[simplify(trail[:, 1], trail[:, 2], tolerance_m)]
+    return total, trail
+
+
+def to_timestamp(epoch_ms: float) -> datetime:
+    return _EPOCH + timedelta(milliseconds=epoch_ms)
@@ -0,0 +1,309 @@
+"""
+GPS location ingestion with write-behind coalescing
+
+POST /location/update and /location/batch no longer touch the database. Each fix
+is checked against the last accepted fix for its user and dropped when it is:
+
+  stale       - older than LOCATION_MAX_AGE_SECONDS, or not newer than the last fix
+  inaccurate  - reported accuracy worse than LOCATION_MAX_ACCURACY_M
+  unchanged   - moved less than max(accuracy, LOCATION_MIN_MOVE_M) since the last fix
+
+Accepted fixes overwrite the user's slot in an in-process buffer, so however often
+a device posts, only its latest position is written. A background thread flushes
+the buffer every LOCATION_FLUSH_SECONDS: users are resolved to staff / patient
+rows in one query (cached afterwards) and each table gets a single
+UPDATE ... FROM (VALUES ...) on Postgres (executemany elsewhere). Fixes recorded
+during a started shift are also handed to location_history, and flushed staff
+positions are applied to the nearest-staff index and published to /ws/live.
+"""
+import math
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Float, Integer, column, select, update, values
+
+from ..db import models
+from ..db.database import SessionLocal
+from ..utils.cache import TTLCache
+from . import location_history
+from .live_hub import publish_locations
+from .staff_index import POSITIONS_ONLY, staff_index
+
+LOCATION_FLUSH_SECONDS = float(os.getenv("LOCATION_FLUSH_SECONDS", "5"))
+LOCATION_MAX_AGE_SECONDS = float(os.getenv("LOCATION_MAX_AGE_SECONDS", "300"))
+LOCATION_MAX_ACCURACY_M = float(os.getenv("LOCATION_MAX_ACCURACY_M", "500"))
+LOCATION_MIN_MOVE_M = float(os.getenv("LOCATION_MIN_MOVE_M", "10"))
+LOCATION_TRACKED_USERS = int(os.getenv("LOCATION_TRACKED_USERS", "100000"))
+LOCATION_PROFILE_TTL_SECONDS = float(os.getenv("LOCATION_PROFILE_TTL_SECONDS", "600"))
+
+# Clock skew tolerated on device timestamps that claim to be in the future
+_FUTURE_SKEW = timedelta(seconds=60)
+_EARTH_RADIUS_M = 6371008.8
+
+
+@dataclass(frozen=True)
+class Fix:
+    user_id: int
+    email: Optional[str]
+    latitude: float
+    longitude: float
+    accuracy: Optional[float]
+    timestamp: datetime  # UTC, naive
+    company_id: Optional[int] = None  # tenant channel for live events
+
+
+def to_utc(ts: Optional[datetime]) -> datetime:
+    """Device timestamp -> naive UTC (naive input is taken as UTC; None means now)"""
+    if ts is None:
+        return datetime.utcnow()
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def distance_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle (haversine) distance in metres"""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * _EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+# =========================================================
+# BUFFER
+# =========================================================
+class LocationBuffer:
+    """Latest accepted fix per user, waiting to be written"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[int, Fix] = {}
+        # every accepted fix since the last drain, for the shift history
+        self._trail: Dict[int, List[Fix]] = {}
+        # last accepted fix per user (flushed or not); the baseline for the drop rules
+        self._last = TTLCache(maxsize=LOCATION_TRACKED_USERS, ttl_seconds=max(LOCATION_MAX_AGE_SECONDS, 3600))
+        self.accepted = 0
+        self.dropped: Dict[str, int] = {"stale": 0, "inaccurate": 0, "unchanged": 0}
+        self.written = 0
+
+    def offer(self, fix: Fix, now: Optional[datetime] = None) -> Optional[str]:
+        """Buffer the fix; returns None when accepted, else the drop reason"""
+        now = now or datetime.utcnow()
+        reason = None
+        if fix.timestamp < now - timedelta(seconds=LOCATION_MAX_AGE_SECONDS) or fix.timestamp > now + _FUTURE_SKEW:
+            reason = "stale"
+        elif fix.accuracy is not None and fix.accuracy > LOCATION_MAX_ACCURACY_M:
+            reason = "inaccurate"
+        with self._lock:
+            if reason is None:
+                last: Optional[Fix] = self._last.get(fix.user_id)
+                if last is not None:
+                    if fix.timestamp <= last.timestamp:
+                        reason = "stale"
+                    elif distance_m(last.latitude, last.longitude, fix.latitude, fix.longitude) < max(
+                        fix.accuracy or 0.0, LOCATION_MIN_MOVE_M
+                    ):
+                        reason = "unchanged"
+            if reason is not None:
+                self.dropped[reason] += 1
+                return reason
+            self._last.set(fix.user_id, fix)
+            self._pending[fix.user_id] = fix
+            self._trail.setdefault(fix.user_id, []).append(fix)
+            self.accepted += 1
+        return None
+
+    def latest(self, user_id: int) -> Optional[Fix]:
+        return self._last.get(user_id)
+
+    def drain(self) -> Tuple[List[Fix], Dict[int, List[Fix]]]:
+        """(latest fix per user, every fix per user) accepted since the last drain"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            trail, self._trail = self._trail, {}
+        return list(pending.values()), trail
+
+    def restore(self, fixes: Iterable[Fix], trail: Optional[Dict[int, List[Fix]]] = None) -> None:
+        """Put back fixes whose flush failed, unless a newer one arrived meanwhile"""
+        with self._lock:
+            for fix in fixes:
+                current = self._pending.get(fix.user_id)
+                if current is None or current.timestamp < fix.timestamp:
+                    self._pending[fix.user_id] = fix
+            for user_id, older in (trail or {}).items():
+                self._trail[user_id] = older + self._trail.get(user_id, [])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "open_history_chunks": len(location_history.history_writer),
+                "tracked_users": len(self._last),
+                "accepted": self.accepted,
+                "dropped": dict(self.dropped),
+                "written": self.written,
+                "flush_interval_seconds": LOCATION_FLUSH_SECONDS,
+            }
+
+
+location_buffer = LocationBuffer()
+
+# user id -> ("staff", staff.id) | ("patient", patient.id) | None (no profile)
+profile_cache = TTLCache(maxsize=LOCATION_TRACKED_USERS, ttl_seconds=LOCATION_PROFILE_TTL_SECONDS)
+_MISSING = object()
+
+
+def ingest(fixes: Iterable[Fix]) -> Tuple[int, Dict[str, int]]:
+    """Offer fixes oldest first; returns (accepted, {drop reason: count})"""
+    accepted, dropped = 0, {}
+    for fix in sorted(fixes, key=lambda f: f.timestamp):
+        reason = location_buffer.offer(fix)
+        if reason is None:
+            accepted += 1
+        else:
+            dropped[reason] = dropped.get(reason, 0) + 1
+    return accepted, dropped
+
+
+def profile_of(user_id: int) -> Optional[str]:
+    """'staff' / 'patient' once the user has been resolved by a flush, else None"""
+    entry = profile_cache.get(user_id)
+    return entry[0] if entry else None
+
+
+# =========================================================
+# FLUSH
+# =========================================================
+def _resolve_profiles(db, fixes: List[Fix]) -> None:
+    """Fill profile_cache for unseen users: staff by user_id first, then patients by email"""
+    unseen = [f for f in fixes if profile_cache.get(f.user_id, _MISSING) is _MISSING]
+    if not unseen:
+        return
+    staff = dict(db.execute(
+        select(models.Staff.user_id, models.Staff.id)
+        .where(models.Staff.user_id.in_([f.user_id for f in unseen]))
+    ).all())
+    by_email = {f.email: f.user_id for f in unseen if f.user_id not in staff and f.email}
+    patients = {}
+    if by_email:
+        patients = dict(db.execute(
+            select(models.Patient.email, models.Patient.id).where(models.Patient.email.in_(list(by_email)))
+        ).all())
+    for fix in unseen:
+        if fix.user_id in staff:
+            profile_cache.set(fix.user_id, ("staff", staff[fix.user_id]))
+        elif fix.email in patients:
+            profile_cache.set(fix.user_id, ("patient", patients[fix.email]))
+        else:
+            profile_cache.set(fix.user_id, None)
+
+
+def _bulk_update(db, model, rows: List[Tuple[int, float, float]]) -> None:
+    if not rows:
+        return
+    now = datetime.utcnow()
+    if db.get_bind().dialect.name == "postgresql":
+        v = values(column("id", Integer), column("lat", Float), column("lng", Float), name="v").data(rows)
+        db.execute(
+            update(model).where(model.id == v.c.id)
+            .values(latitude=v.c.lat, longitude=v.c.lng, location_updated_at=now),
+            execution_options={"synchronize_session": False, POSITIONS_ONLY: True},
+        )
+    else:
+        db.execute(
+            update(model),
+            [{"id": i, "latitude": lat, "longitude": lng, "location_updated_at": now} for i, lat, lng in rows],
+            execution_options={POSITIONS_ONLY: True},
+        )
+
+
+# One flush at a time: the background thread, shutdown and end_shift all flush
+_flush_lock = threading.Lock()
+
+
+def flush(final: bool = False, seal_shifts: Iterable[int] = ()) -> int:
+    """Write every buffered fix; returns how many profile rows were updated.
+    final=True also seals every open history chunk, seal_shifts those of the
+    given shifts."""
+    with _flush_lock:
+        return _flush(final, seal_shifts)
+
+
+def _flush(final: bool, seal_shifts: Iterable[int]) -> int:
+    fixes, trail = location_buffer.drain()
+    if not fixes and not len(location_history.history_writer):
+        return 0
+    db = SessionLocal()
+    writes, recorded = [], False
+    try:
+        rows = {"staff": [], "patient": []}
+        history, events = {}, []
+        if fixes:
+            _resolve_profiles(db, fixes)
+            for fix in fixes:
+                entry = profile_cache.get(fix.user_id)
+                if entry:
+                    rows[entry[0]].append((entry[1], fix.latitude, fix.longitude))
+                    events.append((fix.company_id, entry[0], entry[1], fix.user_id, fix.latitude, fix.longitude))
+                    if entry[0] == "staff":
+                        history[entry[1]] = [(f.timestamp, f.latitude, f.longitude) for f in trail.get(fix.user_id, ())]
+            _bulk_update(db, models.Staff, rows["staff"])
+            _bulk_update(db, models.Patient, rows["patient"])
+            location_history.record_fixes(db, history)
+            recorded = True
+        writes = location_history.history_writer.take_writes(final, seal_shifts)
+        location_history.write_chunks(db, writes)
+        db.commit()
+    except Exception as exc:
+        db.rollback()
+        location_buffer.restore(fixes, None if recorded else trail)
+        location_history.history_writer.restore(writes)
+        print(f"Location flush failed ({len(fixes)} fixes kept for retry): {exc}")
+        return 0
+    finally:
+        db.close()
+    location_history.history_writer.committed(writes)
+    staff_index.move(rows["staff"])
+    publish_locations(events)
+    written = len(rows["staff"]) + len(rows["patient"])
+    location_buffer.written += written
+    return written
+
+
+def end_shift(shift_id: int) -> None:
+    """Write buffered fixes into the shift's history and seal its open chunk.
+    Call before the shift is marked ended, while its fixes are still accepted."""
+    flush(seal_shifts=(shift_id,))
+
+
+# =========================================================
+# BACKGROUND FLUSHER
+# =========================================================
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+def _run() -> None:
+    while not _stop.wait(LOCATION_FLUSH_SECONDS):
+        flush()
+
+
+def start_flusher() -> None:
+    global _thread
+    if _thread is None or not _thread.is_alive():
+        _stop.clear()
+        _thread = threading.Thread(target=_run, name="location-flush", daemon=True)
+        _thread.start()
+
+
+def stop_flusher() -> None:
+    """Stop the thread and write whatever is still buffered"""
+    global _thread
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout=LOCATION_FLUSH_SECONDS + 5)
+        _thread = None
+    flush(final=True)
@@ -0,0 +1,201 @@
+"""
+Viewport-bounded, clustered map payloads for /map/union_staff and /map/union_patients
+
+    ?bbox=west,south,east,north   only rows inside the viewport (Leaflet's toBBoxString())
+    ?zoom=N                       below MAP_CLUSTER_MAX_ZOOM rows are grouped into grid
+                                  cells (MAP_CLUSTER_CELLS_PER_TILE per 256px tile) and
+                                  returned as {latitude, longitude, count} centroids
+    ?company_id=                  one tenant (company users always get their own)
+    ?since=<watermark>            only rows whose coordinates changed since then
+
+Every response carries X-Map-Watermark; pass it back as `since` on the next poll.
+The watermark comes from the database that served the read, not the app clock:
+on a Postgres replica it is the commit time of the last replayed transaction,
+so rows the replica has not applied yet are still newer than it.
+Delta responses ignore bbox/zoom, so markers that moved out of the viewport are
+updated too. At most MAP_MAX_POINTS items are returned (X-Map-Truncated: true).
+
+location_updated_at is stamped by the location flush and, for ORM writes, by the
+before_insert / before_update hooks below.
+"""
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, event, func, inspect, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db import models
+
+MAP_CLUSTER_MAX_ZOOM = int(os.getenv("MAP_CLUSTER_MAX_ZOOM", "14"))
+MAP_CLUSTER_CELLS_PER_TILE = int(os.getenv("MAP_CLUSTER_CELLS_PER_TILE", "4"))
+MAP_MAX_POINTS = int(os.getenv("MAP_MAX_POINTS", "5000"))
+# Watermarks lag the database clock by this much: location_updated_at is stamped
+# before the flush commits, so a row can become visible with a slightly older stamp
+MAP_SINCE_OVERLAP_SECONDS = float(os.getenv("MAP_SINCE_OVERLAP_SECONDS", "5"))
+
+WATERMARK_HEADER = "X-Map-Watermark"
+TRUNCATED_HEADER = "X-Map-Truncated"
+
+
+@dataclass(frozen=True)
+class BBox:
+    west: float
+    south: float
+    east: float
+    north: float
+
+
+def parse_bbox(value: Optional[str]) -> Optional[BBox]:
+    if not value:
+        return None
+    try:
+        west, south, east, north = (float(v) for v in value.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be west,south,east,north")
+    if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+        raise HTTPException(status_code=400, detail="bbox is out of range")
+    return BBox(west, south, east, north)
+
+
+def cell_degrees(zoom: int) -> float:
+    return 360.0 / (2 ** zoom) / MAP_CLUSTER_CELLS_PER_TILE
+
+
+def _in_bbox(lat, lng, bbox: BBox):
+    lat_ok = lat.between(bbox.south, bbox.north)
+    if bbox.west <= bbox.east:
+        return and_(lat_ok, lng.between(bbox.west, bbox.east))
+    # viewport crosses the antimeridian
+    return and_(lat_ok, or_(lng >= bbox.west, lng <= bbox.east))
+
+
+# =========================================================
+# SOURCES
+# =========================================================
+@dataclass(frozen=True)
+class _Source:
+    model: type
+    id_key: str
+    columns: tuple  # labelled columns of a point row
+
+    def select_from(self, stmt):
+        if self.model is models.Staff:
+            return stmt.select_from(models.User).join(models.Staff, models.Staff.user_id == models.User.id)
+        # Patients carry no user_id; email is their only link to a user (and a company)
+        return stmt.select_from(models.User).join(models.Patient, models.Patient.email == models.User.email)
+
+
+STAFF = _Source(
+    model=models.Staff,
+    id_key="staff_id",
+    columns=(
+        models.User.id.label("user_id"),
+        models.User.full_name.label("name"),
+        models.User.email.label("email"),
+        models.Staff.id.label("staff_id"),
+        models.Staff.latitude.label("latitude"),
+        models.Staff.longitude.label("longitude"),
+    ),
+)
+
+PATIENTS = _Source(
+    model=models.Patient,
+    id_key="patient_id",
+    columns=(
+        models.User.id.label("user_id"),
+        models.User.full_name.label("name"),
+        models.User.email.label("email"),
+        models.Patient.id.label("patient_id"),
+        models.Patient.address.label("address"),
+        models.Patient.latitude.label("latitude"),
+        models.Patient.longitude.label("longitude"),
+    ),
+)
+
+
+async def _database_clock(db: AsyncSession) -> datetime:
+    """
+    Naive UTC time up to which the database serving this session has applied
+    commits: a replica's last replayed commit (NULL on the primary, so now())
+    """
+    conn = await db.connection()
+    if conn.dialect.name != "postgresql":
+        return datetime.utcnow()
+    applied = func.coalesce(func.pg_last_xact_replay_timestamp(), func.now())
+    return (await db.execute(select(func.timezone("UTC", applied)))).scalar()
+
+
+def map_statement(
+    source: _Source,
+    bbox: Optional[BBox] = None,
+    zoom: Optional[int] = None,
+    company_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+):
+    """(select, clustered): points, or per-cell counts below MAP_CLUSTER_MAX_ZOOM"""
+    model = source.model
+    filters = []
+    if company_id is not None:
+        filters.append(models.User.company_id == company_id)
+    if since is not None:
+        filters.append(model.location_updated_at > since)
+    elif bbox is not None:
+        filters.append(_in_bbox(model.latitude, model.longitude, bbox))
+
+    if since is None and zoom is not None and zoom < MAP_CLUSTER_MAX_ZOOM:
+        size = cell_degrees(zoom)
+        cell_lat = func.floor(model.latitude / size)
+        cell_lng = func.floor(model.longitude / size)
+        stmt = source.select_from(
+            select(func.count(), func.avg(model.latitude), func.avg(model.longitude), func.min(model.id))
+        ).where(model.latitude.is_not(None), model.longitude.is_not(None), *filters)
+        return stmt.group_by(cell_lat, cell_lng).order_by(cell_lat, cell_lng).limit(MAP_MAX_POINTS + 1), True
+
+    stmt = source.select_from(select(*source.columns)).where(*filters).order_by(model.id).limit(MAP_MAX_POINTS + 1)
+    return stmt, False
+
+
+async def map_items(
+    db: AsyncSession,
+    source: _Source,
+    bbox: Optional[BBox] = None,
+    zoom: Optional[int] = None,
+    company_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+) -> Tuple[List[dict], str, bool]:
+    """(items, watermark for the next ?since=, truncated)"""
+    # Taken before the rows are read, so anything committed in between is sent again
+    watermark = (await _database_clock(db) - timedelta(seconds=MAP_SINCE_OVERLAP_SECONDS)).isoformat()
+    stmt, clustered = map_statement(source, bbox, zoom, company_id, since)
+    if clustered:
+        rows = (await db.execute(stmt)).all()
+        items = [
+            {"count": count, "latitude": lat, "longitude": lng, source.id_key: first_id if count == 1 else None}
+            for count, lat, lng, first_id in rows[:MAP_MAX_POINTS]
+        ]
+        return items, watermark, len(rows) > MAP_MAX_POINTS
+
+    rows = (await db.execute(stmt)).mappings().all()
+    return [dict(r) for r in rows[:MAP_MAX_POINTS]], watermark, len(rows) > MAP_MAX_POINTS
+
+
+# =========================================================
+# location_updated_at FOR ORM WRITES
+# =========================================================
+def _stamp_on_insert(mapper, connection, target):
+    if target.latitude is not None or target.longitude is not None:
+        target.location_updated_at = datetime.utcnow()
+
+
+def _stamp_on_update(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.latitude.history.has_changes() or state.attrs.longitude.history.has_changes():
+        target.location_updated_at = datetime.utcnow()
+
+
+for _model in (models.Staff, models.Patient):
+    event.listen(_model, "before_insert", _stamp_on_insert)
+    event.listen(_model, "before_update", _stamp_on_update)
@@ -0,0 +1,233 @@
+"""
+Background runner for bulk payroll jobs
+
+POST /payroll-enhanced/process/bulk only records a PayrollJob row and hands
+its id to a worker. Workers process the company's staff in chunks with the
+set-based bulk engine and write progress, per-staff errors and created payroll
+ids back to the job row after every chunk, so any API worker can report on it.
+
+PAYROLL_JOB_EXECUTOR selects where jobs run:
+  process  - local process pool inside each API worker (default)
+  thread   - local thread pool (useful for development)
+  external - nothing runs in the API; start `python -m app.cli payroll-worker`
+
+A running job refreshes heartbeat_at after every chunk. Jobs whose worker died
+(process restart, crash) are recovered at API startup and by the standalone
+worker: RUNNING jobs without a heartbeat for PAYROLL_JOB_STALE_SECONDS are
+marked FAILED (their finished chunks already created payrolls, so they are not
+re-run automatically), and in process/thread mode QUEUED jobs are submitted
+to the local pool again.
+"""
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from ..db import models
+from ..db.database import SessionLocal
+from .payroll_service import PayrollProcessor
+
+PAYROLL_JOB_EXECUTOR = os.getenv("PAYROLL_JOB_EXECUTOR", "process").lower()
+PAYROLL_JOB_WORKERS = int(os.getenv("PAYROLL_JOB_WORKERS", "2"))
+PAYROLL_JOB_CHUNK_SIZE = int(os.getenv("PAYROLL_JOB_CHUNK_SIZE", "500"))
+PAYROLL_WORKER_POLL_SECONDS = float(os.getenv("PAYROLL_WORKER_POLL_SECONDS", "2"))
+PAYROLL_JOB_STALE_SECONDS = float(os.getenv("PAYROLL_JOB_STALE_SECONDS", "900"))
+
+_executor: Optional[Executor] = None
+
+
+def _get_executor() -> Optional[Executor]:
+    global _executor
+    if PAYROLL_JOB_EXECUTOR == "external":
+        return None
+    if _executor is None:
+        if PAYROLL_JOB_EXECUTOR == "thread":
+            _executor = ThreadPoolExecutor(max_workers=PAYROLL_JOB_WORKERS, thread_name_prefix="payroll-job")
+        else:
+            # spawn: children must not inherit the parent's pooled DB connections
+            _executor = ProcessPoolExecutor(
+                max_workers=PAYROLL_JOB_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def submit_bulk_job(
+    db: Session,
+    company_id: int,
+    pay_period_start: datetime,
+    pay_period_end: datetime,
+    created_by: str = "system"
+) -> models.PayrollJob:
+    """Record a queued job and dispatch it to the local pool (if any)"""
+    job = models.PayrollJob(
+        company_id=company_id,
+        pay_period_start=pay_period_start,
+        pay_period_end=pay_period_end,
+        status=models.PayrollJobStatus.QUEUED,
+        total_staff=0,
+        processed_staff=0,
+        succeeded=0,
+        failed=0,
+        errors=[],
+        payroll_ids=[],
+        createdby=created_by,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+    executor = _get_executor()
+    if executor is not None:
+        executor.submit(run_payroll_job, job.id)
+    return job
+
+
+def _claim(db: Session, job_id: int) -> bool:
+    """Atomically move a job from queued to running; False if someone else has it"""
+    now = datetime.utcnow()
+    result = db.execute(
+        update(models.PayrollJob)
+        .where(models.PayrollJob.id == job_id, models.PayrollJob.status == models.PayrollJobStatus.QUEUED)
+        .values(status=models.PayrollJobStatus.RUNNING, started_at=now, heartbeat_at=now)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def run_payroll_job(job_id: int) -> None:
+    """Worker entry point: process a claimed job chunk by chunk"""
+    db = SessionLocal()
+    try:
+        if not _claim(db, job_id):
+            return
+        job = db.get(models.PayrollJob, job_id)
+        processor = PayrollProcessor(db)
+        staff_ids = processor.company_staff_ids(job.company_id)
+        job.total_staff = len(staff_ids)
+        db.commit()
+
+        errors = []
+        payroll_ids = []
+        for i in range(0, len(staff_ids), PAYROLL_JOB_CHUNK_SIZE):
+            chunk = staff_ids[i:i + PAYROLL_JOB_CHUNK_SIZE]
+            try:
+                payrolls = processor.bulk_process_payroll(
+                    company_id=job.company_id,
+                    pay_period_start=job.pay_period_start,
+                    pay_period_end=job.pay_period_end,
+                    staff_ids=chunk,
+                )
+                payroll_ids.extend(p.id for p in payrolls)
+                errors.extend(processor.errors)
+                job.succeeded = (job.succeeded or 0) + len(payrolls)
+                job.failed = (job.failed or 0) + len(processor.errors)
+            except Exception as e:
+                # The chunk's transaction was rolled back; record every staff in it
+                db.rollback()
+                job = db.get(models.PayrollJob, job_id)
+                errors.extend({"staff_id": staff_id, "error": str(e)} for staff_id in chunk)
+                job.failed = (job.failed or 0) + len(chunk)
+            job.processed_staff = min(i + len(chunk), len(staff_ids))
+            # Reassign (not mutate) so the JSON columns are flagged dirty
+            job.errors = list(errors)
+            job.payroll_ids = list(payroll_ids)
+            job.heartbeat_at = datetime.utcnow()
+            db.commit()
+
+        job.status = models.PayrollJobStatus.COMPLETED
+        job.finished_at = datetime.utcnow()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        job = db.get(models.PayrollJob, job_id)
+        if job is not None:
+            job.status = models.PayrollJobStatus.FAILED
+            job.error = str(e)
+            job.finished_at = datetime.utcnow()
+            db.commit()
+        traceback.print_exc()
+    finally:
+        db.close()
+
+
+# =========================================================
+# RECOVERY (jobs whose worker died)
+# =========================================================
+def fail_stale_jobs(db: Session, stale_seconds: float = PAYROLL_JOB_STALE_SECONDS) -> int:
+    """Mark RUNNING jobs without a recent heartbeat as FAILED; returns how many"""
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_seconds)
+    job = models.PayrollJob
+    result = db.execute(
+        update(job)
+        .where(
+            job.status == models.PayrollJobStatus.RUNNING,
+            func.coalesce(job.heartbeat_at, job.started_at, job.created_at) < cutoff,
+        )
+        .values(
+            status=models.PayrollJobStatus.FAILED,
+            error=f"Worker stopped responding (no heartbeat for {int(stale_seconds)}s); "
+                  "payrolls of finished chunks were kept, re-run the remaining staff",
+            finished_at=datetime.utcnow(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    if result.rowcount:
+        print(f"⚠ Marked {result.rowcount} stale payroll jobs as failed")
+    return result.rowcount
+
+
+def recover_jobs() -> None:
+    """Startup: fail stale RUNNING jobs and hand QUEUED ones to the local pool again"""
+    db = SessionLocal()
+    try:
+        fail_stale_jobs(db)
+        executor = _get_executor()
+        if executor is None:
+            return
+        queued = db.query(models.PayrollJob.id).filter(
+            models.PayrollJob.status == models.PayrollJobStatus.QUEUED
+        ).order_by(models.PayrollJob.id).all()
+    except Exception as e:
+        # Never block startup (e.g. schema not migrated yet with SCHEMA_CHECK=warn)
+        print(f"⚠ Payroll job recovery failed: {e}")
+        return
+    finally:
+        db.close()
+    for (job_id,) in queued:
+        executor.submit(run_payroll_job, job_id)
+    if queued:
+        print(f"✓ Resubmitted {len(queued)} queued payroll jobs")
+
+
+def run_worker(poll_seconds: float = PAYROLL_WORKER_POLL_SECONDS) -> None:
+    """Standalone worker loop: pick up queued jobs in creation order"""
+    print(f"Payroll worker started (poll every {poll_seconds}s)")
+    while True:
+        db = SessionLocal()
+        try:
+            fail_stale_jobs(db)
+            job_id = db.query(models.PayrollJob.id).filter(
+                models.PayrollJob.status == models.PayrollJobStatus.QUEUED
+            ).order_by(models.PayrollJob.id).limit(1).scalar()
+        finally:
+            db.close()
+        if job_id is None:
+            time.sleep(poll_seconds)
+            continue
+        print(f"Processing payroll job {job_id}")
+        run_payroll_job(job_id)
@@ -1,119 +1,64 @@
 """
 Payroll Processing Service with Canada and US Tax Calculations
 """
+from sqlalchemy import func, insert
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from ..db import models
+from .tax_engine import CompiledTaxTable, tax_engine
+from . import ytd_ledger
 from decimal import Decimal, ROUND_HALF_UP
+import numpy as np
 
 class PayrollProcessor:
     """Process payroll with tax calculations for Canada and US"""
     
     def __init__(self, db: Session):
         self.db = db
+        # Per-staff failures from the last bulk run: [{"staff_id": 1, "error": "..."}]
+        self.errors: List[Dict] = []
     
+    def tax_table(self, country_code: str, state_province: Optional[str] = None, year: int = 2025) -> CompiledTaxTable:
+        """Compiled tax table for a country/region/year (cached by the tax engine)"""
+        return tax_engine.get(self.db, country_code, state_province, year)
+
     def calculate_us_federal_tax(self, gross_pay: float, year: int = 2025) -> float:
         """
-        Calculate US Federal Income Tax (2025 rates - approximate)
+        Calculate US Federal Income Tax
         Single filer, standard deduction
         """
-        # Simplified brackets (biweekly pay period)
-        if gross_pay <= 300:
-            return 0.10 * gross_pay
-        elif gross_pay <= 1000:
-            return 30 + 0.12 * (gross_pay - 300)
-        elif gross_pay <= 2000:
-            return 114 + 0.22 * (gross_pay - 1000)
-        elif gross_pay <= 4000:
-            return 334 + 0.24 * (gross_pay - 2000)
-        else:
-            return 814 + 0.32 * (gross_pay - 4000)
+        return self.tax_table("US", None, year).federal(gross_pay)
     
     def calculate_canada_federal_tax(self, gross_pay: float, year: int = 2025) -> float:
         """
-        Calculate Canadian Federal Income Tax (2025 rates - approximate)
+        Calculate Canadian Federal Income Tax
         """
-        # Simplified brackets (biweekly pay period)
-        if gross_pay <= 400:
-            return 0.15 * gross_pay
-        elif gross_pay <= 800:
-            return 60 + 0.205 * (gross_pay - 400)
-        elif gross_pay <= 1600:
-            return 142 + 0.26 * (gross_pay - 800)
-        elif gross_pay <= 3200:
-            return 350 + 0.29 * (gross_pay - 1600)
-        else:
-            return 814 + 0.33 * (gross_pay - 3200)
+        return self.tax_table("CA", None, year).federal(gross_pay)
     
-    def calculate_social_security(self, gross_pay: float, country_code: str, ytd_gross: float = 0) -> float:
+    def calculate_social_security(self, gross_pay: float, country_code: str, ytd_gross: float = 0, year: int = 2025) -> float:
         """
         Calculate Social Security (US) or CPP (Canada)
         """
-        if country_code == "US":
-            # US Social Security: 6.2% up to $160,200 (2025)
-            max_income = 160200
-            rate = 0.062
-            if ytd_gross >= max_income:
-                return 0
-            taxable = min(gross_pay, max_income - ytd_gross)
-            return taxable * rate
-        elif country_code == "CA":
-            # Canada CPP: 5.95% up to $68,500 (2025 estimate)
-            max_income = 68500
-            rate = 0.0595
-            if ytd_gross >= max_income:
-                return 0
-            taxable = min(gross_pay, max_income - ytd_gross)
-            return taxable * rate
-        return 0
+        return self.tax_table(country_code, None, year).social_security(gross_pay, ytd_gross)
     
-    def calculate_medicare(self, gross_pay: float, country_code: str) -> float:
+    def calculate_medicare(self, gross_pay: float, country_code: str, year: int = 2025) -> float:
         """
         Calculate Medicare (US) or EI (Canada)
         """
-        if country_code == "US":
-            # US Medicare: 1.45% (no cap)
-            return gross_pay * 0.0145
-        elif country_code == "CA":
-            # Canada EI: 1.58% up to $63,200 (2025 estimate)
-            max_income = 63200
-            rate = 0.0158
-            return min(gross_pay, max_income) * rate
-        return 0
+        return self.tax_table(country_code, None, year).medicare(gross_pay)
     
     def calculate_state_provincial_tax(
         self, 
         gross_pay: float, 
         country_code: str, 
-        state_province: Optional[str] = None
+        state_province: Optional[str] = None,
+        year: int = 2025
     ) -> float:
         """
         Calculate State (US) or Provincial (Canada) tax
         """
-        # Simplified rates - in production, these would come from tax_rates table
-        rates = {
-            "US": {
-                "CA": 0.09,  # California
-                "NY": 0.065,  # New York
-                "TX": 0.0,  # Texas (no state income tax)
-                "FL": 0.0,  # Florida (no state income tax)
-                "default": 0.05
-            },
-            "CA": {
-                "ON": 0.0505,  # Ontario
-                "BC": 0.0506,  # British Columbia
-                "AB": 0.10,  # Alberta
-                "QC": 0.15,  # Quebec
-                "default": 0.05
-            }
-        }
-        
-        if country_code in rates:
-            state_rates = rates[country_code]
-            rate = state_rates.get(state_province, state_rates["default"])
-            return gross_pay * rate
-        return 0
+        return self.tax_table(country_code, state_province, year).state_provincial(gross_pay)
     
     def process_payroll(
         self,
@@ -163,7 +108,7 @@ class PayrollProcessor:
             if timesheet_id:
                 timesheet = self.db.get(models.Timesheet, timesheet_id)
                 if timesheet:
-                    hours_worked = timesheet.hours_worked
+                    hours_worked = timesheet.total_hours or 0
                 else:
                     hours_worked = 0
             else:
@@ -186,35 +131,20 @@ class PayrollProcessor:
         
         country_code = country.code
         
-        # Calculate YTD gross for Social Security cap check
-        ytd_payrolls = self.db.query(models.Payroll).filter(
-            models.Payroll.staff_id == staff_id,
-            models.Payroll.pay_period_start >= datetime(pay_period_start.year, 1, 1),
-            models.Payroll.pay_period_start < pay_period_start
-        ).all()
-        ytd_gross = sum(p.gross_pay for p in ytd_payrolls)
-        
-        # Calculate taxes based on country
-        if country_code == "US":
-            federal_tax = self.calculate_us_federal_tax(gross_pay)
-        elif country_code == "CA":
-            federal_tax = self.calculate_canada_federal_tax(gross_pay)
-        else:
-            federal_tax = gross_pay * 0.15  # Default 15%
+        # YTD gross of earlier periods for the Social Security cap check
+        ytd_gross = ytd_ledger.get_ytd_gross(self.db, staff_id, pay_period_start)
         
-        # Calculate state/provincial tax
+        # Calculate taxes from the compiled table for this country/region/year
         state_province = None  # TODO: Get from company or user profile
-        state_provincial_tax = self.calculate_state_provincial_tax(
-            gross_pay, country_code, state_province
-        )
+        table = self.tax_table(country_code, state_province, pay_period_start.year)
+        federal_tax = table.federal(gross_pay)
+        state_provincial_tax = table.state_provincial(gross_pay)
         
         # Calculate Social Security / CPP
-        social_security_tax = self.calculate_social_security(
-            gross_pay, country_code, ytd_gross
-        )
+        social_security_tax = table.social_security(gross_pay, ytd_gross)
         
         # Calculate Medicare / EI
-        medicare_tax = self.calculate_medicare(gross_pay, country_code)
+        medicare_tax = table.medicare(gross_pay)
         
         # Other deductions
         benefits_deduction = salary_config.benefits_deduction if salary_config.has_benefits else 0
@@ -286,51 +216,233 @@ class PayrollProcessor:
         )
         
         self.db.add(payroll)
+        ytd_ledger.record_payrolls(self.db, [payroll])
         self.db.commit()
         self.db.refresh(payroll)
         
         return payroll
     
-    def bulk_process_payroll(
+    def company_staff_ids(self, company_id: int) -> List[int]:
+        """IDs of staff whose user is active in the company, in ID order"""
+        rows = self.db.query(models.Staff.id).join(
+            models.User, models.Staff.user_id == models.User.id
+        ).filter(
+            models.User.company_id == company_id,
+            models.User.is_active == True
+        ).order_by(models.Staff.id).all()
+        return [r.id for r in rows]
+
+    def _load_bulk_inputs(
         self,
         company_id: int,
         pay_period_start: datetime,
+        pay_period_end: datetime,
+        staff_ids: Optional[List[int]] = None
+    ) -> List[Dict]:
+        """
+        Load everything a pay run needs in three set-based queries:
+        staff + salary config + country, verified period hours, and YTD gross
+        from the ledger.
+        """
+        query = self.db.query(
+            models.Staff.id.label("staff_id"),
+            models.User.company_id,
+            models.User.country_id,
+            models.Country.code.label("country_code"),
+            models.StaffSalaryConfig.id.label("salary_config_id"),
+            models.StaffSalaryConfig.hourly_rate,
+            models.StaffSalaryConfig.overtime_threshold_hours,
+            models.StaffSalaryConfig.overtime_rate_multiplier,
+            models.StaffSalaryConfig.has_benefits,
+            models.StaffSalaryConfig.benefits_deduction,
+        ).join(
+            models.User, models.Staff.user_id == models.User.id
+        ).outerjoin(
+            models.StaffSalaryConfig, models.StaffSalaryConfig.staff_id == models.Staff.id
+        ).outerjoin(
+            models.Country, models.Country.id == models.User.country_id
+        ).filter(
+            models.User.company_id == company_id,
+            models.User.is_active == True
+        )
+        if staff_ids is not None:
+            query = query.filter(models.Staff.id.in_(staff_ids))
+        staff_rows = query.order_by(models.Staff.id).all()
+
+        staff_ids = [r.staff_id for r in staff_rows]
+        if not staff_ids:
+            return []
+
+        hours_rows = self.db.query(
+            models.Timesheet.staff_id,
+            func.sum(models.Timesheet.total_hours).label("hours"),
+            func.count(models.Timesheet.id).label("timesheet_count"),
+            func.min(models.Timesheet.id).label("timesheet_id"),
+        ).filter(
+            models.Timesheet.staff_id.in_(staff_ids),
+            models.Timesheet.created_at >= pay_period_start,
+            models.Timesheet.created_at <= pay_period_end,
+            models.Timesheet.verified == True
+        ).group_by(models.Timesheet.staff_id).all()
+        hours_by_staff = {r.staff_id: r for r in hours_rows}
+
+        ytd_by_staff = ytd_ledger.get_ytd_gross_many(self.db, staff_ids, pay_period_start)
+
+        inputs = []
+        for r in staff_rows:
+            hours = hours_by_staff.get(r.staff_id)
+            inputs.append({
+                "staff_id": r.staff_id,
+                "company_id": r.company_id,
+                "country_id": r.country_id,
+                "country_code": r.country_code,
+                "salary_config_id": r.salary_config_id,
+                "hourly_rate": r.hourly_rate,
+                "overtime_threshold_hours": r.overtime_threshold_hours if r.overtime_threshold_hours is not None else 40.0,
+                "overtime_rate_multiplier": r.overtime_rate_multiplier if r.overtime_rate_multiplier is not None else 1.5,
+                "benefits_deduction": (r.benefits_deduction or 0) if r.has_benefits else 0,
+                "hours_worked": (hours.hours or 0) if hours else 0,
+                # Only link a timesheet when exactly one covers the period
+                "timesheet_id": hours.timesheet_id if hours and hours.timesheet_count == 1 else None,
+                "ytd_gross": ytd_by_staff.get(r.staff_id, 0),
+            })
+        return inputs
+
+    def _compute_bulk_rows(
+        self,
+        inputs: List[Dict],
+        pay_period_start: datetime,
         pay_period_end: datetime
+    ) -> List[Dict]:
+        """
+        Compute pay and every tax line for a batch of staff as NumPy arrays,
+        one vectorized pass per country code using the same compiled tax
+        table as process_payroll. Returns Payroll column dicts.
+        """
+        rows: List[Dict] = []
+        by_country: Dict[str, List[Dict]] = {}
+        for item in inputs:
+            by_country.setdefault(item["country_code"], []).append(item)
+
+        for country_code, items in by_country.items():
+            hours = np.array([i["hours_worked"] for i in items], dtype=float)
+            rate = np.array([i["hourly_rate"] for i in items], dtype=float)
+            threshold = np.array([i["overtime_threshold_hours"] for i in items], dtype=float)
+            multiplier = np.array([i["overtime_rate_multiplier"] for i in items], dtype=float)
+            benefits = np.array([i["benefits_deduction"] for i in items], dtype=float)
+            ytd = np.array([i["ytd_gross"] for i in items], dtype=float)
+
+            regular_hours = np.minimum(hours, threshold)
+            overtime_hours = np.maximum(0, hours - threshold)
+            regular_pay = regular_hours * rate
+            overtime_pay = overtime_hours * rate * multiplier
+            gross = regular_pay + overtime_pay
+
+            taxes = self.tax_table(country_code, None, pay_period_start.year).compute(gross, ytd)
+            federal = taxes["federal_tax"]
+            state = taxes["state_provincial_tax"]
+            social = taxes["social_security_tax"]
+            medicare = taxes["medicare_tax"]
+            total = federal + state + social + medicare + benefits
+            net = gross - total
+
+            for idx, item in enumerate(items):
+                # Round per element with Python's round() to match process_payroll exactly
+                gross_pay = round(float(gross[idx]), 2)
+                federal_tax = round(float(federal[idx]), 2)
+                state_provincial_tax = round(float(state[idx]), 2)
+                social_security_tax = round(float(social[idx]), 2)
+                medicare_tax = round(float(medicare[idx]), 2)
+                other_deductions = round(float(benefits[idx]), 2)
+                net_pay = round(float(net[idx]), 2)
+                tax_details = {
+                    "country_code": country_code,
+                    "state_province": None,
+                    "regular_hours": float(regular_hours[idx]),
+                    "overtime_hours": float(overtime_hours[idx]),
+                    "regular_pay": round(float(regular_pay[idx]), 2),
+                    "overtime_pay": round(float(overtime_pay[idx]), 2),
+                    "ytd_gross": item["ytd_gross"],
+                    "tax_breakdown": {
+                        "federal_tax": federal_tax,
+                        "state_provincial_tax": state_provincial_tax,
+                        "social_security_tax": social_security_tax,
+                        "medicare_tax": medicare_tax,
+                        "benefits_deduction": item["benefits_deduction"],
+                        "other_deductions": other_deductions
+                    }
+                }
+                rows.append({
+                    "staff_id": item["staff_id"],
+                    "timesheet_id": item["timesheet_id"],
+                    "company_id": item["company_id"],
+                    "country_id": item["country_id"],
+                    "hours_worked": item["hours_worked"],
+                    "hourly_rate": item["hourly_rate"],
+                    "gross_pay": gross_pay,
+                    "federal_tax": federal_tax,
+                    "state_provincial_tax": state_provincial_tax,
+                    "social_security_tax": social_security_tax,
+                    "medicare_tax": medicare_tax,
+                    "other_deductions": other_deductions,
+                    "total_deductions": round(float(total[idx]), 2),
+                    "net_pay": net_pay,
+                    "total_pay": net_pay,  # Backward compatibility
+                    "pay_period_start": pay_period_start,
+                    "pay_period_end": pay_period_end,
+                    "status": models.PayrollStatus.PENDING,
+                    "tax_calculation_details": tax_details,
+                    "createdby": "system",
+                })
+        return rows
+
+    def bulk_process_payroll(
+        self,
+        company_id: int,
+        pay_period_start: datetime,
+        pay_period_end: datetime,
+        staff_ids: Optional[List[int]] = None
     ) -> List[models.Payroll]:
         """
         Process payroll for all staff in a company for a given pay period
+
+        Set-based: inputs are loaded in a handful of queries, pay and taxes are
+        computed as arrays, and all Payroll rows are written with a single bulk
+        insert in one transaction. Pass staff_ids to process one chunk of the
+        company; per-staff failures are collected in self.errors.
         """
-        # Get all active staff for company
-        users = self.db.query(models.User).filter(
-            models.User.company_id == company_id,
-            models.User.is_active == True
-        ).all()
-        
-        payrolls = []
-        for user in users:
-            if user.staff_profile:
-                staff = user.staff_profile
-                
-                # Find timesheet for this period
-                timesheet = self.db.query(models.Timesheet).filter(
-                    models.Timesheet.staff_id == staff.id,
-                    models.Timesheet.date >= pay_period_start,
-                    models.Timesheet.date <= pay_period_end,
-                    models.Timesheet.verified == True
-                ).first()
-                
-                try:
-                    payroll = self.process_payroll(
-                        staff_id=staff.id,
-                        pay_period_start=pay_period_start,
-                        pay_period_end=pay_period_end,
-                        timesheet_id=timesheet.id if timesheet else None,
-                        hours_worked=timesheet.hours_worked if timesheet else 0
-                    )
-                    payrolls.append(payroll)
-                except Exception as e:
-                    print(f"Error processing payroll for staff {staff.id}: {e}")
-                    continue
-        
-        return payrolls
+        self.errors = []
+        inputs = []
+        for item in self._load_bulk_inputs(company_id, pay_period_start, pay_period_end, staff_ids):
+            error = None
+            if not item["company_id"] or not item["country_id"]:
+                error = "Staff must be linked to a company and country"
+            elif item["salary_config_id"] is None or item["hourly_rate"] is None:
+                error = f"No salary configuration for staff {item['staff_id']}"
+            elif not item["country_code"]:
+                error = f"Country {item['country_id']} not found"
+            if error:
+                self.errors.append({"staff_id": item["staff_id"], "error": error})
+                continue
+            inputs.append(item)
+
+        rows = self._compute_bulk_rows(inputs, pay_period_start, pay_period_end)
+        if not rows:
+            return []
 
+        try:
+            payrolls = self.db.scalars(
+                insert(models.Payroll).returning(models.Payroll),
+                rows
+            ).all()
+            # Detach the freshly inserted rows so commit() does not expire them;
+            # otherwise serializing the response would reload each row one by one.
+            for payroll in payrolls:
+                self.db.expunge(payroll)
+            ytd_ledger.record_payrolls(self.db, rows)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        return payrolls
@@ -0,0 +1,175 @@
+"""
+Authenticated principal resolution
+
+A Principal is the small, immutable view of a user that request handling
+needs (id, email, company, role, privilege codes, active flag). It is
+resolved once per request from the JWT and kept in a TTL + LRU cache keyed
+by user id, so authenticated calls normally touch the database not at all.
+
+Entries are dropped as soon as users, roles or privileges (including the
+role_privileges links) change in this process; PRINCIPAL_CACHE_TTL_SECONDS
+bounds how long other workers can serve a stale entry.
+"""
+import os
+from dataclasses import dataclass
+from typing import FrozenSet, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from ..db import models
+from ..db.database import SessionLocal
+from ..utils.cache import TTLCache
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Read-only stand-in for models.User on authenticated requests"""
+    id: int
+    email: Optional[str]
+    full_name: Optional[str]
+    company_id: Optional[int]
+    country_id: Optional[int]
+    role_id: Optional[int]
+    role: Optional[str]
+    privileges: FrozenSet[str]
+    is_active: bool
+
+    @property
+    def created_by(self) -> str:
+        return self.email or self.full_name or f"user:{self.id}"
+
+
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl_seconds=PRINCIPAL_CACHE_TTL_SECONDS)
+
+
+def load_principal(db: Session, user_id: int) -> Optional[Principal]:
+    """One query: the user, its role name and every privilege code of the role"""
+    rows = db.execute(
+        select(
+            models.User.id,
+            models.User.email,
+            models.User.full_name,
+            models.User.company_id,
+            models.User.country_id,
+            models.User.role_id,
+            models.User.is_active,
+            models.Role.name.label("role_name"),
+            models.Privilege.code.label("privilege_code"),
+        )
+        .select_from(models.User)
+        .outerjoin(models.Role, models.Role.id == models.User.role_id)
+        .outerjoin(
+            models.role_privilege_table,
+            models.role_privilege_table.c.role_id == models.Role.id,
+        )
+        .outerjoin(
+            models.Privilege,
+            models.Privilege.id == models.role_privilege_table.c.privilege_id,
+        )
+        .where(models.User.id == user_id)
+    ).all()
+    if not rows:
+        return None
+    first = rows[0]
+    return Principal(
+        id=first.id,
+        email=first.email,
+        full_name=first.full_name,
+        company_id=first.company_id,
+        country_id=first.country_id,
+        role_id=first.role_id,
+        role=first.role_name,
+        privileges=frozenset(r.privilege_code.lower() for r in rows if r.privilege_code),
+        is_active=bool(first.is_active),
+    )
+
+
+def get_principal(user_id: int, db: Optional[Session] = None) -> Optional[Principal]:
+    """Cached principal for user_id; opens a session only on a cache miss"""
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+    try:
+        principal = load_principal(db, user_id)
+    finally:
+        if own_session:
+            db.close()
+    if principal is not None:
+        principal_cache.set(user_id, principal)
+    return principal
+
+
+def invalidate(user_id: Optional[int] = None) -> None:
+    """Drop one user's principal, or every principal when user_id is None"""
+    if user_id is None:
+        principal_cache.clear()
+    else:
+        principal_cache.pop(user_id)
+
+
+# =========================================================
+# INVALIDATION
+# =========================================================
+_PENDING_KEY = "principal_invalidations"
+
+
+def _collect(session: Session) -> set:
+    """User ids touched by the flush; None means 'everything'"""
+    touched = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.User):
+            if obj.id is not None:
+                touched.add(obj.id)
+        elif isinstance(obj, (models.Role, models.Privilege)):
+            # Changing role.privileges marks the Role dirty, so this also
+            # covers role_privileges inserts and deletes
+            touched.add(None)
+    return touched
+
+
+def _apply(touched: set) -> None:
+    if None in touched:
+        invalidate()
+    else:
+        for user_id in touched:
+            invalidate(user_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_after_flush(session, flush_context):
+    touched = _collect(session)
+    if touched:
+        _apply(touched)
+        session.info.setdefault(_PENDING_KEY, set()).update(touched)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    # Again after commit, in case a concurrent request re-cached the old row
+    # between our flush and our commit
+    touched = session.info.pop(_PENDING_KEY, None)
+    if touched:
+        _apply(touched)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_bulk_statements(orm_execute_state):
+    # query(User).update(...) / delete(...) bypass the unit of work
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in (models.User, models.Role, models.Privilege):
+        invalidate()
+        orm_execute_state.session.info.setdefault(_PENDING_KEY, set()).add(None)
@@ -0,0 +1,160 @@
+"""
+Compiled role -> privilege sets for authorization checks
+
+Every role is compiled once into a CompiledRole holding its privilege codes
+as a lower-cased frozenset plus the role's version stamp (roles.version,
+bumped on every change to the role or its privileges). Tokens carry the
+role version they were issued with ("rv" claim), so a guard can trust the
+cached set without a database round trip unless the token proves the role
+has changed since it was compiled.
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from ..db import models
+from ..db.database import SessionLocal
+
+ROLE_REGISTRY_TTL_SECONDS = float(os.getenv("ROLE_REGISTRY_TTL_SECONDS", "300"))
+
+
+def compile_codes(codes: Iterable[Optional[str]]) -> FrozenSet[str]:
+    return frozenset(c.strip().lower() for c in codes if c and c.strip())
+
+
+@dataclass(frozen=True)
+class CompiledRole:
+    id: int
+    name: str
+    version: int
+    privileges: FrozenSet[str]
+
+
+class RoleRegistry:
+    """
+    Process-wide cache of compiled roles keyed by role id.
+
+    A role is reloaded when its entry is older than ROLE_REGISTRY_TTL_SECONDS,
+    when it changed in this process, or when a token claims a newer version
+    than the one cached (the role was edited through another worker).
+    """
+
+    def __init__(self, ttl_seconds: float = ROLE_REGISTRY_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._roles: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, role_id: Optional[int], claimed_version: Optional[int] = None) -> Optional[CompiledRole]:
+        if not role_id:
+            return None
+        cached = self._roles.get(role_id)
+        now = time.monotonic()
+        if cached is not None:
+            loaded_at, role = cached
+            fresh = now - loaded_at < self.ttl_seconds
+            if fresh and (claimed_version is None or claimed_version <= role.version):
+                return role
+        role = self._load(role_id)
+        with self._lock:
+            if role is None:
+                self._roles.pop(role_id, None)
+            else:
+                self._roles[role_id] = (now, role)
+        return role
+
+    def _load(self, role_id: int) -> Optional[CompiledRole]:
+        db = SessionLocal()
+        try:
+            return load_role(db, role_id)
+        finally:
+            db.close()
+
+    def invalidate(self, role_id: Optional[int] = None) -> None:
+        with self._lock:
+            if role_id is None:
+                self._roles.clear()
+            else:
+                self._roles.pop(role_id, None)
+
+
+def load_role(db: Session, role_id: int) -> Optional[CompiledRole]:
+    """One query: the role row and all of its privilege codes"""
+    rows = db.execute(
+        select(models.Role.id, models.Role.name, models.Role.version, models.Privilege.code)
+        .select_from(models.Role)
+        .outerjoin(
+            models.role_privilege_table,
+            models.role_privilege_table.c.role_id == models.Role.id,
+        )
+        .outerjoin(
+            models.Privilege,
+            models.Privilege.id == models.role_privilege_table.c.privilege_id,
+        )
+        .where(models.Role.id == role_id)
+    ).all()
+    if not rows:
+        return None
+    return CompiledRole(
+        id=rows[0].id,
+        name=rows[0].name,
+        version=rows[0].version or 0,
+        privileges=compile_codes(r.code for r in rows),
+    )
+
+
+role_registry = RoleRegistry()
+
+
+# =========================================================
+# VERSION STAMPS
+# =========================================================
+def _bump(role: models.Role) -> None:
+    role.version = (role.version or 0) + 1
+
+
+@event.listens_for(Session, "before_flush")
+def _bump_role_versions(session, flush_context, instances):
+    changed = set()
+    for obj in list(session.dirty):
+        # Editing role.privileges also marks the Role itself as modified
+        if isinstance(obj, models.Role) and session.is_modified(obj) and obj.id not in changed:
+            _bump(obj)
+            changed.add(obj.id)
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.Privilege) and (obj in session.deleted or session.is_modified(obj)):
+            # A renamed or removed privilege changes every role that holds it
+            for role in obj.roles:
+                if role.id not in changed:
+                    _bump(role)
+                    changed.add(role.id)
+    for obj in list(session.deleted):
+        if isinstance(obj, models.Role):
+            changed.add(obj.id)
+    if changed:
+        session.info.setdefault("roles_changed", set()).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_roles(session):
+    changed = session.info.pop("roles_changed", None)
+    for role_id in changed or ():
+        role_registry.invalidate(role_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_roles(session):
+    session.info.pop("roles_changed", None)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_bulk_role_statements(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in (models.Role, models.Privilege):
+        role_registry.invalidate()
@@ -0,0 +1,299 @@
+"""
+Per-endpoint request metrics: latency, database time, query count and N+1 detection
+
+RequestMetricsMiddleware gives each HTTP request a RequestMetrics object in a
+context variable. SQLAlchemy cursor events (registered on every Engine, so the
+primary, replicas and the async engines are all covered) and the instrumented
+pool add to it while the request runs:
+
+    wall time   request start -> application returned
+    db time     sum of cursor executions
+    queries     cursor executions (an executemany counts once)
+    rows        rows reported by the driver (SQLite does not report SELECT counts)
+    pool wait   time spent waiting for a pooled connection (sync pool only)
+
+A request that runs the same statement more than N_PLUS_ONE_THRESHOLD times is
+flagged as an N+1 (a query per row in a loop): the statement is printed once per
+route and kept in the route's stats. Statements are compared as compiled by
+SQLAlchemy, i.e. with bound parameters, so lazy loads in a loop are caught.
+
+Each response gets a Server-Timing header (visible in the browser's devtools):
+
+    Server-Timing: db;dur=12.4;desc="9 queries", pool;dur=0.1, app;dur=18.0
+
+(plus nplus1;desc="30x same statement" when the request was flagged).
+
+Totals are kept per route template (GET /staff/{staff_id}, not /staff/12) and
+served by /internal/metrics in the Prometheus text format and by
+/internal/requests as JSON. Counters are per worker process.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from ..db.database import on_pool_wait
+
+REQUEST_METRICS = os.getenv("REQUEST_METRICS", "true").lower() in ("1", "true", "yes")
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "true").lower() in ("1", "true", "yes")
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+
+# Upper bounds (seconds) of the request duration histogram buckets; the last is +Inf
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# N+1 statements remembered per route (the ones with the most repeats win)
+NPLUS1_SAMPLES = 5
+UNMATCHED_ROUTE = "<unmatched>"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_QUERY_STARTED = "_request_metrics_started"
+
+
+class RequestMetrics:
+    """What one request spent; filled in by the cursor and pool hooks"""
+
+    __slots__ = ("started", "db_seconds", "queries", "rows", "pool_wait_seconds", "statements")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_seconds = 0.0
+        self.queries = 0
+        self.rows = 0
+        self.pool_wait_seconds = 0.0
+        self.statements: Dict[str, int] = {}
+
+    def repeated_statements(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> Dict[str, int]:
+        """Statements executed more than threshold times"""
+        return {sql: n for sql, n in self.statements.items() if n > threshold}
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+
+def current_metrics() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+@on_pool_wait
+def record_pool_wait(seconds: float) -> None:
+    """Called by the instrumented pool after every checkout"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.pool_wait_seconds += seconds
+
+
+# =========================================================
+# SQLALCHEMY HOOKS
+# =========================================================
+# The start time lives on the statement's execution context, which is discarded
+# with the statement, so a query that raises leaves nothing behind on the connection
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _current.get() is not None:
+        setattr(context, _QUERY_STARTED, time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    metrics = _current.get()
+    started = getattr(context, _QUERY_STARTED, None)
+    if metrics is None or started is None:
+        return
+    metrics.db_seconds += time.perf_counter() - started
+    metrics.queries += 1
+    rowcount = getattr(cursor, "rowcount", -1)
+    if rowcount and rowcount > 0:
+        metrics.rows += rowcount
+    metrics.statements[statement] = metrics.statements.get(statement, 0) + 1
+
+
+# =========================================================
+# PER-ROUTE TOTALS
+# =========================================================
+class RouteStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.db_seconds = 0.0
+        self.queries = 0
+        self.rows = 0
+        self.pool_wait_seconds = 0.0
+        self.nplus1_requests = 0
+        self.nplus1: Dict[str, int] = {}  # statement -> most repeats seen in one request
+        self.buckets = [0] * (len(DURATION_BUCKETS) + 1)
+
+    def add(self, metrics: RequestMetrics, seconds: float, status: int, repeated: Dict[str, int]) -> None:
+        self.requests += 1
+        if status >= 500:
+            self.errors += 1
+        self.seconds += seconds
+        self.buckets[bisect_left(DURATION_BUCKETS, seconds)] += 1
+        self.db_seconds += metrics.db_seconds
+        self.queries += metrics.queries
+        self.rows += metrics.rows
+        self.pool_wait_seconds += metrics.pool_wait_seconds
+        if repeated:
+            self.nplus1_requests += 1
+            for sql, count in repeated.items():
+                self.nplus1[sql] = max(count, self.nplus1.get(sql, 0))
+            if len(self.nplus1) > NPLUS1_SAMPLES:
+                keep = sorted(self.nplus1.items(), key=lambda item: item[1], reverse=True)[:NPLUS1_SAMPLES]
+                self.nplus1 = dict(keep)
+
+    def snapshot(self) -> dict:
+        requests = self.requests or 1
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "avg_ms": round(self.seconds / requests * 1000, 3),
+            "avg_db_ms": round(self.db_seconds / requests * 1000, 3),
+            "avg_queries": round(self.queries / requests, 2),
+            "avg_rows": round(self.rows / requests, 2),
+            "avg_pool_wait_ms": round(self.pool_wait_seconds / requests * 1000, 3),
+            "nplus1_requests": self.nplus1_requests,
+            "nplus1_statements": [
+                {"repeats": count, "statement": sql[:500]}
+                for sql, count in sorted(self.nplus1.items(), key=lambda item: item[1], reverse=True)
+            ],
+        }
+
+
+class MetricsRegistry:
+    """Per (method, route template) totals for this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[Tuple[str, str], RouteStats] = {}
+
+    def record(self, method: str, route: str, metrics: RequestMetrics, seconds: float, status: int) -> None:
+        repeated = metrics.repeated_statements()
+        with self._lock:
+            stats = self._routes.get((method, route))
+            if stats is None:
+                stats = self._routes[(method, route)] = RouteStats()
+            new_shapes = [sql for sql in repeated if sql not in stats.nplus1]
+            stats.add(metrics, seconds, status, repeated)
+        for sql in new_shapes:
+            print(f"⚠ N+1 in {method} {route}: statement ran {repeated[sql]}x in one request: {' '.join(sql.split())[:300]}")
+
+    def snapshot(self) -> list:
+        with self._lock:
+            items = [(key, stats.snapshot()) for key, stats in self._routes.items()]
+        return [
+            {"method": method, "route": route, **stats}
+            for (method, route), stats in sorted(items, key=lambda item: item[1]["requests"], reverse=True)
+        ]
+
+    def prometheus(self) -> str:
+        """All routes in the Prometheus text exposition format"""
+        counters = (
+            ("app_http_requests_total", "counter", "HTTP requests", lambda s: s.requests),
+            ("app_http_request_errors_total", "counter", "HTTP requests answered with a 5xx", lambda s: s.errors),
+            ("app_db_query_seconds_total", "counter", "Time spent executing SQL", lambda s: s.db_seconds),
+            ("app_db_queries_total", "counter", "SQL statements executed", lambda s: s.queries),
+            ("app_db_rows_total", "counter", "Rows reported by the database driver", lambda s: s.rows),
+            ("app_db_pool_wait_seconds_total", "counter", "Time spent waiting for a pooled connection", lambda s: s.pool_wait_seconds),
+            ("app_db_nplus1_requests_total", "counter",
+             f"Requests that ran one statement more than {N_PLUS_ONE_THRESHOLD} times", lambda s: s.nplus1_requests),
+        )
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines = []
+            for name, kind, help_text, value in counters:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for (method, route), stats in routes:
+                    lines.append(f"{name}{{{_labels(method, route)}}} {_number(value(stats))}")
+
+            name = "app_http_request_duration_seconds"
+            lines.append(f"# HELP {name} HTTP request wall time")
+            lines.append(f"# TYPE {name} histogram")
+            for (method, route), stats in routes:
+                labels = _labels(method, route)
+                cumulative = 0
+                for bound, count in zip(list(DURATION_BUCKETS) + ["+Inf"], stats.buckets):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{labels}}} {_number(stats.seconds)}")
+                lines.append(f"{name}_count{{{labels}}} {stats.requests}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(method: str, route: str) -> str:
+    return f'method="{_escape(method)}",route="{_escape(route)}"'
+
+
+def _number(value) -> str:
+    return repr(round(value, 6)) if isinstance(value, float) else str(value)
+
+
+registry = MetricsRegistry()
+
+
+# =========================================================
+# MIDDLEWARE
+# =========================================================
+def server_timing(metrics: RequestMetrics) -> str:
+    elapsed_ms = (time.perf_counter() - metrics.started) * 1000
+    parts = [
+        f'db;dur={metrics.db_seconds * 1000:.1f};desc="{metrics.queries} {"query" if metrics.queries == 1 else "queries"}"',
+        f"pool;dur={metrics.pool_wait_seconds * 1000:.1f}",
+    ]
+    repeated = metrics.repeated_statements()
+    if repeated:
+        parts.append(f'nplus1;desc="{max(repeated.values())}x same statement"')
+    parts.append(f"app;dur={elapsed_ms:.1f}")
+    return ", ".join(parts)
+
+
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class RequestMetricsMiddleware:
+    """
+    Pure ASGI middleware timing each HTTP request and recording it under its
+    route template. Add it last so it wraps every other middleware.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not REQUEST_METRICS:
+            await self.app(scope, receive, send)
+            return
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING_HEADER:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(metrics).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            registry.record(scope["method"], _route_template(scope), metrics,
+                            time.perf_counter() - metrics.started, status)
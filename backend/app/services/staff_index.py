@@ -0,0 +1,357 @@
+"""
+In-memory spatial index of staff positions (nearest-available-staff queries)
+
+Staff with coordinates are bucketed into a fixed lat/lng grid of
+STAFF_INDEX_CELL_DEG degrees. nearest() searches rings of cells outwards from the
+query point and stops once the next ring cannot hold anything closer than the
+k-th hit (or lies beyond radius_km), so a query only looks at staff close to
+the point however many are indexed.
+
+The index loads with one projection query on first use and stays current:
+  - location flushes move staff in place (move())
+  - staff / user rows changed through the ORM are reloaded on the next query
+  - a full rebuild runs in the background every STAFF_INDEX_REFRESH_SECONDS,
+    which also picks up positions flushed by other workers
+"""
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from operator import itemgetter
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, or_, select
+from sqlalchemy.orm import Session
+
+from ..db import models
+from ..db.database import SessionLocal
+
+STAFF_INDEX_CELL_DEG = float(os.getenv("STAFF_INDEX_CELL_DEG", "0.02"))
+STAFF_INDEX_REFRESH_SECONDS = float(os.getenv("STAFF_INDEX_REFRESH_SECONDS", "60"))
+
+# Statements carrying this execution option only move staff positions; the location
+# flush applies those to the index itself instead of forcing a reload
+POSITIONS_ONLY = "staff_index_positions_only"
+
+_EARTH_RADIUS_KM = 6371.0088
+_KM_PER_DEG = math.pi * _EARTH_RADIUS_KM / 180
+
+
+@dataclass(frozen=True)
+class StaffPoint:
+    staff_id: int
+    user_id: Optional[int]
+    name: Optional[str]
+    company_id: Optional[int]
+    latitude: float
+    longitude: float
+    available: bool
+    skills: FrozenSet[str]
+    # radians / cos(latitude), precomputed for the haversine in nearest()
+    phi: float = field(init=False, repr=False, compare=False)
+    lam: float = field(init=False, repr=False, compare=False)
+    cos_phi: float = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "phi", math.radians(self.latitude))
+        object.__setattr__(self, "lam", math.radians(self.longitude))
+        object.__setattr__(self, "cos_phi", math.cos(self.phi))
+
+
+def _hav_to_km(a: float) -> float:
+    return 2 * _EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _km_to_hav(km: float) -> float:
+    return math.sin(min(math.pi / 2, km / (2 * _EARTH_RADIUS_KM))) ** 2
+
+
+def _cell(lat: float, lng: float) -> Tuple[int, int]:
+    return math.floor(lat / STAFF_INDEX_CELL_DEG), math.floor(lng / STAFF_INDEX_CELL_DEG)
+
+
+def _skills(value) -> FrozenSet[str]:
+    if isinstance(value, str):
+        value = [value]
+    return frozenset(str(s).strip().lower() for s in (value or []) if str(s).strip())
+
+
+class StaffIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._points: Dict[int, StaffPoint] = {}
+        self._cells: Dict[Tuple[int, int], Dict[int, StaffPoint]] = {}
+        self._bounds: Optional[List[int]] = None  # min/max cell row and column ever occupied
+        self._loaded_at: Optional[float] = None
+        self._rebuilding = False
+        self._dirty_staff: Set[int] = set()
+        self._dirty_users: Set[int] = set()
+        self._reload_all = False
+
+    # ---------- maintenance ----------
+    def _put(self, point: StaffPoint) -> None:
+        self._drop(point.staff_id)
+        self._points[point.staff_id] = point
+        key = _cell(point.latitude, point.longitude)
+        self._cells.setdefault(key, {})[point.staff_id] = point
+        self._bounds = _extend(self._bounds, key)
+
+    def _drop(self, staff_id: int) -> None:
+        old = self._points.pop(staff_id, None)
+        if old is not None:
+            key = _cell(old.latitude, old.longitude)
+            members = self._cells.get(key)
+            if members is not None:
+                members.pop(staff_id, None)
+                if not members:
+                    del self._cells[key]
+
+    def move(self, positions: Iterable[Tuple[int, float, float]]) -> None:
+        """Apply (staff id, lat, lng) updates already committed to the database"""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            for staff_id, lat, lng in positions:
+                point = self._points.get(staff_id)
+                if point is None:
+                    # not indexed yet (had no coordinates): load its attributes with the next query
+                    self._dirty_staff.add(staff_id)
+                else:
+                    self._put(replace(point, latitude=lat, longitude=lng))
+
+    def mark_dirty(self, staff_ids: Iterable[int] = (), user_ids: Iterable[int] = (), everything: bool = False) -> None:
+        with self._lock:
+            self._dirty_staff.update(staff_ids)
+            self._dirty_users.update(user_ids)
+            self._reload_all = self._reload_all or everything
+
+    def _load(self, db: Session, staff_ids: Optional[Set[int]] = None, user_ids: Optional[Set[int]] = None) -> List[tuple]:
+        stmt = (
+            select(
+                models.Staff.id, models.Staff.user_id, models.User.full_name, models.User.company_id,
+                models.Staff.latitude, models.Staff.longitude, models.Staff.available, models.Staff.skills,
+                models.User.is_active,
+            )
+            .select_from(models.Staff)
+            .outerjoin(models.User, models.User.id == models.Staff.user_id)
+        )
+        if staff_ids is not None or user_ids is not None:
+            stmt = stmt.where(or_(models.Staff.id.in_(staff_ids or []), models.Staff.user_id.in_(user_ids or [])))
+        return db.execute(stmt).all()
+
+    @staticmethod
+    def _point(row) -> Optional[StaffPoint]:
+        staff_id, user_id, name, company_id, lat, lng, available, skills, is_active = row
+        if lat is None or lng is None or is_active is False:
+            return None
+        return StaffPoint(staff_id, user_id, name, company_id, lat, lng, available is not False, _skills(skills))
+
+    def rebuild(self) -> None:
+        db = SessionLocal()
+        try:
+            with self._lock:
+                self._dirty_staff.clear()
+                self._dirty_users.clear()
+                self._reload_all = False
+            rows = self._load(db)
+        finally:
+            db.close()
+        points: Dict[int, StaffPoint] = {}
+        cells: Dict[Tuple[int, int], Dict[int, StaffPoint]] = {}
+        bounds = None
+        for row in rows:
+            point = self._point(row)
+            if point is not None:
+                key = _cell(point.latitude, point.longitude)
+                points[point.staff_id] = point
+                cells.setdefault(key, {})[point.staff_id] = point
+                bounds = _extend(bounds, key)
+        with self._lock:
+            self._points, self._cells, self._bounds = points, cells, bounds
+            self._loaded_at = time.monotonic()
+            self._rebuilding = False
+
+    def _background_rebuild(self) -> None:
+        try:
+            self.rebuild()
+        except Exception as exc:
+            print(f"Staff index rebuild failed: {exc}")
+            with self._lock:
+                self._rebuilding = False
+                self._loaded_at = time.monotonic()  # retry after the next interval
+
+    def _refresh(self) -> None:
+        """Load on first use, reload dirty rows, and kick off periodic rebuilds"""
+        with self._lock:
+            loaded_at, reload_all = self._loaded_at, self._reload_all
+            stale = loaded_at is not None and time.monotonic() - loaded_at >= STAFF_INDEX_REFRESH_SECONDS
+            start_background = stale and not self._rebuilding
+            if start_background:
+                self._rebuilding = True
+            staff_ids, user_ids = self._dirty_staff, self._dirty_users
+            if loaded_at is not None and not reload_all and (staff_ids or user_ids):
+                self._dirty_staff, self._dirty_users = set(), set()
+            else:
+                staff_ids, user_ids = set(), set()
+        if loaded_at is None or reload_all:
+            self.rebuild()
+            return
+        if start_background:
+            threading.Thread(target=self._background_rebuild, name="staff-index-rebuild", daemon=True).start()
+        if staff_ids or user_ids:
+            db = SessionLocal()
+            try:
+                rows = self._load(db, staff_ids, user_ids)
+            finally:
+                db.close()
+            with self._lock:
+                seen = set()
+                for row in rows:
+                    seen.add(row[0])
+                    point = self._point(row)
+                    if point is None:
+                        self._drop(row[0])
+                    else:
+                        self._put(point)
+                for staff_id in staff_ids - seen:  # deleted
+                    self._drop(staff_id)
+
+    # ---------- queries ----------
+    def nearest(
+        self,
+        lat: float,
+        lng: float,
+        k: int = 10,
+        radius_km: Optional[float] = None,
+        skill: Optional[str] = None,
+        company_id: Optional[int] = None,
+        available_only: bool = True,
+    ) -> List[Tuple[float, StaffPoint]]:
+        """Up to k (distance_km, StaffPoint) pairs, closest first"""
+        self._refresh()
+        skill = skill.strip().lower() if skill else None
+        hits: List[Tuple[float, StaffPoint]] = []
+
+        # Candidates are ranked on the haversine term a = sin^2(d / 2R), which grows with d
+        phi, lam = math.radians(lat), math.radians(lng)
+        cos_phi = math.cos(phi)
+        limit = 1.0 if radius_km is None else _km_to_hav(radius_km)
+        sin = math.sin
+
+        def scan(keys) -> None:
+            cutoff = min(limit, hits[-1][0]) if len(hits) >= k else limit
+            for key in keys:
+                cell = self._cells.get(key)
+                if not cell:
+                    continue
+                for point in cell.values():
+                    if available_only and not point.available:
+                        continue
+                    if company_id is not None and point.company_id != company_id:
+                        continue
+                    if skill is not None and skill not in point.skills:
+                        continue
+                    a = sin((point.phi - phi) / 2) ** 2 + cos_phi * point.cos_phi * sin((point.lam - lam) / 2) ** 2
+                    if a <= cutoff:
+                        hits.append((a, point))
+            hits.sort(key=itemgetter(0))
+            del hits[k:]
+
+        with self._lock:
+            if not self._cells:
+                return []
+            ci, cj = _cell(lat, lng)
+            min_i, max_i, min_j, max_j = self._bounds
+            max_ring = max(ci - min_i, max_i - ci, cj - min_j, max_j - cj, 0)
+            edge_km = STAFF_INDEX_CELL_DEG * _KM_PER_DEG
+            for ring in range(max_ring + 1):
+                if ring > 1:
+                    # Nothing in this ring is closer than (ring - 1) of the narrowest cell edges
+                    far_lat = min(89.9, abs(lat) + ring * STAFF_INDEX_CELL_DEG)
+                    bound = (ring - 1) * edge_km * math.cos(math.radians(far_lat))
+                    if radius_km is not None and bound > radius_km:
+                        break
+                    if len(hits) >= k and bound > _hav_to_km(hits[-1][0]):
+                        break
+                if 8 * ring > len(self._cells):
+                    # Sparse grid: visiting the occupied cells is cheaper than walking the rings
+                    scan([key for key in self._cells if max(abs(key[0] - ci), abs(key[1] - cj)) >= ring])
+                    break
+                scan(_ring(ci, cj, ring))
+            return [(_hav_to_km(a), point) for a, point in hits]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "indexed_staff": len(self._points),
+                "cells": len(self._cells),
+                "cell_deg": STAFF_INDEX_CELL_DEG,
+                "age_seconds": None if self._loaded_at is None else round(time.monotonic() - self._loaded_at, 1),
+            }
+
+
+def _extend(bounds: Optional[List[int]], key: Tuple[int, int]) -> List[int]:
+    if bounds is None:
+        return [key[0], key[0], key[1], key[1]]
+    return [min(bounds[0], key[0]), max(bounds[1], key[0]), min(bounds[2], key[1]), max(bounds[3], key[1])]
+
+
+def _ring(ci: int, cj: int, ring: int):
+    if ring == 0:
+        yield ci, cj
+        return
+    for j in range(cj - ring, cj + ring + 1):
+        yield ci - ring, j
+        yield ci + ring, j
+    for i in range(ci - ring + 1, ci + ring):
+        yield i, cj - ring
+        yield i, cj + ring
+
+
+staff_index = StaffIndex()
+
+
+# =========================================================
+# INVALIDATION
+# =========================================================
+_PENDING_KEY = "staff_index_dirty"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_after_flush(session, flush_context):
+    staff_ids, user_ids = set(), set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.Staff) and obj.id is not None:
+            staff_ids.add(obj.id)
+        elif isinstance(obj, models.User) and obj.id is not None:
+            user_ids.add(obj.id)
+    if staff_ids or user_ids:
+        pending = session.info.setdefault(_PENDING_KEY, {"staff": set(), "users": set(), "all": False})
+        pending["staff"].update(staff_ids)
+        pending["users"].update(user_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_after_commit(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        staff_index.mark_dirty(pending["staff"], pending["users"], everything=pending["all"])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_statements(orm_execute_state):
+    # query(Staff).update(...) / delete(...) bypass the unit of work
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    if orm_execute_state.execution_options.get(POSITIONS_ONLY):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in (models.Staff, models.User):
+        pending = orm_execute_state.session.info.setdefault(_PENDING_KEY, {"staff": set(), "users": set(), "all": False})
+        pending["all"] = True
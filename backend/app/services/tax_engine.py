@@ -0,0 +1,326 @@
+"""
+Tax Bracket Engine backed by the tax_rates table
+
+TaxRate rows are compiled once per (country, state/province, tax year) into
+an in-memory bracket table. Federal tax is an O(log brackets) bisect lookup
+and the same table can compute a whole pay run as NumPy arrays.
+
+Rates in tax_rates are percentages (federal_rate=22 is 22%). When tax_rates
+has no active rows for a country/year the built-in (approximate, per pay
+period) defaults below are used.
+"""
+import os
+import time
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from ..db import models
+
+TAX_TABLE_TTL_SECONDS = float(os.getenv("TAX_TABLE_TTL_SECONDS", "300"))
+
+INF = float("inf")
+
+# =========================================================
+# BUILT-IN DEFAULTS (2025 approximate, biweekly pay period)
+# Brackets are (lower bound, upper bound, tax at lower bound, rate).
+# =========================================================
+DEFAULT_TAX_TABLES = {
+    "US": {
+        "federal_brackets": [
+            (0, 300, 0, 0.10),
+            (300, 1000, 30, 0.12),
+            (1000, 2000, 114, 0.22),
+            (2000, 4000, 334, 0.24),
+            (4000, INF, 814, 0.32),
+        ],
+        # Social Security: 6.2% up to $160,200 YTD
+        "social_security_rate": 0.062,
+        "social_security_max_income": 160200,
+        # Medicare: 1.45% (no cap)
+        "medicare_rate": 0.0145,
+        "medicare_max_income": None,
+        "state_provincial_rates": {
+            "CA": 0.09,  # California
+            "NY": 0.065,  # New York
+            "TX": 0.0,  # Texas (no state income tax)
+            "FL": 0.0,  # Florida (no state income tax)
+            "default": 0.05,
+        },
+    },
+    "CA": {
+        "federal_brackets": [
+            (0, 400, 0, 0.15),
+            (400, 800, 60, 0.205),
+            (800, 1600, 142, 0.26),
+            (1600, 3200, 350, 0.29),
+            (3200, INF, 814, 0.33),
+        ],
+        # CPP: 5.95% up to $68,500 YTD
+        "social_security_rate": 0.0595,
+        "social_security_max_income": 68500,
+        # EI: 1.58% up to $63,200
+        "medicare_rate": 0.0158,
+        "medicare_max_income": 63200,
+        "state_provincial_rates": {
+            "ON": 0.0505,  # Ontario
+            "BC": 0.0506,  # British Columbia
+            "AB": 0.10,  # Alberta
+            "QC": 0.15,  # Quebec
+            "default": 0.05,
+        },
+    },
+}
+
+# Countries without a table pay a flat 15% federal tax and nothing else
+FALLBACK_TAX_TABLE = {
+    "federal_brackets": [(0, INF, 0, 0.15)],
+    "social_security_rate": 0.0,
+    "social_security_max_income": None,
+    "medicare_rate": 0.0,
+    "medicare_max_income": None,
+    "state_provincial_rates": {"default": 0.0},
+}
+
+
+def _percent(rate: Optional[float]) -> float:
+    """tax_rates stores percentages (6.2 means 6.2%); tables hold fractions"""
+    if not rate:
+        return 0.0
+    return rate / 100.0
+
+
+@dataclass(frozen=True)
+class CompiledTaxTable:
+    """Immutable, precompiled tax table for one (country, province, year)"""
+    country_code: str
+    state_province: Optional[str]
+    tax_year: int
+    bracket_lows: Tuple[float, ...]
+    bracket_highs: Tuple[float, ...]
+    bracket_bases: Tuple[float, ...]
+    bracket_rates: Tuple[float, ...]
+    state_provincial_rate: float
+    social_security_rate: float
+    social_security_max_income: Optional[float]
+    medicare_rate: float
+    medicare_max_income: Optional[float]
+    source: str  # "tax_rates" or "default"
+
+    # ---- scalar path (single staff) ----
+    def federal(self, gross_pay: float) -> float:
+        i = bisect_left(self.bracket_highs, gross_pay)
+        if i >= len(self.bracket_highs):
+            i = len(self.bracket_highs) - 1
+        return self.bracket_bases[i] + self.bracket_rates[i] * (gross_pay - self.bracket_lows[i])
+
+    def state_provincial(self, gross_pay: float) -> float:
+        return gross_pay * self.state_provincial_rate
+
+    def social_security(self, gross_pay: float, ytd_gross: float = 0) -> float:
+        if not self.social_security_rate:
+            return 0
+        if self.social_security_max_income is None:
+            return gross_pay * self.social_security_rate
+        if ytd_gross >= self.social_security_max_income:
+            return 0
+        taxable = min(gross_pay, self.social_security_max_income - ytd_gross)
+        return taxable * self.social_security_rate
+
+    def medicare(self, gross_pay: float) -> float:
+        if not self.medicare_rate:
+            return 0
+        if self.medicare_max_income is None:
+            return gross_pay * self.medicare_rate
+        return min(gross_pay, self.medicare_max_income) * self.medicare_rate
+
+    # ---- batch path (bulk payroll) ----
+    def compute(self, gross: np.ndarray, ytd_gross: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Compute every tax line for an array of gross pay amounts.
+        Formulas match the scalar methods operation for operation.
+        """
+        gross = np.asarray(gross, dtype=float)
+        ytd = np.zeros_like(gross) if ytd_gross is None else np.asarray(ytd_gross, dtype=float)
+
+        idx = np.searchsorted(np.asarray(self.bracket_highs), gross, side="left")
+        np.minimum(idx, len(self.bracket_highs) - 1, out=idx)
+        bases = np.asarray(self.bracket_bases, dtype=float)[idx]
+        rates = np.asarray(self.bracket_rates, dtype=float)[idx]
+        lows = np.asarray(self.bracket_lows, dtype=float)[idx]
+        federal = bases + rates * (gross - lows)
+
+        if not self.social_security_rate:
+            social = np.zeros_like(gross)
+        elif self.social_security_max_income is None:
+            social = gross * self.social_security_rate
+        else:
+            cap = self.social_security_max_income
+            social = np.where(ytd >= cap, 0.0, np.minimum(gross, cap - ytd) * self.social_security_rate)
+
+        if not self.medicare_rate:
+            medicare = np.zeros_like(gross)
+        elif self.medicare_max_income is None:
+            medicare = gross * self.medicare_rate
+        else:
+            medicare = np.minimum(gross, self.medicare_max_income) * self.medicare_rate
+
+        return {
+            "federal_tax": federal,
+            "state_provincial_tax": gross * self.state_provincial_rate,
+            "social_security_tax": social,
+            "medicare_tax": medicare,
+        }
+
+
+def _compile(country_code: str, state_province: Optional[str], tax_year: int, rows) -> CompiledTaxTable:
+    """Compile TaxRate rows (or built-in defaults when there are none)"""
+    federal_rows = sorted(
+        (r for r in rows if not r.state_province and r.federal_rate is not None),
+        key=lambda r: r.federal_bracket_min or 0.0,
+    )
+    region_row = next(
+        (r for r in rows if r.state_province and state_province and r.state_province.upper() == state_province.upper()),
+        None,
+    )
+    defaults = DEFAULT_TAX_TABLES.get(country_code, FALLBACK_TAX_TABLE)
+
+    if federal_rows:
+        lows, highs, bases, rates = [], [], [], []
+        base = 0.0
+        for r in federal_rows:
+            low = r.federal_bracket_min or 0.0
+            high = r.federal_bracket_max if r.federal_bracket_max is not None else INF
+            rate = _percent(r.federal_rate)
+            if lows:
+                base += rates[-1] * (low - lows[-1])
+            lows.append(low)
+            highs.append(high)
+            bases.append(base)
+            rates.append(rate)
+        # The last bracket always extends to infinity
+        highs[-1] = INF
+        first = federal_rows[0]
+        ss_rate = _percent(first.social_security_rate)
+        ss_max = first.social_security_max_income
+        medicare_rate = _percent(first.medicare_rate)
+        medicare_max = first.medicare_max_income
+        source = "tax_rates"
+    else:
+        lows = [b[0] for b in defaults["federal_brackets"]]
+        highs = [b[1] for b in defaults["federal_brackets"]]
+        bases = [b[2] for b in defaults["federal_brackets"]]
+        rates = [b[3] for b in defaults["federal_brackets"]]
+        ss_rate = defaults["social_security_rate"]
+        ss_max = defaults["social_security_max_income"]
+        medicare_rate = defaults["medicare_rate"]
+        medicare_max = defaults["medicare_max_income"]
+        source = "default"
+
+    if region_row is not None:
+        state_rate = _percent(region_row.state_provincial_rate)
+        source = "tax_rates"
+    elif federal_rows and federal_rows[0].state_provincial_rate:
+        state_rate = _percent(federal_rows[0].state_provincial_rate)
+    else:
+        region_rates = defaults["state_provincial_rates"]
+        state_rate = region_rates.get(state_province, region_rates["default"])
+
+    return CompiledTaxTable(
+        country_code=country_code,
+        state_province=state_province,
+        tax_year=tax_year,
+        bracket_lows=tuple(lows),
+        bracket_highs=tuple(highs),
+        bracket_bases=tuple(bases),
+        bracket_rates=tuple(rates),
+        state_provincial_rate=state_rate,
+        social_security_rate=ss_rate,
+        social_security_max_income=ss_max,
+        medicare_rate=medicare_rate,
+        medicare_max_income=medicare_max,
+        source=source,
+    )
+
+
+class TaxEngine:
+    """
+    Process-wide cache of compiled tax tables.
+
+    Tables are invalidated when a transaction writing TaxRate rows commits in this process
+    and re-read after TAX_TABLE_TTL_SECONDS so other workers pick up edits.
+    """
+
+    def __init__(self, ttl_seconds: float = TAX_TABLE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._tables: Dict[Tuple[str, Optional[str], int], Tuple[float, CompiledTaxTable]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, country_code: str, state_province: Optional[str], tax_year: int) -> CompiledTaxTable:
+        key = (country_code, state_province, tax_year)
+        cached = self._tables.get(key)
+        now = time.monotonic()
+        if cached and now - cached[0] < self.ttl_seconds:
+            return cached[1]
+
+        rows = db.query(models.TaxRate).join(
+            models.Country, models.Country.id == models.TaxRate.country_id
+        ).filter(
+            models.Country.code == country_code,
+            models.TaxRate.tax_year == tax_year,
+            models.TaxRate.is_active == True
+        ).all()
+        table = _compile(country_code, state_province, tax_year, rows)
+        with self._lock:
+            self._tables[key] = (now, table)
+        return table
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._tables.clear()
+
+
+tax_engine = TaxEngine()
+
+
+# =========================================================
+# INVALIDATION
+# =========================================================
+# Compiled tables are dropped once the transaction that wrote TaxRate rows
+# commits; clearing at flush would let a concurrent request re-cache the old
+# rates before the commit, and a rolled-back edit must not clear anything
+_PENDING_KEY = "tax_rates_changed"
+
+
+@event.listens_for(Session, "after_flush")
+def _flag_after_flush(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.TaxRate):
+            session.info[_PENDING_KEY] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop(_PENDING_KEY, False):
+        tax_engine.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _flag_bulk_statements(orm_execute_state):
+    # query(TaxRate).update(...) / delete(...) bypass the unit of work
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is models.TaxRate:
+        orm_execute_state.session.info[_PENDING_KEY] = True
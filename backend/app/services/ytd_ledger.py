@@ -0,0 +1,211 @@
+"""
+Year-to-date earnings ledger
+
+Keeps one running-totals row per (staff_id, tax_year) in payroll_ytd so the
+Social Security / CPP cap check is a single-row read instead of a scan over
+every payroll of the year. The ledger is updated in the caller's transaction
+whenever a Payroll row is created, approved/paid or voided; rebuild() recomputes
+it from the payroll table for backfills.
+
+The cap only counts pay periods that start before the one being processed:
+payrolls already recorded for that period or later ones (a re-run, or an
+earlier period processed late) are subtracted from the ledger total.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import Integer, cast, delete, extract, func, insert, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from ..db import models
+
+_APPROVED_STATUSES = {models.PayrollStatus.APPROVED, models.PayrollStatus.PAID}
+
+
+def _tax_year(payroll) -> Optional[int]:
+    start = payroll["pay_period_start"] if isinstance(payroll, dict) else payroll.pay_period_start
+    return start.year if start else None
+
+
+def _field(payroll, name: str):
+    value = payroll.get(name) if isinstance(payroll, dict) else getattr(payroll, name)
+    return value or 0
+
+
+def _apply(db: Session, deltas: Dict[tuple, Dict[str, float]]) -> None:
+    """Upsert additive deltas keyed by (staff_id, tax_year)"""
+    if not deltas:
+        return
+    rows = [
+        {"staff_id": staff_id, "tax_year": tax_year, **values}
+        for (staff_id, tax_year), values in deltas.items()
+    ]
+    upsert = sqlite_insert if db.get_bind().dialect.name == "sqlite" else pg_insert
+    stmt = upsert(models.PayrollYtd)
+    ytd = models.PayrollYtd
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ytd.staff_id, ytd.tax_year],
+        set_={
+            "gross_pay": ytd.gross_pay + stmt.excluded.gross_pay,
+            "approved_gross_pay": ytd.approved_gross_pay + stmt.excluded.approved_gross_pay,
+            "social_security_tax": ytd.social_security_tax + stmt.excluded.social_security_tax,
+            "medicare_tax": ytd.medicare_tax + stmt.excluded.medicare_tax,
+            "payroll_count": ytd.payroll_count + stmt.excluded.payroll_count,
+            "updated_at": func.now(),
+        },
+    )
+    db.execute(stmt, rows)
+
+
+def _empty_delta() -> Dict[str, float]:
+    return {
+        "gross_pay": 0.0,
+        "approved_gross_pay": 0.0,
+        "social_security_tax": 0.0,
+        "medicare_tax": 0.0,
+        "payroll_count": 0,
+    }
+
+
+# =========================================================
+# READS
+# =========================================================
+def _not_void():
+    return or_(models.Payroll.status.is_(None), models.Payroll.status != models.PayrollStatus.VOID)
+
+
+def _gross_from(db: Session, staff_ids: List[int], period_start: datetime) -> Dict[int, float]:
+    """Gross of non-void payrolls of the same year starting on or after period_start"""
+    rows = db.execute(
+        select(models.Payroll.staff_id, func.sum(models.Payroll.gross_pay)).where(
+            models.Payroll.staff_id.in_(staff_ids),
+            models.Payroll.pay_period_start >= period_start,
+            models.Payroll.pay_period_start < datetime(period_start.year + 1, 1, 1),
+            _not_void(),
+        ).group_by(models.Payroll.staff_id)
+    ).all()
+    return {staff_id: gross or 0 for staff_id, gross in rows}
+
+
+def get_ytd_gross(db: Session, staff_id: int, period_start: datetime) -> float:
+    """
+    Gross of the pay periods of the year that start before period_start: the
+    ledger total minus the (normally zero) payrolls already recorded for this
+    or later periods, so a re-run or a back-filled period does not count
+    itself or later pay towards the Social Security / CPP cap.
+    """
+    return get_ytd_gross_many(db, [staff_id], period_start).get(staff_id, 0)
+
+
+def get_ytd_gross_many(db: Session, staff_ids: List[int], period_start: datetime) -> Dict[int, float]:
+    if not staff_ids:
+        return {}
+    rows = db.execute(
+        select(models.PayrollYtd.staff_id, models.PayrollYtd.gross_pay).where(
+            models.PayrollYtd.staff_id.in_(staff_ids),
+            models.PayrollYtd.tax_year == period_start.year,
+        )
+    ).all()
+    ytd = {r.staff_id: r.gross_pay or 0 for r in rows}
+    for staff_id, gross in _gross_from(db, list(ytd), period_start).items():
+        ytd[staff_id] = max(0.0, ytd[staff_id] - gross)
+    return ytd
+
+
+# =========================================================
+# WRITES (call before the caller's commit)
+# =========================================================
+def record_payrolls(db: Session, payrolls: Iterable) -> None:
+    """Add newly created payrolls (ORM objects or column dicts) to the ledger"""
+    deltas: Dict[tuple, Dict[str, float]] = defaultdict(_empty_delta)
+    for p in payrolls:
+        tax_year = _tax_year(p)
+        status = p.get("status") if isinstance(p, dict) else p.status
+        if tax_year is None or status == models.PayrollStatus.VOID:
+            continue
+        d = deltas[(_field(p, "staff_id"), tax_year)]
+        gross = _field(p, "gross_pay")
+        d["gross_pay"] += gross
+        if status in _APPROVED_STATUSES:
+            d["approved_gross_pay"] += gross
+        d["social_security_tax"] += _field(p, "social_security_tax")
+        d["medicare_tax"] += _field(p, "medicare_tax")
+        d["payroll_count"] += 1
+    _apply(db, deltas)
+
+
+def record_status_change(db: Session, payroll: models.Payroll, old_status) -> None:
+    """Reflect a status transition (approve, mark paid, void) in the ledger"""
+    new_status = payroll.status
+    if old_status == models.PayrollStatus.VOID and new_status != models.PayrollStatus.VOID:
+        raise ValueError(f"Payroll {payroll.id} is void and cannot become {new_status.value}")
+    tax_year = _tax_year(payroll)
+    if tax_year is None or old_status == new_status:
+        return
+    gross = payroll.gross_pay or 0
+    d = _empty_delta()
+    if new_status == models.PayrollStatus.VOID:
+        d["gross_pay"] = -gross
+        d["social_security_tax"] = -(payroll.social_security_tax or 0)
+        d["medicare_tax"] = -(payroll.medicare_tax or 0)
+        d["payroll_count"] = -1
+        if old_status in _APPROVED_STATUSES:
+            d["approved_gross_pay"] = -gross
+    elif new_status in _APPROVED_STATUSES and old_status not in _APPROVED_STATUSES:
+        d["approved_gross_pay"] = gross
+    else:
+        return
+    _apply(db, {(payroll.staff_id, tax_year): d})
+
+
+# =========================================================
+# BACKFILL
+# =========================================================
+def rebuild(db: Session, tax_year: Optional[int] = None) -> int:
+    """
+    Recompute the ledger from the payroll table (all years, or one year).
+    Runs in a single transaction and returns the number of ledger rows written.
+    """
+    year_expr = cast(extract("year", models.Payroll.pay_period_start), Integer)
+    approved = models.Payroll.status.in_(list(_APPROVED_STATUSES))
+    gross_sum = func.coalesce(func.sum(models.Payroll.gross_pay), 0.0)
+    approved_sum = func.coalesce(
+        func.sum(models.Payroll.gross_pay).filter(approved), 0.0
+    )
+    source = select(
+        models.Payroll.staff_id,
+        year_expr.label("tax_year"),
+        gross_sum,
+        approved_sum,
+        func.coalesce(func.sum(models.Payroll.social_security_tax), 0.0),
+        func.coalesce(func.sum(models.Payroll.medicare_tax), 0.0),
+        func.count(models.Payroll.id),
+    ).where(
+        models.Payroll.pay_period_start.isnot(None),
+        _not_void(),
+    ).group_by(models.Payroll.staff_id, year_expr)
+
+    cleanup = delete(models.PayrollYtd)
+    if tax_year is not None:
+        source = source.where(year_expr == tax_year)
+        cleanup = cleanup.where(models.PayrollYtd.tax_year == tax_year)
+
+    try:
+        db.execute(cleanup)
+        result = db.execute(
+            insert(models.PayrollYtd).from_select(
+                [
+                    "staff_id", "tax_year", "gross_pay", "approved_gross_pay",
+                    "social_security_tax", "medicare_tax", "payroll_count",
+                ],
+                source,
+            )
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return result.rowcount
@@ -3,6 +3,8 @@ import smtplib
 from email.mime.text import MIMEText
 from email.utils import formataddr
 
+DEFAULT_FROM_NAME = "Healthcare Platform"
+
 
 def _get_smtp():
     host = os.getenv("SMTP_HOST")
@@ -13,35 +15,66 @@ def _get_smtp():
     return host, port, user, password, use_tls
 
 
-def send_email(subject: str, to_email: str, html_body: str, from_name: str = "Healthcare Platform"):
-    """
-    Sends an email using SMTP settings from environment variables.
-    Falls back to printing the email to console if SMTP is not configured.
-    Required env vars: SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, SMTP_TLS
-    Optional: MAIL_FROM (default: info@hremsoftconsulting.com)
-    """
-    mail_from = os.getenv("MAIL_FROM", "info@hremsoftconsulting.com")
-    host, port, user, pwd, use_tls = _get_smtp()
+def mail_from() -> str:
+    return os.getenv("MAIL_FROM", "info@hremsoftconsulting.com")
+
+
+def smtp_configured() -> bool:
+    return bool(_get_smtp()[0])
 
+
+def build_message(subject: str, to_email: str, html_body: str, from_name: str = DEFAULT_FROM_NAME) -> MIMEText:
     msg = MIMEText(html_body, "html")
     msg["Subject"] = subject
-    msg["From"] = formataddr((from_name, mail_from))
+    msg["From"] = formataddr((from_name, mail_from()))
     msg["To"] = to_email
+    return msg
 
-    if not host or not user or not pwd:
-        print("[Email DEBUG] SMTP not configured. Would send email:")
-        print("From:", mail_from)
-        print("To:", to_email)
-        print("Subject:", subject)
-        print(html_body)
-        return
 
-    server = smtplib.SMTP(host, port)
+def open_smtp(timeout: float = 30) -> smtplib.SMTP:
+    """
+    Connected (and, when SMTP_USER / SMTP_PASSWORD are set, logged in) SMTP client.
+    Without credentials no login is attempted, so a local debugging server
+    (e.g. `python -m aiosmtpd -n -l localhost:1025` with SMTP_TLS=false) works.
+    """
+    host, port, user, pwd, use_tls = _get_smtp()
+    server = smtplib.SMTP(host, port, timeout=timeout)
     try:
         if use_tls:
             server.starttls()
-        server.login(user, pwd)
-        server.sendmail(mail_from, [to_email], msg.as_string())
+        if user and pwd:
+            server.login(user, pwd)
+    except Exception:
+        server.close()
+        raise
+    return server
+
+
+def print_email(subject: str, to_email: str, html_body: str) -> None:
+    print("[Email DEBUG] SMTP not configured. Would send email:")
+    print("From:", mail_from())
+    print("To:", to_email)
+    print("Subject:", subject)
+    print(html_body)
+
+
+def send_email(subject: str, to_email: str, html_body: str, from_name: str = DEFAULT_FROM_NAME):
+    """
+    Sends an email immediately using SMTP settings from environment variables.
+    Falls back to printing the email to console if SMTP_HOST is not set.
+    Env vars: SMTP_HOST, SMTP_PORT, SMTP_TLS; SMTP_USER / SMTP_PASSWORD when the server needs a login
+    Optional: MAIL_FROM (default: info@hremsoftconsulting.com)
+
+    Request handlers should use queue_email instead.
+    """
+    if not smtp_configured():
+        print_email(subject, to_email, html_body)
+        return
+
+    msg = build_message(subject, to_email, html_body, from_name)
+    server = open_smtp()
+    try:
+        server.sendmail(mail_from(), [to_email], msg.as_string())
     finally:
         try:
             server.quit()
@@ -49,3 +82,13 @@ def send_email(subject: str, to_email: str, html_body: str, from_name: str = "He
             pass
 
 
+def queue_email(db, subject: str, to_email: str, html_body: str, from_name: str = DEFAULT_FROM_NAME):
+    """
+    Adds the email to the outbox in db's transaction (nothing is committed here).
+    It is delivered by the outbox sender once the caller commits, and never if it rolls back.
+    """
+    from ..db import models
+
+    row = models.EmailOutbox(to_email=to_email, subject=subject, html_body=html_body, from_name=from_name)
+    db.add(row)
+    return row
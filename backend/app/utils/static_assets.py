@@ -0,0 +1,212 @@
+"""
+Indexed static file serving for the docs-website build (docs-website/dist)
+
+The directory is walked once (on first use / at startup). Each file gets a strong
+ETag (content hash), Last-Modified and a MIME type. Files up to
+STATIC_MEMORY_MAX_BYTES are kept in memory together with gzip and (when the
+`brotli` package is installed) brotli variants of compressible types, so a
+request is a dict lookup. Larger files are streamed with FileResponse, which
+hands the path to the server for zero-copy sending when it supports the ASGI
+pathsend extension.
+
+Vite puts content-hashed bundles under assets/ ("index-BcD3f1_a.js"); those are
+served with `Cache-Control: public, max-age=31536000, immutable`. Everything
+else (index.html, files copied from public/) is `no-cache`, i.e. revalidated
+with If-None-Match / If-Modified-Since and answered with 304 when unchanged.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional
+
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+STATIC_MEMORY_MAX_BYTES = int(os.getenv("STATIC_MEMORY_MAX_BYTES", str(2 * 1024 * 1024)))
+STATIC_COMPRESS_MIN_BYTES = int(os.getenv("STATIC_COMPRESS_MIN_BYTES", "1024"))
+STATIC_BROTLI_QUALITY = int(os.getenv("STATIC_BROTLI_QUALITY", "11"))
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Vite's default asset names: <name>-<8+ char base64url hash>.<ext>
+_HASHED = re.compile(r"-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+_COMPRESSIBLE = ("text/", "application/javascript", "application/json", "application/xml",
+                 "image/svg+xml", "application/wasm", "application/manifest+json")
+
+
+@dataclass
+class Asset:
+    path: str
+    size: int
+    media_type: str
+    etag: str
+    last_modified: str
+    mtime: float
+    cache_control: str
+    body: Optional[bytes] = None  # None: streamed from disk
+    # content-coding -> (compressed body, ETag of that representation)
+    encoded: Dict[str, tuple] = field(default_factory=dict)
+
+    def etags(self):
+        return [self.etag] + [etag for _, etag in self.encoded.values()]
+
+
+def _compressible(media_type: str) -> bool:
+    return media_type.startswith(_COMPRESSIBLE)
+
+
+def _accepted_encodings(header: str) -> Dict[str, float]:
+    accepted = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    return accepted
+
+
+def _etag_matches(header: str, etags) -> bool:
+    if header.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return any(etag in candidates for etag in etags)
+
+
+class StaticAssetIndex:
+    def __init__(self, root: str, fallback: Optional[str] = "index.html"):
+        self.root = root
+        self.fallback = fallback
+        self._assets: Dict[str, Asset] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    # ---------- indexing ----------
+    def load(self) -> None:
+        assets = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                rel = os.path.relpath(path, self.root).replace(os.sep, "/")
+                assets[rel] = self._index_file(rel, path)
+        with self._lock:
+            self._assets = assets
+            self._loaded = True
+        in_memory = sum(1 for a in assets.values() if a.body is not None)
+        print(f"✓ Indexed {len(assets)} docs-website files ({in_memory} in memory, brotli {'on' if brotli else 'off'})")
+
+    def _index_file(self, rel: str, path: str) -> Asset:
+        stat = os.stat(path)
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        digest = hashlib.blake2b(digest_size=12)
+        body = None
+        with open(path, "rb") as f:
+            if stat.st_size <= STATIC_MEMORY_MAX_BYTES:
+                body = f.read()
+                digest.update(body)
+            else:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+        tag = digest.hexdigest()
+        hashed = rel.startswith("assets/") and _HASHED.search(rel) is not None
+        asset = Asset(
+            path=path,
+            size=stat.st_size,
+            media_type=media_type,
+            etag=f'"{tag}"',
+            last_modified=formatdate(stat.st_mtime, usegmt=True),
+            mtime=stat.st_mtime,
+            cache_control=IMMUTABLE if hashed else REVALIDATE,
+            body=body,
+        )
+        if body is not None and len(body) >= STATIC_COMPRESS_MIN_BYTES and _compressible(media_type):
+            variants = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants["br"] = brotli.compress(body, quality=STATIC_BROTLI_QUALITY)
+            for coding, data in variants.items():
+                if len(data) < len(body):
+                    asset.encoded[coding] = (data, f'"{tag}-{coding}"')
+        return asset
+
+    def get(self, rel: str) -> Optional[Asset]:
+        if not self._loaded:
+            self.load()
+        return self._assets.get(rel.lstrip("/"))
+
+    # ---------- responses ----------
+    def response(self, request: Request, rel: str) -> Optional[Response]:
+        """The file at rel (or the SPA fallback); None when neither exists"""
+        asset = self.get(rel)
+        if asset is None and self.fallback:
+            asset = self.get(self.fallback)
+        if asset is None:
+            return None
+
+        coding = self._choose_encoding(request, asset)
+        body, etag = (asset.body, asset.etag) if coding is None else asset.encoded[coding]
+        headers = {
+            "ETag": etag,
+            "Last-Modified": asset.last_modified,
+            "Cache-Control": asset.cache_control,
+        }
+        if asset.encoded:
+            headers["Vary"] = "Accept-Encoding"
+
+        if self._not_modified(request, asset):
+            return Response(status_code=304, headers=headers)
+        if body is None:
+            return FileResponse(asset.path, media_type=asset.media_type, headers=headers)
+        if coding is not None:
+            headers["Content-Encoding"] = coding
+        return Response(content=body, media_type=asset.media_type, headers=headers)
+
+    @staticmethod
+    def _choose_encoding(request: Request, asset: Asset) -> Optional[str]:
+        if not asset.encoded:
+            return None
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        wildcard = accepted.get("*", 0.0)
+        for coding in ("br", "gzip"):
+            if coding in asset.encoded and accepted.get(coding, wildcard) > 0:
+                return coding
+        return None
+
+    @staticmethod
+    def _not_modified(request: Request, asset: Asset) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            return _etag_matches(if_none_match, asset.etags())
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return int(asset.mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def stats(self) -> dict:
+        assets = list(self._assets.values())
+        return {
+            "root": self.root,
+            "files": len(assets),
+            "in_memory": sum(1 for a in assets if a.body is not None),
+            "memory_bytes": sum(len(a.body) + sum(len(d) for d, _ in a.encoded.values())
+                                for a in assets if a.body is not None),
+            "brotli": brotli is not None,
+        }
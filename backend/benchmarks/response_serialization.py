@@ -0,0 +1,161 @@
+"""
+List response serialization micro-benchmark: hand-built dicts vs typed TypeAdapters
+
+Loads ROWS staff, patients and timesheets from a scratch database once, then
+times only the CPU spent turning an already-fetched page into response bytes:
+
+    before  dict per row -> response_model=List[dict] validation / dump_python
+            -> stdlib json (JSONResponse); timesheets skipped validation and
+            built isoformat() strings by hand
+    after   the routers' serializers build TypedDict rows, typed_json() encodes
+            them with TypeAdapter(List[XOut]).dump_json() (no validation) and
+            datetimes / enums are left to pydantic-core
+
+Usage (from the backend directory):
+    python benchmarks/response_serialization.py [--rows 1000] [--repeat 200]
+
+BENCH_DATABASE_URL picks the database (default: a SQLite file in /tmp). Every
+table is dropped and recreated, so never point it at real data.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL", "sqlite:////tmp/response_serialization_bench.db")
+os.environ.setdefault("SCHEMA_CHECK", "off")
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+
+from app.db import models  # noqa: E402
+from app.db.database import Base, SessionLocal, engine  # noqa: E402
+from app.routers.patients import PATIENT_LIST, serialize_patient  # noqa: E402
+from app.routers.responses import typed_json  # noqa: E402
+from app.routers.staff import STAFF_LIST, serialize_staff  # noqa: E402
+from app.routers.timesheets import TIMESHEET_LIST, TIMESHEET_LISTING, timesheet_row_to_dict  # noqa: E402
+
+START = datetime(2025, 1, 1)
+GENERIC_LIST = TypeAdapter(List[dict])
+
+
+def seed(rows: int) -> None:
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Role), [{"id": 1, "name": "Nurse"}])
+        conn.execute(insert(models.User), [
+            {"id": i, "full_name": f"Staff {i}", "email": f"staff{i}@bench.invalid", "password_hash": "x", "role_id": 1}
+            for i in range(1, rows + 1)
+        ])
+        conn.execute(insert(models.Staff), [
+            {"id": i, "user_id": i, "skills": ["nursing", "cpr"], "latitude": 40 + i / 1e4, "longitude": -74 - i / 1e4}
+            for i in range(1, rows + 1)
+        ])
+        conn.execute(insert(models.Patient), [
+            {"id": i, "full_name": f"Patient {i}", "address": f"{i} Main St", "latitude": 40.5, "longitude": -73.9,
+             "email": f"patient{i}@bench.invalid", "phone": "555-0100"}
+            for i in range(1, rows + 1)
+        ])
+        conn.execute(insert(models.Shift), [
+            {"id": i, "staff_id": i, "start_time": START + timedelta(hours=i), "end_time": START + timedelta(hours=i + 8),
+             "status": models.ShiftStatus.ENDED, "start_lat": 40.0, "start_lng": -74.0, "end_lat": 40.1, "end_lng": -74.1}
+            for i in range(1, rows + 1)
+        ])
+        conn.execute(insert(models.Timesheet), [
+            {"id": i, "staff_id": i, "shift_id": i, "total_hours": 8.0, "submitted": True,
+             "verified": i % 3 == 0, "created_at": START + timedelta(hours=i + 8)}
+            for i in range(1, rows + 1)
+        ])
+
+
+# =========================================================
+# BEFORE (the routers' previous serializers)
+# =========================================================
+def legacy_staff(s) -> dict:
+    return {"id": s.id, "user_id": s.user_id, "skills": s.skills, "latitude": s.latitude, "longitude": s.longitude}
+
+
+def legacy_patient(p) -> dict:
+    return {"id": p.id, "full_name": p.full_name, "address": p.address, "latitude": p.latitude,
+            "longitude": p.longitude, "email": p.email, "phone": p.phone}
+
+
+def legacy_timesheet(row) -> dict:
+    (ts_id, staff_id, staff_name, staff_email, staff_role, total_hours, submitted, verified,
+     created_at, shift_id, start_time, end_time, shift_status, start_lat, start_lng, end_lat, end_lng) = row
+    return {
+        "id": ts_id, "staff_id": staff_id, "staff_name": staff_name or None, "staff_email": staff_email,
+        "staff_role": staff_role, "total_hours": total_hours, "submitted": submitted, "verified": verified,
+        "created_at": created_at.isoformat() if created_at else None, "shift_id": shift_id,
+        "shift_start": start_time.isoformat() if start_time else None,
+        "shift_end": end_time.isoformat() if end_time else None,
+        "shift_status": shift_status.value if shift_status else None,
+        "start_lat": start_lat, "start_lng": start_lng, "end_lat": end_lat, "end_lng": end_lng,
+        "timesheet_ref": f"TS-{ts_id:05d}",
+    }
+
+
+def before_generic(serialize, rows) -> bytes:
+    content = GENERIC_LIST.validate_python([serialize(r) for r in rows])
+    return JSONResponse(GENERIC_LIST.dump_python(content, mode="json")).body
+
+
+def before_timesheets(rows) -> bytes:
+    return JSONResponse([legacy_timesheet(r) for r in rows]).body
+
+
+def best_of(fn, repeat: int) -> float:
+    """Lowest CPU seconds of repeat calls"""
+    timings = []
+    for _ in range(repeat):
+        started = time.process_time()
+        fn()
+        timings.append(time.process_time() - started)
+    return min(timings)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    seed(args.rows)
+    db = SessionLocal()
+    staff = db.execute(select(models.Staff).order_by(models.Staff.id)).scalars().all()
+    patients = db.execute(select(models.Patient).order_by(models.Patient.id)).scalars().all()
+    timesheets = db.execute(TIMESHEET_LISTING.order_by(models.Timesheet.id)).all()
+
+    cases = [
+        ("staff", lambda: before_generic(legacy_staff, staff),
+         lambda: typed_json(STAFF_LIST, [serialize_staff(s) for s in staff]).body),
+        ("patients", lambda: before_generic(legacy_patient, patients),
+         lambda: typed_json(PATIENT_LIST, [serialize_patient(p) for p in patients]).body),
+        ("timesheets", lambda: before_timesheets(timesheets),
+         lambda: typed_json(TIMESHEET_LIST, [timesheet_row_to_dict(r) for r in timesheets]).body),
+    ]
+    print(f"database: {engine.url.render_as_string(hide_password=True)}")
+    print(f"CPU per {args.rows}-row list (best of {args.repeat})")
+    print(f"{'list':>12}  {'before ms':>10}  {'after ms':>9}  {'speedup':>8}")
+    failed = False
+    for name, before, after in cases:
+        if json.loads(before()) != json.loads(after()):
+            print(f"✗ {name}: outputs differ")
+            failed = True
+            continue
+        before_s = best_of(before, args.repeat)
+        after_s = best_of(after, args.repeat)
+        print(f"{name:>12}  {before_s * 1000:>10.2f}  {after_s * 1000:>9.2f}  {before_s / after_s:>7.1f}x")
+    db.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Timesheet listing micro-benchmark: ORM hydration vs column projection
+
+Seeds N timesheets (with staff, users, roles and shifts) into a scratch
+database, then times the two listing paths end to end (query + row -> dict):
+
+    orm         select(Timesheet).options(TIMESHEET_LOAD_OPTIONS) + serialize_timesheet
+    projection  TIMESHEET_LISTING + timesheet_row_to_dict
+
+Usage (from the backend directory):
+    python benchmarks/timesheet_listing.py [--rows 10000 100000] [--repeat 3]
+
+BENCH_DATABASE_URL picks the database (default: a SQLite file in /tmp). Every
+table is dropped and recreated, so never point it at real data.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL", "sqlite:////tmp/timesheet_listing_bench.db")
+os.environ.setdefault("SCHEMA_CHECK", "off")
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from app.db import models  # noqa: E402
+from app.db.database import Base, SessionLocal, engine  # noqa: E402
+from app.routers.timesheets import (  # noqa: E402
+    TIMESHEET_LISTING,
+    TIMESHEET_LOAD_OPTIONS,
+    serialize_timesheet,
+    timesheet_row_to_dict,
+)
+
+STAFF = 500
+START = datetime(2025, 1, 1)
+
+
+def seed(rows: int) -> None:
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Role), [{"id": 1, "name": "Nurse"}])
+        conn.execute(insert(models.User), [
+            {"id": i, "full_name": f"Staff {i}", "email": f"staff{i}@bench.invalid", "password_hash": "x", "role_id": 1}
+            for i in range(1, STAFF + 1)
+        ])
+        conn.execute(insert(models.Staff), [{"id": i, "user_id": i} for i in range(1, STAFF + 1)])
+        conn.execute(insert(models.Shift), [
+            {"id": i, "staff_id": i % STAFF + 1, "start_time": START + timedelta(hours=i),
+             "end_time": START + timedelta(hours=i + 8), "status": models.ShiftStatus.ENDED,
+             "start_lat": 40.0, "start_lng": -74.0, "end_lat": 40.1, "end_lng": -74.1}
+            for i in range(1, rows + 1)
+        ])
+        conn.execute(insert(models.Timesheet), [
+            {"id": i, "staff_id": i % STAFF + 1, "shift_id": i, "total_hours": 8.0, "submitted": True,
+             "verified": i % 3 == 0, "created_at": START + timedelta(hours=i + 8)}
+            for i in range(1, rows + 1)
+        ])
+
+
+def orm_listing(limit: int) -> list:
+    db = SessionLocal()
+    try:
+        stmt = (select(models.Timesheet).options(*TIMESHEET_LOAD_OPTIONS)
+                .order_by(models.Timesheet.created_at.desc()).limit(limit))
+        return [serialize_timesheet(ts) for ts in db.execute(stmt).scalars().all()]
+    finally:
+        db.close()
+
+
+def projection_listing(limit: int) -> list:
+    db = SessionLocal()
+    try:
+        stmt = TIMESHEET_LISTING.order_by(models.Timesheet.created_at.desc()).limit(limit)
+        return [timesheet_row_to_dict(row) for row in db.execute(stmt).all()]
+    finally:
+        db.close()
+
+
+def best_of(fn, limit: int, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(limit)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"database: {engine.url.render_as_string(hide_password=True)}")
+    print(f"{'rows':>8}  {'orm rows/s':>12}  {'projection rows/s':>18}  {'speedup':>8}")
+    for rows in args.rows:
+        seed(rows)
+        if orm_listing(rows) != projection_listing(rows):
+            print(f"✗ outputs differ at {rows} rows")
+            return 1
+        orm_s = best_of(orm_listing, rows, args.repeat)
+        proj_s = best_of(projection_listing, rows, args.repeat)
+        print(f"{rows:>8}  {rows / orm_s:>12,.0f}  {rows / proj_s:>18,.0f}  {orm_s / proj_s:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+-- Migration: Year-to-date payroll ledger
+-- Date: 2026-10-17
+-- Description: Adds payroll_ytd running totals per (staff, tax year) and the VOID payroll status
+
+-- =========================================================
+-- ADD VOID PAYROLL STATUS
+-- =========================================================
+-- SQLAlchemy stores enum member names, so the label is upper case
+ALTER TYPE payrollstatus ADD VALUE IF NOT EXISTS 'VOID';
+
+-- =========================================================
+-- CREATE PAYROLL YTD LEDGER
+-- =========================================================
+CREATE TABLE IF NOT EXISTS payroll_ytd (
+    id SERIAL PRIMARY KEY,
+    staff_id INTEGER REFERENCES staff(id) ON DELETE CASCADE NOT NULL,
+    tax_year INTEGER NOT NULL,
+    gross_pay FLOAT NOT NULL DEFAULT 0.0,
+    approved_gross_pay FLOAT NOT NULL DEFAULT 0.0,
+    social_security_tax FLOAT NOT NULL DEFAULT 0.0,
+    medicare_tax FLOAT NOT NULL DEFAULT 0.0,
+    payroll_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_payroll_ytd_staff_year UNIQUE (staff_id, tax_year)
+);
+
+-- =========================================================
+-- MIGRATION COMPLETE
+-- =========================================================
+-- Backfill the ledger from existing payroll rows:
+--   cd backend && python -m app.cli rebuild-ytd            (all years)
+--   cd backend && python -m app.cli rebuild-ytd --year 2025
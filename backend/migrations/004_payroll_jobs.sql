@@ -0,0 +1,46 @@
+-- Migration: Background bulk payroll jobs
+-- Date: 2026-10-17
+-- Description: Adds payroll_jobs so bulk pay runs execute outside the request
+
+-- =========================================================
+-- CREATE JOB STATUS TYPE
+-- =========================================================
+DO $$
+BEGIN
+    CREATE TYPE payrolljobstatus AS ENUM ('QUEUED', 'RUNNING', 'COMPLETED', 'FAILED');
+EXCEPTION
+    WHEN duplicate_object THEN NULL;
+END $$;
+
+-- =========================================================
+-- CREATE PAYROLL JOBS TABLE
+-- =========================================================
+CREATE TABLE IF NOT EXISTS payroll_jobs (
+    id SERIAL PRIMARY KEY,
+    company_id INTEGER REFERENCES companies(id) NOT NULL,
+    pay_period_start TIMESTAMP NOT NULL,
+    pay_period_end TIMESTAMP NOT NULL,
+    status payrolljobstatus NOT NULL DEFAULT 'QUEUED',
+    total_staff INTEGER DEFAULT 0,
+    processed_staff INTEGER DEFAULT 0,
+    succeeded INTEGER DEFAULT 0,
+    failed INTEGER DEFAULT 0,
+    errors JSON,
+    payroll_ids JSON,
+    error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    createdby VARCHAR(255) DEFAULT 'system',
+    datecreated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_payroll_jobs_company_id ON payroll_jobs(company_id);
+CREATE INDEX IF NOT EXISTS idx_payroll_jobs_status ON payroll_jobs(status);
+
+-- =========================================================
+-- MIGRATION COMPLETE
+-- =========================================================
+-- Jobs run in a local process pool by default (PAYROLL_JOB_EXECUTOR=process).
+-- Set PAYROLL_JOB_EXECUTOR=external and run `python -m app.cli payroll-worker`
+-- to process them in a separate worker container instead.
@@ -0,0 +1,13 @@
+-- Migration: Role version stamps
+-- Date: 2026-10-17
+-- Description: Adds roles.version, bumped whenever a role or its privileges change.
+--              Access tokens carry the version ("rv" claim) they were issued with.
+
+-- =========================================================
+-- ADD ROLE VERSION
+-- =========================================================
+ALTER TABLE roles ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+
+-- =========================================================
+-- MIGRATION COMPLETE
+-- =========================================================
@@ -0,0 +1,57 @@
+-- Migration: Indexes for hot query paths
+-- Date: 2026-10-17
+-- Description: Secondary, composite, functional and partial indexes used by the routers
+--              and the payroll engine. Names match the declarations in models.py.
+--
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction block: the marker below
+-- makes `python -m app.cli migrate` run it statement by statement in autocommit.
+-- migrate: no-transaction
+-- Verify the plans afterwards with:  cd backend && python -m app.cli check-plans
+
+-- =========================================================
+-- USERS (login, payroll staff selection)
+-- =========================================================
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_lower_email ON users (lower(email));
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_phone ON users (phone);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_company_id_active ON users (company_id) WHERE is_active;
+
+-- =========================================================
+-- STAFF / PATIENTS
+-- =========================================================
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_staff_user_id ON staff (user_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_patients_email ON patients (email);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_staff_salary_config_company_id ON staff_salary_config (company_id);
+
+-- =========================================================
+-- TIMESHEETS (list by staff / newest first, payroll hours)
+-- =========================================================
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_timesheets_staff_id_created_at ON timesheets (staff_id, created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_timesheets_created_at ON timesheets (created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_timesheets_shift_id ON timesheets (shift_id);
+
+-- =========================================================
+-- ASSIGNMENTS (monthly calendar)
+-- =========================================================
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_assignments_assigned_at ON assignments (assigned_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_assignments_staff_id_assigned_at ON assignments (staff_id, assigned_at);
+
+-- =========================================================
+-- PAYROLL
+-- =========================================================
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_payroll_staff_id_pay_period_start ON payroll (staff_id, pay_period_start);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_payroll_company_id_generated_at ON payroll (company_id, generated_at DESC);
+
+-- =========================================================
+-- VISITS / COMPLIANCE
+-- =========================================================
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_visits_scheduled_time ON visits (scheduled_time);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_compliance_expiry_date ON compliance (expiry_date);
+
+-- =========================================================
+-- MIGRATION COMPLETE
+-- =========================================================
+ANALYZE users;
+ANALYZE staff;
+ANALYZE timesheets;
+ANALYZE assignments;
+ANALYZE payroll;
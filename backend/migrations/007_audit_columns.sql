@@ -0,0 +1,30 @@
+-- Migration: Auditing columns and shift purpose
+-- Date: 2026-10-17
+-- Description: DDL that used to run inside init_db() on every application start.
+--              Adds shifts.purpose and the createdby/datecreated auditing columns.
+
+-- =========================================================
+-- SHIFTS
+-- =========================================================
+ALTER TABLE shifts ADD COLUMN IF NOT EXISTS purpose VARCHAR(255);
+
+-- =========================================================
+-- AUDITING COLUMNS
+-- =========================================================
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY[
+        'privileges', 'roles', 'users', 'staff', 'patients', 'service_requests', 'assignments',
+        'shifts', 'timesheets', 'payroll', 'invoices', 'compliance', 'visits', 'feedback', 'email_tokens'
+    ]
+    LOOP
+        EXECUTE format('ALTER TABLE %I ADD COLUMN IF NOT EXISTS createdby VARCHAR(255) DEFAULT ''system''', t);
+        EXECUTE format('ALTER TABLE %I ADD COLUMN IF NOT EXISTS datecreated TIMESTAMP DEFAULT NOW()', t);
+    END LOOP;
+END $$;
+
+-- =========================================================
+-- MIGRATION COMPLETE
+-- =========================================================
@@ -0,0 +1,29 @@
+-- Migration: Shift location history
+-- Date: 2026-10-17
+-- Description: Breadcrumb trails recorded during shifts, stored as compressed,
+--              delta-encoded chunks of fixes (see LocationHistoryChunk in models.py)
+
+-- =========================================================
+-- CREATE LOCATION HISTORY CHUNKS TABLE
+-- =========================================================
+CREATE TABLE IF NOT EXISTS location_history_chunks (
+    id SERIAL PRIMARY KEY,
+    staff_id INTEGER REFERENCES staff(id) NOT NULL,
+    shift_id INTEGER REFERENCES shifts(id) NOT NULL,
+    started_at TIMESTAMP NOT NULL,
+    ended_at TIMESTAMP NOT NULL,
+    fix_count INTEGER NOT NULL,
+    data BYTEA NOT NULL,
+    datecreated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_location_history_chunks_shift_id_started_at
+    ON location_history_chunks (shift_id, started_at);
+CREATE INDEX IF NOT EXISTS ix_location_history_chunks_staff_id_started_at
+    ON location_history_chunks (staff_id, started_at);
+
+-- =========================================================
+-- MIGRATION COMPLETE
+-- =========================================================
+-- Chunks are written by the location flusher (app/services/location_history.py);
+-- read a shift's trail with GET /location/shifts/{shift_id}/trail
@@ -0,0 +1,22 @@
+-- Migration: Location change timestamps
+-- Date: 2026-10-17
+-- Description: staff/patients.location_updated_at records the last coordinate change,
+--              so /map/union_staff and /map/union_patients can return deltas (?since=)
+
+-- =========================================================
+-- ADD COLUMNS
+-- =========================================================
+ALTER TABLE staff ADD COLUMN IF NOT EXISTS location_updated_at TIMESTAMP;
+ALTER TABLE patients ADD COLUMN IF NOT EXISTS location_updated_at TIMESTAMP;
+
+-- =========================================================
+-- INDEXES
+-- =========================================================
+CREATE INDEX IF NOT EXISTS ix_staff_location_updated_at ON staff (location_updated_at);
+CREATE INDEX IF NOT EXISTS ix_patients_location_updated_at ON patients (location_updated_at);
+
+-- =========================================================
+-- MIGRATION COMPLETE
+-- =========================================================
+-- Existing rows stay NULL until their coordinates next change; delta clients
+-- start with a full (since-less) load anyway.
@@ -0,0 +1,44 @@
+-- Migration: Email outbox
+-- Date: 2026-10-17
+-- Description: Outgoing emails are queued in the same transaction as the change
+--              that triggers them and delivered by a background sender
+
+-- =========================================================
+-- CREATE EMAIL STATUS TYPE
+-- =========================================================
+DO $$
+BEGIN
+    CREATE TYPE emailstatus AS ENUM ('PENDING', 'SENDING', 'SENT', 'FAILED');
+EXCEPTION
+    WHEN duplicate_object THEN NULL;
+END $$;
+
+-- =========================================================
+-- CREATE EMAIL OUTBOX TABLE
+-- =========================================================
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id SERIAL PRIMARY KEY,
+    to_email VARCHAR(255) NOT NULL,
+    subject VARCHAR(255) NOT NULL,
+    html_body TEXT NOT NULL,
+    from_name VARCHAR(255) DEFAULT 'Healthcare Platform',
+    status emailstatus NOT NULL DEFAULT 'PENDING',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'utc'),
+    locked_at TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP,
+    createdby VARCHAR(255) DEFAULT 'system',
+    datecreated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_email_outbox_status_next_attempt_at
+    ON email_outbox (status, next_attempt_at);
+
+-- =========================================================
+-- MIGRATION COMPLETE
+-- =========================================================
+-- Emails are delivered by a sender thread in each API process
+-- (EMAIL_OUTBOX_SENDER=thread) or by `python -m app.cli email-worker`
+-- (EMAIL_OUTBOX_SENDER=external). Senders claim rows with SKIP LOCKED.
@@ -0,0 +1,15 @@
+-- Migration: Payroll job heartbeat
+-- Date: 2026-10-17
+-- Description: payroll_jobs.heartbeat_at is refreshed after every processed chunk,
+--              so jobs whose worker died can be detected and failed
+
+-- =========================================================
+-- ADD COLUMN
+-- =========================================================
+ALTER TABLE payroll_jobs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP;
+
+-- =========================================================
+-- MIGRATION COMPLETE
+-- =========================================================
+-- RUNNING jobs without a heartbeat for PAYROLL_JOB_STALE_SECONDS are marked
+-- FAILED at API startup and by `python -m app.cli payroll-worker`.
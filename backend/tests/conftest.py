@@ -0,0 +1,5 @@
+import os
+
+# Unit tests never touch a real database
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SCHEMA_CHECK", "off")
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.db.database import Base
+from app.services import location_history
+
+T0 = datetime(2025, 5, 1, 8, 0, 0)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[models.LocationHistoryChunk.__table__])
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    writer = location_history.HistoryWriter()
+    monkeypatch.setattr(location_history, "history_writer", writer)
+    return writer
+
+
+def fixes(start, n):
+    return [(T0 + timedelta(seconds=5 * i), 52.0 + i * 1e-4, 4.0 + i * 1e-4) for i in range(start, start + n)]
+
+
+def flush(db, writer, **kwargs):
+    writes = writer.take_writes(**kwargs)
+    location_history.write_chunks(db, writes)
+    db.commit()
+    writer.committed(writes)
+
+
+def test_open_chunk_is_written_on_every_flush(db, writer):
+    writer.record(1, 10, fixes(0, 3))
+    flush(db, writer)
+    assert location_history.shift_trail(db, 10)[0] == 3
+    writer.record(1, 10, fixes(3, 2))
+    flush(db, writer)
+    total, trail = location_history.shift_trail(db, 10)
+    assert total == 5
+    assert trail[:, 1].tolist() == pytest.approx([52.0 + i * 1e-4 for i in range(5)])
+    # Rewritten in place until sealed
+    assert db.query(models.LocationHistoryChunk).count() == 1
+    assert len(writer) == 1
+
+
+def test_end_shift_seals_the_chunk(db, writer):
+    writer.record(1, 10, fixes(0, 3))
+    writer.record(2, 11, fixes(0, 2))
+    flush(db, writer, seal_shifts=(10,))
+    assert len(writer) == 1
+    writer.record(2, 11, fixes(2, 2))
+    flush(db, writer)
+    assert location_history.shift_trail(db, 10)[0] == 3
+    assert location_history.shift_trail(db, 11)[0] == 4
+
+
+def test_failed_write_is_retried(db, writer):
+    writer.record(1, 10, fixes(0, 3))
+    writes = writer.take_writes(force=True)
+    location_history.write_chunks(db, writes)
+    db.rollback()
+    writer.restore(writes)
+    writer.record(1, 10, fixes(3, 1))
+    flush(db, writer)
+    assert location_history.shift_trail(db, 10)[0] == 4
+    assert db.query(models.LocationHistoryChunk).count() == 1
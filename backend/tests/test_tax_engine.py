@@ -0,0 +1,121 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.db.database import Base
+from app.services.tax_engine import _compile, tax_engine
+
+
+def rate_row(**fields):
+    row = dict(
+        state_province=None, federal_rate=None, federal_bracket_min=0.0, federal_bracket_max=None,
+        state_provincial_rate=0.0, social_security_rate=0.0, social_security_max_income=None,
+        medicare_rate=0.0, medicare_max_income=None,
+    )
+    row.update(fields)
+    return SimpleNamespace(**row)
+
+
+@pytest.fixture
+def table():
+    # Percentages, as stored in tax_rates: 1% / 12% / 22% brackets, 6.2% SS capped at 1000, 0.9% medicare
+    common = dict(social_security_rate=6.2, social_security_max_income=1000.0, medicare_rate=0.9,
+                  state_provincial_rate=0.5)
+    rows = [
+        rate_row(federal_rate=1.0, federal_bracket_min=0.0, federal_bracket_max=1000.0, **common),
+        rate_row(federal_rate=12.0, federal_bracket_min=1000.0, federal_bracket_max=5000.0, **common),
+        rate_row(federal_rate=22.0, federal_bracket_min=5000.0, federal_bracket_max=None, **common),
+    ]
+    return _compile("US", None, 2025, rows)
+
+
+def test_rates_are_percentages(table):
+    assert table.bracket_rates == (0.01, 0.12, 0.22)
+    assert table.social_security_rate == pytest.approx(0.062)
+    assert table.medicare_rate == pytest.approx(0.009)
+    assert table.state_provincial_rate == pytest.approx(0.005)
+    assert table.source == "tax_rates"
+
+
+@pytest.mark.parametrize("gross, expected", [
+    (0.0, 0.0),
+    (500.0, 5.0),
+    (1000.0, 10.0),          # top edge of the 1% bracket
+    (1000.01, 10.0012),      # first cent of the 12% bracket
+    (3000.0, 250.0),
+    (5000.0, 490.0),         # top edge of the 12% bracket
+    (6000.0, 710.0),
+])
+def test_federal_bracket_edges(table, gross, expected):
+    assert table.federal(gross) == pytest.approx(expected)
+    assert table.compute(np.array([gross]))["federal_tax"][0] == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("gross, ytd, expected", [
+    (500.0, 0.0, 31.0),
+    (500.0, 800.0, 12.4),    # only the 200 left under the cap is taxed
+    (500.0, 1000.0, 0.0),    # cap reached
+    (500.0, 1500.0, 0.0),
+])
+def test_social_security_cap(table, gross, ytd, expected):
+    assert table.social_security(gross, ytd) == pytest.approx(expected)
+    batch = table.compute(np.array([gross]), np.array([ytd]))
+    assert batch["social_security_tax"][0] == pytest.approx(expected)
+
+
+def test_sub_one_percent_rates(table):
+    batch = table.compute(np.array([500.0]))
+    assert table.medicare(500.0) == pytest.approx(4.5)
+    assert batch["medicare_tax"][0] == pytest.approx(4.5)
+    assert table.state_provincial(500.0) == pytest.approx(2.5)
+    assert batch["state_provincial_tax"][0] == pytest.approx(2.5)
+
+
+def test_batch_matches_scalar(table):
+    gross = np.array([0.0, 999.99, 1000.0, 1000.01, 4999.0, 5000.0, 12000.0])
+    ytd = np.array([0.0, 200.0, 999.0, 1000.0, 0.0, 600.0, 0.0])
+    batch = table.compute(gross, ytd)
+    for i, (g, y) in enumerate(zip(gross, ytd)):
+        assert batch["federal_tax"][i] == pytest.approx(table.federal(g))
+        assert batch["social_security_tax"][i] == pytest.approx(table.social_security(g, y))
+        assert batch["medicare_tax"][i] == pytest.approx(table.medicare(g))
+
+
+def test_defaults_without_rows():
+    table = _compile("US", "CA", 2025, [])
+    assert table.source == "default"
+    assert table.federal(300.0) == pytest.approx(30.0)
+    assert table.social_security(1000.0) == pytest.approx(62.0)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[models.Country.__table__, models.TaxRate.__table__])
+    with Session(engine) as session:
+        session.add(models.Country(id=1, code="US", name="United States"))
+        session.commit()
+        tax_engine.invalidate()
+        yield session
+
+
+def test_cache_cleared_on_commit_not_flush(db):
+    first = tax_engine.get(db, "US", None, 2025)
+    db.add(models.TaxRate(country_id=1, tax_year=2025, federal_rate=10.0, is_active=True))
+    db.flush()
+    assert tax_engine.get(db, "US", None, 2025) is first
+    db.commit()
+    assert tax_engine.get(db, "US", None, 2025).source == "tax_rates"
+
+
+def test_rollback_keeps_cache(db):
+    first = tax_engine.get(db, "US", None, 2025)
+    db.add(models.TaxRate(country_id=1, tax_year=2025, federal_rate=10.0, is_active=True))
+    db.flush()
+    db.rollback()
+    db.commit()
+    assert tax_engine.get(db, "US", None, 2025) is first
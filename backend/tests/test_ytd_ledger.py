@@ -0,0 +1,99 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.db.database import Base
+from app.services import ytd_ledger
+
+JAN = datetime(2025, 1, 1)
+FEB = datetime(2025, 2, 1)
+MAR = datetime(2025, 3, 1)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[models.Payroll.__table__, models.PayrollYtd.__table__])
+    with Session(engine) as session:
+        yield session
+
+
+def add_payroll(db, staff_id, start, gross, status=models.PayrollStatus.PENDING):
+    db.add(models.Payroll(staff_id=staff_id, pay_period_start=start, gross_pay=gross, net_pay=gross, status=status))
+
+
+def set_ledger(db, staff_id, gross):
+    db.add(models.PayrollYtd(staff_id=staff_id, tax_year=2025, gross_pay=gross))
+
+
+def test_counts_only_earlier_periods(db):
+    add_payroll(db, 1, JAN, 1000)
+    add_payroll(db, 1, FEB, 2000)
+    set_ledger(db, 1, 3000)
+    db.flush()
+    assert ytd_ledger.get_ytd_gross(db, 1, MAR) == 3000
+    # Re-running February must not count February itself
+    assert ytd_ledger.get_ytd_gross(db, 1, FEB) == 1000
+    # January processed late: nothing earlier
+    assert ytd_ledger.get_ytd_gross(db, 1, JAN) == 0
+
+
+def test_void_payrolls_are_not_subtracted(db):
+    add_payroll(db, 1, JAN, 1000)
+    add_payroll(db, 1, FEB, 500, status=models.PayrollStatus.VOID)  # not in the ledger
+    set_ledger(db, 1, 1000)
+    db.flush()
+    assert ytd_ledger.get_ytd_gross(db, 1, FEB) == 1000
+
+
+def test_many_and_missing_staff(db):
+    add_payroll(db, 1, JAN, 1000)
+    add_payroll(db, 2, JAN, 700)
+    add_payroll(db, 2, FEB, 800)
+    set_ledger(db, 1, 1000)
+    set_ledger(db, 2, 1500)
+    db.flush()
+    assert ytd_ledger.get_ytd_gross_many(db, [1, 2, 3], FEB) == {1: 1000, 2: 700}
+    assert ytd_ledger.get_ytd_gross_many(db, [], FEB) == {}
+
+
+def ledger_row(db, staff_id):
+    db.expire_all()
+    return db.query(models.PayrollYtd).filter_by(staff_id=staff_id, tax_year=2025).one()
+
+
+def void(db, payroll):
+    old_status = payroll.status
+    payroll.status = models.PayrollStatus.VOID
+    ytd_ledger.record_status_change(db, payroll, old_status)
+
+
+def test_void_cannot_be_approved(db):
+    payroll = models.Payroll(staff_id=1, pay_period_start=JAN, gross_pay=1000, net_pay=1000,
+                             status=models.PayrollStatus.APPROVED)
+    db.add(payroll)
+    db.flush()
+    ytd_ledger.record_payrolls(db, [payroll])
+    void(db, payroll)
+    payroll.status = models.PayrollStatus.APPROVED
+    with pytest.raises(ValueError):
+        ytd_ledger.record_status_change(db, payroll, models.PayrollStatus.VOID)
+    row = ledger_row(db, 1)
+    assert (row.gross_pay, row.approved_gross_pay, row.payroll_count) == (0, 0, 0)
+
+
+def test_double_void_is_counted_once(db):
+    payroll = models.Payroll(staff_id=1, pay_period_start=JAN, gross_pay=1000, net_pay=1000,
+                             status=models.PayrollStatus.PENDING)
+    other = models.Payroll(staff_id=1, pay_period_start=FEB, gross_pay=500, net_pay=500,
+                           status=models.PayrollStatus.PENDING)
+    db.add_all([payroll, other])
+    db.flush()
+    ytd_ledger.record_payrolls(db, [payroll, other])
+    void(db, payroll)
+    void(db, payroll)
+    row = ledger_row(db, 1)
+    assert (row.gross_pay, row.payroll_count) == (500, 1)
@@ -45,4 +45,18 @@ export async function login(email, password){
   return resp.data
 }
 
+// Fetch every row of a cursor-paginated collection by following X-Next-Cursor.
+// Resolves to { data: [...] } so call sites can keep reading `.data`.
+export async function getAll(url, params = {}, pageSize = 1000){
+  const data = []
+  let after
+  do {
+    const resp = await api.get(url, { params: { ...params, limit: pageSize, ...(after ? { after } : {}) } })
+    if (!Array.isArray(resp.data)) return resp
+    data.push(...resp.data)
+    after = resp.headers?.['x-next-cursor']
+  } while (after)
+  return { data }
+}
+
 export default api
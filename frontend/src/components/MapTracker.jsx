@@ -1,7 +1,8 @@
 import React, { useEffect, useRef, useState, useContext } from 'react'
-import api from '../api/axios'
+import api, { getAll } from '../api/axios'
 import { AuthContext } from '../context/AuthProvider'
 import { useGPSTracking } from '../hooks/useGPSTracking'
+import { useLiveEvents } from '../hooks/useLiveEvents'
 import GPSStatus from './GPSStatus'
 
 // Load Leaflet from CDN (no npm dependency)
@@ -61,6 +62,15 @@ export default function MapTracker(){
   const mapEl = useRef(null)
   const geoPendingRef = useRef(new Set())
 
+  // Live location pushes move markers in place; polling then only needs to catch
+  // new records, so it slows down while the feed is connected
+  const { connected: liveConnected } = useLiveEvents((event) => {
+    if (event.type !== 'location') return
+    const move = (rows) => rows.map(r => (r && r.id === event.id ? { ...r, latitude: event.latitude, longitude: event.longitude } : r))
+    if (event.kind === 'staff') setStaff(move)
+    else if (event.kind === 'patient') setPatients(move)
+  }, { topics: ['location'] })
+
   // Fetch coordinates periodically
   useEffect(() => {
     let mounted = true
@@ -69,7 +79,7 @@ export default function MapTracker(){
         const [staffRes, patientRes, usersRes] = await Promise.all([
           api.get('/staff'),
           api.get('/patients'),
-          api.get('/users', { params: { limit: 1000 } })
+          getAll('/users')
         ])
         if (!mounted) return
         const rawStaff = Array.isArray(staffRes.data) ? staffRes.data : []
@@ -128,9 +138,9 @@ export default function MapTracker(){
       } catch (e) { console.error(e) }
     }
     fetchAll()
-    const t = setInterval(fetchAll, 15000)
+    const t = setInterval(fetchAll, liveConnected ? 120000 : 15000)
     return () => { mounted = false; clearInterval(t) }
-  }, [])
+  }, [liveConnected])
 
   // Initialize map once
   useEffect(() => {
@@ -1,5 +1,5 @@
 import React, { useContext, useEffect, useMemo, useRef, useState } from 'react'
-import api from '../api/axios'
+import api, { getAll } from '../api/axios'
 import { AuthContext } from '../context/AuthProvider'
 import { useGPSTracking } from '../hooks/useGPSTracking'
 import { TopNav, SideNav } from '../pages/Dashboard/AdminDashboard'
@@ -97,7 +97,7 @@ export default function SpecificMapTracker(){
     async function resolveStaff(){
       if (targetStaffId) return
       try {
-        const stRes = await api.get('/staff', { params: { limit: 1000 } })
+        const stRes = await getAll('/staff')
         const list = Array.isArray(stRes.data) ? stRes.data : []
         const me = (user && user.id != null) ? list.find(s => Number(s.user_id) === Number(user.id)) : null
         if (me) setTargetStaffId(me.id)
@@ -113,10 +113,10 @@ export default function SpecificMapTracker(){
       if (!targetStaffId) return
       try {
         const [asgRes, patRes, srRes, stRes] = await Promise.all([
-          api.get('/assignments', { params: { limit: 1000 } }),
-          api.get('/patients', { params: { limit: 1000 } }),
-          api.get('/service_requests', { params: { limit: 1000 } }),
-          api.get('/staff', { params: { limit: 1000 } }),
+          getAll('/assignments'),
+          getAll('/patients'),
+          getAll('/service_requests'),
+          getAll('/staff'),
         ])
         if (!mounted) return
         const asgAll = Array.isArray(asgRes.data) ? asgRes.data : []
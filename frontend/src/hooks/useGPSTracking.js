@@ -2,6 +2,8 @@ import { useEffect, useRef, useState, useContext } from 'react'
 import api from '../api/axios'
 import { AuthContext } from '../context/AuthProvider'
 
+const MAX_PENDING_FIXES = 100
+
 /**
  * Custom hook for GPS tracking
  * Automatically obtains device location and updates backend when user is authenticated
@@ -28,18 +30,32 @@ export function useGPSTracking(options = {}) {
   const lastUpdateRef = useRef(0)
   const locationRef = useRef({ latitude: null, longitude: null })
 
-  const updateBackend = async (lat, lon, accuracy) => {
-    if (!isAuthenticated) return
+  // Fixes recorded since the last upload; sent together to /location/batch
+  const pendingRef = useRef([])
+
+  const queueFix = (lat, lon, accuracy, timestamp = Date.now()) => {
+    pendingRef.current.push({
+      latitude: lat,
+      longitude: lon,
+      accuracy: accuracy,
+      timestamp: new Date(timestamp).toISOString()
+    })
+    if (pendingRef.current.length > MAX_PENDING_FIXES) {
+      pendingRef.current = pendingRef.current.slice(-MAX_PENDING_FIXES)
+    }
+  }
+
+  const updateBackend = async () => {
+    if (!isAuthenticated || pendingRef.current.length === 0) return
     
+    const fixes = pendingRef.current
+    pendingRef.current = []
     try {
-      await api.post('/location/update', {
-        latitude: lat,
-        longitude: lon,
-        accuracy: accuracy,
-        timestamp: new Date().toISOString()
-      })
-      console.log('GPS location updated on backend:', { lat, lon })
+      const { data } = await api.post('/location/batch', { fixes })
+      console.log('GPS fixes uploaded:', data)
     } catch (err) {
+      // Keep the fixes for the next upload
+      pendingRef.current = [...fixes, ...pendingRef.current].slice(-MAX_PENDING_FIXES)
       console.warn('Failed to update location on backend:', err.message)
     }
   }
@@ -59,12 +75,13 @@ export function useGPSTracking(options = {}) {
         
         setLocation({ latitude, longitude, accuracy })
         locationRef.current = { latitude, longitude }
+        if (autoUpdate && isAuthenticated) queueFix(latitude, longitude, accuracy, position.timestamp)
         
-        // Update backend if enough time has passed and auto-update is enabled
+        // Upload queued fixes if enough time has passed
         const now = Date.now()
         if (autoUpdate && isAuthenticated && (now - lastUpdateRef.current) >= updateInterval) {
           lastUpdateRef.current = now
-          updateBackend(latitude, longitude, accuracy)
+          updateBackend()
         }
       },
       (err) => {
@@ -103,7 +120,8 @@ export function useGPSTracking(options = {}) {
   const updateNow = async () => {
     const { latitude, longitude } = locationRef.current
     if (latitude !== null && longitude !== null) {
-      await updateBackend(latitude, longitude, location.accuracy)
+      queueFix(latitude, longitude, location.accuracy)
+      await updateBackend()
     }
   }
 
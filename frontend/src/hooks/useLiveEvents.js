@@ -0,0 +1,59 @@
+import { useEffect, useRef, useState, useContext } from 'react'
+import { AuthContext } from '../context/AuthProvider'
+
+/**
+ * Subscribe to the backend's live feed (/ws/live)
+ * Pushes location and shift events for the user's company; reconnects with
+ * backoff when the socket drops.
+ *
+ * @param {Function} onEvent - Called with each event object ({ type: 'location' | 'shift', ... })
+ * @param {Object} options
+ * @param {string[]} options.topics - Subset of ['location', 'shift'], default both
+ * @returns {Object} { connected }
+ */
+export function useLiveEvents(onEvent, options = {}) {
+  const { topics = ['location', 'shift'] } = options
+  const { isAuthenticated } = useContext(AuthContext)
+  const [connected, setConnected] = useState(false)
+  const handlerRef = useRef(onEvent)
+  handlerRef.current = onEvent
+  const topicKey = topics.join(',')
+
+  useEffect(() => {
+    if (!isAuthenticated) return
+    let socket = null
+    let retry = null
+    let attempts = 0
+    let closed = false
+
+    const connect = () => {
+      const token = localStorage.getItem('access_token')
+      if (!token) return
+      const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws'
+      const url = `${scheme}://${window.location.host}/api/ws/live?token=${encodeURIComponent(token)}&topics=${topicKey}`
+      socket = new WebSocket(url)
+      socket.onopen = () => { attempts = 0; setConnected(true) }
+      socket.onmessage = (msg) => {
+        try {
+          const event = JSON.parse(msg.data)
+          if (event.type !== 'hello') handlerRef.current?.(event)
+        } catch (_) { /* ignore malformed frames */ }
+      }
+      socket.onclose = () => {
+        setConnected(false)
+        if (closed) return
+        attempts += 1
+        retry = setTimeout(connect, Math.min(30000, 1000 * 2 ** attempts))
+      }
+    }
+
+    connect()
+    return () => {
+      closed = true
+      clearTimeout(retry)
+      if (socket) socket.close()
+    }
+  }, [isAuthenticated, topicKey])
+
+  return { connected }
+}
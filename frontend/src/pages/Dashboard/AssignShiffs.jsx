@@ -1,5 +1,5 @@
 import React, { useEffect, useMemo, useState } from "react";
-import api from "../../api/axios";
+import api, { getAll } from "../../api/axios";
 import { TopNav, SideNav, StatCard } from "./AdminDashboard";
 
 export default function AssignShiffs(){
@@ -19,11 +19,11 @@ export default function AssignShiffs(){
       setErrorLog("")
       try {
         const [asgRes, srRes, stRes, patRes, usrRes] = await Promise.all([
-          api.get('/assignments', { params: { limit: 1000 } }),
-          api.get('/service_requests', { params: { limit: 1000 } }),
-          api.get('/staff', { params: { limit: 1000 } }),
-          api.get('/patients', { params: { limit: 1000 } }),
-          api.get('/users', { params: { limit: 1000 } }),
+          getAll('/assignments'),
+          getAll('/service_requests'),
+          getAll('/staff'),
+          getAll('/patients'),
+          getAll('/users'),
         ])
         if (!mounted) return
         const assignments = Array.isArray(asgRes.data) ? asgRes.data : []
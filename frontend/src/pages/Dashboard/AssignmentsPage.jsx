@@ -1,5 +1,5 @@
 import React, { useEffect, useState, useContext } from 'react'
-import api from '../../api/axios'
+import api, { getAll } from '../../api/axios'
 import { AuthContext } from '../../context/AuthProvider'
 
 export default function AssignmentsPage(){
@@ -14,10 +14,10 @@ export default function AssignmentsPage(){
     async function loadCounts(){
       try {
         const [a, r, s, p] = await Promise.all([
-          api.get('/assignments', { params: { limit: 1000 } }),
-          api.get('/service_requests', { params: { limit: 1000 } }),
-          api.get('/staff', { params: { limit: 1000 } }),
-          api.get('/patients', { params: { limit: 1000 } }),
+          getAll('/assignments'),
+          getAll('/service_requests'),
+          getAll('/staff'),
+          getAll('/patients'),
         ])
         setStats({
           assignments: Array.isArray(a.data) ? a.data.length : 0,
@@ -1,5 +1,5 @@
 import React, { useEffect, useState, useContext } from "react";
-import api from "../../api/axios";
+import api, { getAll } from "../../api/axios";
 import { AuthContext } from "../../context/AuthProvider";
 
 export default function ComplianceManagementPage() {
@@ -23,7 +23,7 @@ export default function ComplianceManagementPage() {
   useEffect(() => {
     async function load(){
       try {
-        const s = await api.get('/staff', { params: { limit: 1000 } })
+        const s = await getAll('/staff')
         setStaff(Array.isArray(s.data) ? s.data : [])
       } catch (_) { setStaff([]) }
     }
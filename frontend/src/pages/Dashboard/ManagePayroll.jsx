@@ -90,13 +90,27 @@ export default function ManagePayroll() {
       const payPeriodStart = new Date(today)
       payPeriodStart.setDate(payPeriodStart.getDate() - 14)
 
-      await api.post('/payroll-enhanced/process/bulk', {
+      const { data: submitted } = await api.post('/payroll-enhanced/process/bulk', {
         company_id: user.company_id,
         pay_period_start: payPeriodStart.toISOString(),
         pay_period_end: payPeriodEnd.toISOString()
       })
 
-      alert('Bulk payroll processing completed!')
+      // Bulk payroll runs as a background job; poll until it finishes
+      let job = submitted
+      while (job.status === 'queued' || job.status === 'running') {
+        await new Promise((resolve) => setTimeout(resolve, 2000))
+        const res = await api.get(`/payroll-enhanced/jobs/${submitted.id}`)
+        job = res.data
+      }
+
+      if (job.status === 'failed') {
+        alert('Bulk payroll processing failed: ' + (job.error || 'unknown error'))
+      } else if (job.failed > 0) {
+        alert(`Bulk payroll processing completed: ${job.succeeded} processed, ${job.failed} failed`)
+      } else {
+        alert('Bulk payroll processing completed!')
+      }
       fetchPayrolls()
     } catch (error) {
       alert('Error processing bulk payroll: ' + (error.response?.data?.detail || error.message))
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react'
-import api from '../../api/axios'
+import api, { getAll } from '../../api/axios'
 
 export default function ManageRoles(){
   const [roles, setRoles] = useState([])
@@ -21,7 +21,7 @@ export default function ManageRoles(){
       setRoles(Array.isArray(res.data) ? res.data : [])
     } catch (_) { setRoles([]) }
     try {
-      const pr = await api.get('/priviledges', { params: { limit: 1000 } })
+      const pr = await getAll('/priviledges')
       setPrivileges(Array.isArray(pr.data) ? pr.data : [])
     } catch (_){ setPrivileges([]) }
     try {
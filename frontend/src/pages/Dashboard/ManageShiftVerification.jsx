@@ -1,5 +1,5 @@
 import React, { useContext, useEffect, useMemo, useState } from "react";
-import api from "../../api/axios";
+import api, { getAll } from "../../api/axios";
 import { AuthContext } from "../../context/AuthProvider";
 import { TopNav, SideNav } from "./AdminDashboard";
 
@@ -34,7 +34,7 @@ export default function ManageShiftVerification() {
       setErrorLog("");
       try {
         const [staffRes, timesheetRes] = await Promise.all([
-          api.get("/staff", { params: { limit: 1000 } }),
+          getAll("/staff"),
           api.get("/timesheets", { params: { limit: 500 } })
         ]);
         if (cancelled) return;
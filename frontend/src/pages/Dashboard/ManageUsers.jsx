@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from 'react'
-import api from '../../api/axios'
+import api, { getAll } from '../../api/axios'
 import bcrypt from 'bcryptjs'
 
 export default function ManageUsers(){
@@ -55,7 +55,7 @@ export default function ManageUsers(){
 
   async function getRoleIdByName(name){
     try {
-      const res = await api.get('/roles', { params: { limit: 1000 } })
+      const res = await getAll('/roles')
       const roles = Array.isArray(res.data) ? res.data : []
       const match = roles.find(r => (r.name || '').toLowerCase() === String(name).toLowerCase())
       return match?.id || null
@@ -1,5 +1,5 @@
 import React, { useEffect, useMemo, useState } from "react";
-import api from "../../api/axios";
+import api, { getAll } from "../../api/axios";
 import { TopNav, SideNav, StatCard } from "./AdminDashboard";
 
 export default function Startshift(){
@@ -32,7 +32,7 @@ export default function Startshift(){
       setLoading(true)
       setErrorLog("")
       try {
-        const stRes = await api.get('/staff', { params: { limit: 1000 } })
+        const stRes = await getAll('/staff')
         if (!mounted) return
         setStaff(Array.isArray(stRes.data) ? stRes.data : [])
       } catch (err){
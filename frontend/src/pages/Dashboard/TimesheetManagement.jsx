@@ -1,5 +1,5 @@
 import React, { useEffect, useMemo, useState } from "react";
-import api from "../../api/axios";
+import api, { getAll } from "../../api/axios";
 import { TopNav, SideNav } from "./AdminDashboard";
 
 export default function TimesheetManagement(){
@@ -29,7 +29,7 @@ export default function TimesheetManagement(){
       setErrorLog("")
       try {
         const [stRes, monthRes] = await Promise.all([
-          api.get('/staff', { params: { limit: 1000 } }),
+          getAll('/staff'),
           api.get('/timesheets/monthly', { params: { year: monthMeta.y, month: monthMeta.m + 1 } }),
         ])
         const staffArr = Array.isArray(stRes.data) ? stRes.data : []
@@ -62,10 +62,10 @@ export default function TimesheetManagement(){
         // Fallback for older backend routing or when /monthly is unavailable
         try {
           const [stRes, byDayRes, reqRes, ptRes] = await Promise.all([
-            api.get('/staff', { params: { limit: 1000 } }),
+            getAll('/staff'),
             api.get('/timesheets/assignments_by_day', { params: { year: monthMeta.y, month: monthMeta.m + 1 } }),
-            api.get('/service_requests', { params: { limit: 1000 } }),
-            api.get('/patients', { params: { limit: 1000 } }),
+            getAll('/service_requests'),
+            getAll('/patients'),
           ])
           const staffArr = Array.isArray(stRes.data) ? stRes.data : []
           setStaffById(Object.fromEntries(staffArr.map(s => [s.id, s])))
@@ -1,5 +1,5 @@
 import React, { useEffect, useState, useContext } from "react";
-import api from "../../api/axios";
+import api, { getAll } from "../../api/axios";
 import { AuthContext } from "../../context/AuthProvider";
 
 export default function VisitManagementPage() {
@@ -26,9 +26,9 @@ export default function VisitManagementPage() {
     async function load(){
       try {
         const [v, p, s] = await Promise.all([
-          api.get('/visits', { params: { limit: 1000 } }),
-          api.get('/patients', { params: { limit: 1000 } }),
-          api.get('/staff', { params: { limit: 1000 } }),
+          getAll('/visits'),
+          getAll('/patients'),
+          getAll('/staff'),
         ])
         setStats({ visits: Array.isArray(v.data) ? v.data.length : 0 })
         setPatients(Array.isArray(p.data) ? p.data : [])
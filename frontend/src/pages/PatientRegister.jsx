@@ -1,5 +1,5 @@
 import React, { useEffect, useMemo, useState } from 'react'
-import api from '../api/axios'
+import api, { getAll } from '../api/axios'
 import FooterBlue from '../components/FooterBlue'
 import bcrypt from 'bcryptjs'
 
@@ -17,7 +17,7 @@ export default function PatientRegister(){
 
   async function getRoleIdByName(name){
     try {
-      const res = await api.get('/roles', { params: { limit: 1000 } })
+      const res = await getAll('/roles')
       const roles = Array.isArray(res.data) ? res.data : []
       const match = roles.find(r => (r.name || '').toLowerCase() === String(name).toLowerCase())
       return match?.id || null
@@ -1,5 +1,5 @@
 import React, { useEffect, useMemo, useState } from 'react'
-import api from '../api/axios'
+import api, { getAll } from '../api/axios'
 import bcrypt from 'bcryptjs'
 import FooterBlue from '../components/FooterBlue'
 
@@ -41,7 +41,7 @@ export default function PractitionerRegister(){
     modules.forEach(m => actions.forEach(a => needed.add(`${m}_${a}`)))
 
     // Fetch existing privileges and create missing
-    const list = await api.get('/priviledges', { params: { limit: 1000 } }).then(r => Array.isArray(r.data)? r.data: []).catch(()=>[])
+    const list = await getAll('/priviledges').then(r => Array.isArray(r.data)? r.data: []).catch(()=>[])
     const codeToId = new Map(list.map(p => [String(p.code).toUpperCase(), p.id]))
     for (const code of needed){
       if (!codeToId.has(code)){
@@ -53,7 +53,7 @@ export default function PractitionerRegister(){
     }
 
     // Ensure Admin role exists with all privilege ids
-    const roles = await api.get('/roles', { params: { limit: 1000 } }).then(r => Array.isArray(r.data)? r.data: []).catch(()=>[])
+    const roles = await getAll('/roles').then(r => Array.isArray(r.data)? r.data: []).catch(()=>[])
     const admin = roles.find(r => String(r.name||'').toLowerCase() === 'admin')
     const allIds = Array.from(codeToId.values())
     if (!admin){